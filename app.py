@@ -1,18 +1,61 @@
-from flask import Flask, render_template, redirect, url_for, flash, request, session, jsonify
+from flask import (Blueprint, Flask, current_app, render_template, redirect, url_for, flash, request, session, jsonify,
+                   Response, stream_with_context)
 from config import Config
-from database.models import User, UserProfile, WeeklyPlan, DailyWorkout, WeightLog
-from database.db_connection import init_database, get_db_connection
+from database.models import (User, UserProfile, WeeklyPlan, DailyWorkout, WeightLog, ExerciseLog,
+                             begin_request_scope, end_request_scope)
+from database.db_connection import init_database, get_pool_stats
+from services.bulk_import import (WEIGHT_MIN_KG, WEIGHT_MAX_KG, BulkImportError, ImportReport, detect_format,
+                                  import_checkins, import_weight_logs, iter_records)
+from services.cache_service import get_cache_stats
+from services.dashboard_service import load_dashboard
+from services.prefetch_service import get_prefetch_stats, prefetch_descriptions
+from services.plan_engine import get_plan_engine_stats, regenerate_days
+from services.plan_templates import get_plan_template_stats
+from services.plan_jobs import plan_job_queue, submit_plan_job, get_job_status, QueueFullError
+from services.weight_series import DEFAULT_POINTS, MAX_POINTS, get_weight_series
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime, date, timedelta
+from datetime import datetime
+import click
 import json
-import os
+import logging
 
-app = Flask(__name__)
-app.config.from_object(Config)
-app.secret_key = app.config['SECRET_KEY']
+def create_app(config_object=Config):
+    """
+    创建并配置应用。启动时不连接数据库、不创建LLM客户端：
+    连接池和DeepSeek客户端都在首次使用时创建，表结构由 `flask --app app init-db`
+    或 `python -m database.migrate upgrade` 单独执行（设置 AUTO_MIGRATE=true 时在此执行）。
+    """
+    app = Flask(__name__)
+    app.config.from_object(config_object)
+    app.secret_key = app.config['SECRET_KEY']
+
+    # 日志：默认INFO，设置 LOG_LEVEL=DEBUG 可查看调试输出
+    logging.basicConfig(level=app.config['LOG_LEVEL'],
+                        format='%(asctime)s %(levelname)s [%(name)s] %(message)s')
+
+    # 请求级查询缓存：同一请求内同一行数据只查询一次
+    @app.before_request
+    def open_model_scope():
+        begin_request_scope()
+
+    @app.teardown_request
+    def close_model_scope(exc):
+        end_request_scope()
 
-# 初始化数据库
-init_database()
+    app.cli.add_command(init_db_command)
+    app.register_blueprint(bp)
+
+    if app.config.get('AUTO_MIGRATE'):
+        init_database()
+    return app
+
+@click.command('init-db')
+def init_db_command():
+    """执行数据库迁移，创建或升级表结构"""
+    init_database()
+
+# 所有页面和接口注册在蓝图上，由 create_app 注册到每个应用实例
+bp = Blueprint('main', __name__)
 
 # 辅助函数
 def login_required(f):
@@ -21,24 +64,29 @@ def login_required(f):
     def decorated_function(*args, **kwargs):
         if 'user_id' not in session:
             flash('请先登录。', 'warning')
-            return redirect(url_for('login', next=request.url))
+            return redirect(url_for('.login', next=request.url))
         return f(*args, **kwargs)
     return decorated_function
 
+def wants_json():
+    """客户端是否期望JSON响应（而不是HTML页面）"""
+    best = request.accept_mimetypes.best_match(['application/json', 'text/html'])
+    return best == 'application/json'
+
 # 首页
-@app.route('/')
+@bp.route('/')
 def index():
     if 'user_id' in session:
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('.dashboard'))
     return render_template('index.html')
 
 # 关于页面
-@app.route('/about')
+@bp.route('/about')
 def about():
     return render_template('about.html')
 
 # 注册
-@app.route('/register', methods=['GET', 'POST'])
+@bp.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
         username = request.form['username'].strip()
@@ -56,11 +104,11 @@ def register():
         session['user_id'] = user_id
         session['username'] = username
         flash('注册成功！请完善个人资料。', 'success')
-        return redirect(url_for('profile'))
+        return redirect(url_for('.profile'))
     return render_template('auth/register.html')
 
 # 登录
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form['username'].strip()
@@ -71,20 +119,20 @@ def login():
             session['username'] = user['username']
             flash('登录成功！', 'success')
             next_page = request.args.get('next')
-            return redirect(next_page or url_for('dashboard'))
+            return redirect(next_page or url_for('.dashboard'))
         else:
             flash('用户名或密码错误。', 'danger')
     return render_template('auth/login.html')
 
 # 退出
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     session.clear()
     flash('您已退出登录。', 'info')
-    return redirect(url_for('index'))
+    return redirect(url_for('.index'))
 
 # 个人资料
-@app.route('/profile', methods=['GET', 'POST'])
+@bp.route('/profile', methods=['GET', 'POST'])
 @login_required
 def profile():
     user_id = session['user_id']
@@ -120,56 +168,26 @@ def profile():
         data = {k: v for k, v in data.items() if v is not None}
         UserProfile.create_or_update(user_id, **data)
         flash('个人资料已保存。', 'success')
-        return redirect(url_for('profile'))
+        return redirect(url_for('.profile'))
     return render_template('profile/edit.html', profile=profile)
 
 # 仪表板
-@app.route('/dashboard')
+@bp.route('/dashboard')
 @login_required
 def dashboard():
-    user_id = session['user_id']
-    # 获取最新体重
-    weight_logs = WeightLog.get_by_user(user_id, limit=10)
-    # 获取活跃计划
-    plan = WeeklyPlan.get_active_plan(user_id)
-    daily_workouts = []
-    if plan:
-        daily_workouts = DailyWorkout.get_by_week_plan(plan['id'])
-    # 调试日志
-    import sys
-    print(f"[DEBUG] user_id={user_id}, plan={plan}", file=sys.stderr)
-    print(f"[DEBUG] daily_workouts count={len(daily_workouts)}", file=sys.stderr)
-    for dw in daily_workouts:
-        print(f"[DEBUG]   id={dw['id']}, date={dw['date']}, day_number={dw['day_number']}, completed={dw.get('completed')}", file=sys.stderr)
-    print(f"[DEBUG] now_date={date.today()}", file=sys.stderr)
-    # 计算今日锻炼
-    today_workout = None
-    today = date.today()
-    for dw in daily_workouts:
-        if dw['date'] == today:
-            today_workout = dw
-            break
-    # 解析今日锻炼的JSON
-    if today_workout and today_workout.get('workout_json'):
-        try:
-            today_workout['workout_data'] = json.loads(today_workout['workout_json'])
-            # 同时将focus字段提取到顶层方便模板使用
-            today_workout['focus'] = today_workout['workout_data'].get('focus', '')
-        except:
-            today_workout['workout_data'] = {'focus': '未知', 'exercises': []}
-            today_workout['focus'] = '未知'
-    elif today_workout:
-        today_workout['workout_data'] = {'focus': '未知', 'exercises': []}
-        today_workout['focus'] = '未知'
+    # 一个连接、两条查询取回体重记录、活跃计划和每日锻炼
+    # 图表数据由页面从 /api/weight/series 获取，这里只需要知道是否有体重记录
+    data = load_dashboard(session['user_id'])
     return render_template('dashboard/index.html',
-                           weight_logs=weight_logs,
-                           plan=plan,
-                           daily_workouts=daily_workouts,
-                           now_date=today,
-                           today_workout=today_workout)
+                           has_weight_logs=data['has_weight_logs'],
+                           plan=data['plan'],
+                           daily_workouts=data['daily_workouts'],
+                           now_date=data['today'],
+                           today_workout=data['today_workout'],
+                           progress=data['progress'])
 
 # 生成计划页面
-@app.route('/plan/generate', methods=['GET', 'POST'])
+@bp.route('/plan/generate', methods=['GET', 'POST'])
 @login_required
 def generate_plan():
     user_id = session['user_id']
@@ -177,48 +195,57 @@ def generate_plan():
     if request.method == 'POST':
         if not profile:
             flash('请先填写个人资料。', 'warning')
-            return redirect(url_for('profile'))
-        # 调用DeepSeek服务生成计划
-        from services.deepseek_service import generate_workout_plan
-        # 生成计划
-        plan_json = generate_workout_plan(profile)
-        if not plan_json:
-            flash('生成计划失败，请稍后重试。', 'danger')
-            return redirect(url_for('generate_plan'))
-        # 解析计划并存入数据库
-        plan_data = json.loads(plan_json)
-        start_date = date.today()
-        end_date = start_date + timedelta(days=6)
-        plan_id = WeeklyPlan.create(user_id, plan_json, start_date, end_date, True)
-        # 创建每日锻炼
-        for day in plan_data.get('days', []):
-            DailyWorkout.create(plan_id, day['day'], start_date + timedelta(days=day['day']-1), json.dumps(day))
-        flash('周计划已生成！', 'success')
-        return redirect(url_for('view_plan', plan_id=plan_id))
-    # GET请求：传递个人资料给模板
-    return render_template('plan/generate.html', profile=profile)
+            return redirect(url_for('.profile'))
+        # 提交到后台任务队列，立即返回任务ID，由页面轮询任务状态
+        try:
+            job_id = submit_plan_job(user_id, profile)
+        except QueueFullError:
+            if wants_json():
+                return jsonify({'error': '当前生成任务较多，请稍后重试'}), 503
+            flash('当前生成任务较多，请稍后重试。', 'warning')
+            return redirect(url_for('.generate_plan'))
+        if wants_json():
+            return jsonify({
+                'job_id': job_id,
+                'status_url': url_for('.plan_job_status', job_id=job_id)
+            }), 202
+        return redirect(url_for('.generate_plan', job_id=job_id))
+    # GET请求：传递个人资料给模板；带job_id时页面轮询任务状态
+    job_id = request.args.get('job_id', type=int)
+    return render_template('plan/generate.html', profile=profile, job_id=job_id)
+
+# 生成计划任务状态
+@bp.route('/plan/jobs/<int:job_id>')
+@login_required
+def plan_job_status(job_id):
+    status = get_job_status(job_id, session['user_id'])
+    if not status:
+        return jsonify({'error': '任务不存在'}), 404
+    if status['status'] == 'succeeded':
+        status['plan_url'] = url_for('.view_plan', plan_id=status['plan_id'])
+    return jsonify(status)
 
 # 我的计划（重定向到活跃计划或生成页面）
-@app.route('/plan')
+@bp.route('/plan')
 @login_required
 def plan():
     user_id = session['user_id']
     plan = WeeklyPlan.get_active_plan(user_id)
     if plan:
-        return redirect(url_for('view_plan', plan_id=plan['id']))
+        return redirect(url_for('.view_plan', plan_id=plan['id']))
     else:
         flash('您还没有任何计划，请先生成一个计划。', 'info')
-        return redirect(url_for('generate_plan'))
+        return redirect(url_for('.generate_plan'))
 
 # 查看计划
-@app.route('/plan/<int:plan_id>')
+@bp.route('/plan/<int:plan_id>')
 @login_required
 def view_plan(plan_id):
     # 验证计划属于当前用户
     plan = WeeklyPlan.get_active_plan(session['user_id'])
     if not plan or plan['id'] != plan_id:
         flash('计划不存在或无权访问。', 'danger')
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('.dashboard'))
     daily_workouts = DailyWorkout.get_by_week_plan(plan_id)
     # 解析每个daily_workout的workout_json
     for dw in daily_workouts:
@@ -231,36 +258,232 @@ def view_plan(plan_id):
             dw['workout_data'] = {'focus': '未知', 'exercises': []}
     return render_template('plan/view.html', plan=plan, daily_workouts=daily_workouts)
 
+# 重新生成计划中的某一天或某几天（原地更新，不新建计划）
+@bp.route('/plan/<int:plan_id>/regenerate', methods=['POST'])
+@login_required
+def regenerate_plan_days(plan_id):
+    """
+    POST JSON {"days": [2], "note": "不想做深蹲"} 或表单 days=2&days=4&note=...
+    只替换这几天的训练内容，已完成的训练日不能重新生成。
+    """
+    user_id = session['user_id']
+    data = request.get_json(silent=True)
+    if data:
+        raw_days = data.get('days', [])
+        note = data.get('note', '')
+        if not isinstance(raw_days, list):
+            raw_days = [raw_days]
+    else:
+        raw_days = request.form.getlist('days')
+        note = request.form.get('note', '')
+    try:
+        day_numbers = sorted({int(day) for day in raw_days})
+    except (TypeError, ValueError):
+        day_numbers = []
+
+    def fail(message, status=400):
+        if wants_json():
+            return jsonify({'error': message}), status
+        flash(message, 'danger')
+        return redirect(url_for('.view_plan', plan_id=plan_id))
+
+    if not day_numbers or not all(1 <= day <= 7 for day in day_numbers):
+        return fail('请选择要重新生成的训练日（1-7）')
+    plan = WeeklyPlan.get_active_plan(user_id)
+    if not plan or plan['id'] != plan_id:
+        return fail('计划不存在或无权访问', 404)
+    profile = UserProfile.get_by_user_id(user_id)
+    if not profile:
+        return fail('请先填写个人资料')
+    completed = {dw['day_number'] for dw in DailyWorkout.get_by_week_plan(plan_id) if dw['completed']}
+    if completed & set(day_numbers):
+        return fail('已完成的训练日不能重新生成')
+
+    plan_data = json.loads(plan['plan_json'])
+    new_days, source = regenerate_days(profile, plan_data, day_numbers, (note or '').strip()[:200])
+    plan_data['days'] = [new_days.get(day.get('day'), day) for day in plan_data.get('days', [])]
+    WeeklyPlan.replace_days(plan_id, user_id, json.dumps(plan_data, ensure_ascii=False),
+                            [new_days[number] for number in day_numbers])
+    try:
+        prefetch_descriptions({'days': list(new_days.values())}, profile)
+    except Exception as e:
+        current_app.logger.warning("提交运动介绍预热失败: %s", e)
+
+    if wants_json():
+        return jsonify({'plan_id': plan_id, 'source': source,
+                        'days': [new_days[number] for number in day_numbers]})
+    flash(f"已重新生成第{'、'.join(str(n) for n in day_numbers)}天的训练。", 'success')
+    return redirect(url_for('.view_plan', plan_id=plan_id))
+
 # 完成每日锻炼
-@app.route('/daily/<int:daily_id>/complete', methods=['POST'])
+@bp.route('/daily/<int:daily_id>/complete', methods=['POST'])
 @login_required
 def complete_daily(daily_id):
-    # 验证所有权
-    # 简化为直接更新
-    conn = get_db_connection()
-    with conn.cursor() as cursor:
-        sql = "UPDATE daily_workouts SET completed = TRUE, completion_time = NOW() WHERE id = %s"
-        cursor.execute(sql, (daily_id,))
-        conn.commit()
-    conn.close()
+    # 只更新属于当前用户的锻炼，重复标记不会重复计入进度汇总
+    DailyWorkout.mark_completed(daily_id, session['user_id'])
     flash('锻炼已完成！', 'success')
-    return redirect(request.referrer or url_for('dashboard'))
+    return redirect(request.referrer or url_for('.dashboard'))
+
+# 记录动作完成情况（组数、次数、重量）
+@bp.route('/daily/<int:daily_id>/exercises', methods=['POST'])
+@login_required
+def log_exercise(daily_id):
+    """
+    POST JSON或表单：exercise_name, sets, reps, weight_kg（可选，自重动作不填）
+    写入exercise_logs，并增量更新周训练量、累计值和个人记录。
+    """
+    data = request.get_json(silent=True) or request.form
+    exercise_name = (data.get('exercise_name') or '').strip()[:100]
+    try:
+        sets = int(data.get('sets'))
+        reps = int(data.get('reps'))
+        weight_kg = float(data['weight_kg']) if data.get('weight_kg') not in (None, '') else None
+    except (TypeError, ValueError):
+        sets = reps = 0
+        weight_kg = None
+    error = None
+    if not exercise_name:
+        error = '缺少动作名称'
+    elif not (1 <= sets <= 20 and 1 <= reps <= 100):
+        error = '请输入有效的组数（1-20）和次数（1-100）'
+    elif weight_kg is not None and not (0 <= weight_kg <= 500):
+        error = '请输入有效的重量（0-500公斤）'
+    elif DailyWorkout.get_owned(daily_id, session['user_id']) is None:
+        error = '训练日不存在或无权访问'
+    if error:
+        if wants_json():
+            return jsonify({'error': error}), 400
+        flash(error, 'danger')
+        return redirect(request.referrer or url_for('.dashboard'))
+    log_id, new_record = ExerciseLog.add(session['user_id'], daily_id, exercise_name, sets, reps, weight_kg)
+    if wants_json():
+        return jsonify({'id': log_id, 'personal_record': new_record}), 201
+    flash(f'已记录 {exercise_name}。' + (' 刷新了个人记录！' if new_record else ''), 'success')
+    return redirect(request.referrer or url_for('.dashboard'))
 
 # 记录体重
-@app.route('/weight/log', methods=['POST'])
+@bp.route('/weight/log', methods=['POST'])
 @login_required
 def log_weight():
     weight = request.form.get('weight', type=float)
     notes = request.form.get('notes', '')
-    if weight and 20 <= weight <= 300:
+    if weight and WEIGHT_MIN_KG <= weight <= WEIGHT_MAX_KG:
         WeightLog.add(session['user_id'], weight, notes)
         flash('体重记录已保存。', 'success')
     else:
-        flash('请输入有效的体重（20-300公斤）。', 'danger')
-    return redirect(url_for('dashboard'))
+        flash(f'请输入有效的体重（{WEIGHT_MIN_KG}-{WEIGHT_MAX_KG}公斤）。', 'danger')
+    return redirect(url_for('.dashboard'))
+
+def _bulk_import(import_records):
+    """
+    读取上传的CSV或JSON（表单字段file，或直接作为请求体）并逐条导入。
+    返回JSON报告；表单上传时改为提示信息并回到来源页面。
+    """
+    upload = request.files.get('file')
+    if upload:
+        fmt = detect_format(upload.mimetype, upload.filename)
+        stream = upload.stream
+    else:
+        fmt = detect_format(request.content_type)
+        stream = request.stream
+    if fmt is None:
+        error = '请上传CSV或JSON（Content-Type为 text/csv、application/json 或 application/x-ndjson）'
+        if wants_json():
+            return jsonify({'error': error}), 415
+        flash(error, 'danger')
+        return redirect(request.referrer or url_for('.dashboard'))
+    report = ImportReport()
+    try:
+        import_records(session['user_id'], iter_records(stream, fmt), report)
+    except BulkImportError as e:
+        # 出错之前的批次已经写入，修正后重新上传同一文件不会产生重复记录
+        if wants_json():
+            return jsonify({**report.as_dict(), 'error': str(e)}), 400
+        flash(f'导入中断：{e}（已导入 {report.imported} 条）', 'danger')
+        return redirect(request.referrer or url_for('.dashboard'))
+    if wants_json():
+        return jsonify(report.as_dict())
+    flash(f'导入 {report.imported} 条，重复 {report.duplicates} 条，无效 {report.invalid} 条。',
+          'warning' if report.invalid or report.not_found else 'success')
+    return redirect(request.referrer or url_for('.dashboard'))
+
+# 批量导入体重记录（其他应用导出的数据、可穿戴设备同步）
+@bp.route('/api/weight/import', methods=['POST'])
+@login_required
+def import_weight_api():
+    """
+    请求体或表单字段file：CSV（表头 measured_at,weight_kg[,notes][,key]）、JSON数组或NDJSON
+    key为可选的幂等键，未提供时同一测量时间和体重的记录只导入一次。
+    返回: {received, imported, duplicates, invalid, not_found, errors: [{line, error}], truncated}
+    """
+    return _bulk_import(import_weight_logs)
+
+# 批量提交训练打卡（离线客户端补交）
+@bp.route('/api/daily/checkins', methods=['POST'])
+@login_required
+def import_checkins_api():
+    """
+    请求体或表单字段file：CSV（表头 daily_workout_id[,completed_at]）、JSON数组或NDJSON
+    已完成的训练日计入duplicates，不存在或不属于当前用户的计入not_found。
+    """
+    return _bulk_import(import_checkins)
+
+def _parse_date_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+# 体重趋势（降采样后的序列，供仪表板图表使用）
+@bp.route('/api/weight/series')
+@login_required
+def weight_series_api():
+    """
+    GET参数：start、end（YYYY-MM-DD，可选，end包含当天）；points（目标点数，默认120，最多1000）
+    返回降采样后的体重点（含7天滚动平均）、原始记录数和增重速度（kg/周）。
+    """
+    try:
+        start = _parse_date_arg('start')
+        end = _parse_date_arg('end')
+    except ValueError:
+        return jsonify({'error': '日期格式应为 YYYY-MM-DD'}), 400
+    if start and end and start > end:
+        return jsonify({'error': 'start 不能晚于 end'}), 400
+    points = request.args.get('points', DEFAULT_POINTS, type=int)
+    points = max(3, min(points, MAX_POINTS))
+    return jsonify(get_weight_series(session['user_id'], start, end, points))
+
+# 体重原始记录（键集分页）
+@bp.route('/api/weight/logs')
+@login_required
+def weight_logs_api():
+    """
+    GET参数：cursor（上一页返回的next_cursor）、limit（默认100，最多500）
+    按测量时间升序返回，next_cursor为None表示没有更多记录。
+    """
+    limit = max(1, min(request.args.get('limit', 100, type=int), 500))
+    after = None
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            measured_at, log_id = cursor.rsplit('_', 1)
+            after = (datetime.strptime(measured_at, '%Y-%m-%dT%H:%M:%S'), int(log_id))
+        except ValueError:
+            return jsonify({'error': 'cursor无效'}), 400
+    logs = WeightLog.get_page(session['user_id'], after=after, limit=limit)
+    next_cursor = None
+    if len(logs) == limit:
+        last = logs[-1]
+        next_cursor = f"{last['measured_at'].strftime('%Y-%m-%dT%H:%M:%S')}_{last['id']}"
+    return jsonify({
+        'logs': [{'id': log['id'], 'weight': float(log['weight_kg']) if log['weight_kg'] is not None else None,
+                  'measured_at': log['measured_at'].strftime('%Y-%m-%d %H:%M:%S'), 'notes': log['notes']}
+                 for log in logs],
+        'next_cursor': next_cursor,
+    })
 
 # 获取运动介绍
-@app.route('/exercise/description', methods=['GET', 'POST'])
+@bp.route('/exercise/description', methods=['GET', 'POST'])
 @login_required
 def exercise_description():
     """
@@ -296,11 +519,62 @@ def exercise_description():
         traceback.print_exc()
         return jsonify({'error': '生成介绍时发生错误', 'details': str(e)}), 500
 
-# 初始化数据库路由（仅开发用）
-@app.route('/initdb')
-def initdb():
-    init_database()
-    return 'Database tables created.'
+# 流式获取运动介绍（Server-Sent Events）
+@bp.route('/exercise/description/stream')
+@login_required
+def exercise_description_stream():
+    """
+    以SSE流式返回运动介绍。
+    GET参数: exercise_name
+    每个片段以 data: {"text": ...} 发送，结束时发送 event: done；
+    生成中途失败时发送 event: failed（已发送的内容不完整，也没有写入缓存）。
+    """
+    exercise_name = request.args.get('exercise_name')
+    if not exercise_name:
+        return jsonify({'error': '缺少运动名称参数 exercise_name'}), 400
+    profile = UserProfile.get_by_user_id(session['user_id'])
+    if not profile:
+        return jsonify({'error': '用户资料不存在，请先填写个人资料'}), 400
+    from services.deepseek_service import stream_exercise_description
+    chunks, cached = stream_exercise_description(exercise_name, profile)
+
+    def sse_event(data, event=None):
+        payload = json.dumps(data, ensure_ascii=False)
+        prefix = f"event: {event}\n" if event else ''
+        return f"{prefix}data: {payload}\n\n"
+
+    def generate():
+        try:
+            for text in chunks:
+                yield sse_event({'text': text})
+        except Exception as e:
+            current_app.logger.warning("流式返回运动介绍失败（%s）: %s", exercise_name, e)
+            yield sse_event({'error': '生成介绍时发生错误，请稍后重试', 'details': str(e)}, event='failed')
+            return
+        yield sse_event({'exercise_name': exercise_name, 'cached': cached}, event='done')
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# 运行指标（需在配置中开启 METRICS_ENABLED）
+@bp.route('/metrics')
+def metrics():
+    if not current_app.config.get('METRICS_ENABLED'):
+        return jsonify({'error': '指标接口未开启'}), 404
+    from services.deepseek_service import description_flight
+    from services.llm_client import get_llm_stats
+    return jsonify({
+        'llm': get_llm_stats(),
+        'db_pool': get_pool_stats(),
+        'plan_jobs': plan_job_queue.stats(),
+        'description_cache': get_cache_stats(),
+        'description_singleflight': description_flight.stats(),
+        'description_prefetch': get_prefetch_stats(),
+        'plan_engine': get_plan_engine_stats(),
+        'plan_templates': get_plan_template_stats(),
+    })
+
+app = create_app()
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -12,4 +12,93 @@ class Config:
     DEEPSEEK_API_KEY = os.getenv('DEEPSEEK_API_KEY')
     DEEPSEEK_BASE_URL = os.getenv('DEEPSEEK_BASE_URL', 'https://api.deepseek.com')
     SQLALCHEMY_DATABASE_URI = f"mysql+pymysql://{DATABASE_USER}:{DATABASE_PASSWORD}@{DATABASE_HOST}/{DATABASE_NAME}"
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # 数据库连接池
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+    DB_POOL_RECYCLE = float(os.getenv('DB_POOL_RECYCLE', '3600'))
+    DB_POOL_PING_INTERVAL = float(os.getenv('DB_POOL_PING_INTERVAL', '30'))
+
+    # 运行指标接口 /metrics（默认关闭）
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+
+    # 后台生成计划任务队列
+    PLAN_JOB_WORKERS = int(os.getenv('PLAN_JOB_WORKERS', '4'))
+    PLAN_JOB_MAX_PENDING = int(os.getenv('PLAN_JOB_MAX_PENDING', '32'))
+    PLAN_JOB_STALE_SECONDS = int(os.getenv('PLAN_JOB_STALE_SECONDS', '600'))
+
+    # 运动介绍内存缓存（LRU），位于SQLite缓存之前
+    DESCRIPTION_LRU_MAX_ENTRIES = int(os.getenv('DESCRIPTION_LRU_MAX_ENTRIES', '256'))
+    DESCRIPTION_LRU_MAX_BYTES = int(os.getenv('DESCRIPTION_LRU_MAX_BYTES', str(4 * 1024 * 1024)))
+    DESCRIPTION_LRU_TTL_SECONDS = int(os.getenv('DESCRIPTION_LRU_TTL_SECONDS', '3600'))
+
+    # 运动介绍持久缓存（SQLite）容量上限及后台清理间隔（秒，0表示不启动清理线程）
+    DESCRIPTION_CACHE_MAX_BYTES = int(os.getenv('DESCRIPTION_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+    DESCRIPTION_CACHE_MAX_ENTRIES = int(os.getenv('DESCRIPTION_CACHE_MAX_ENTRIES', '100000'))
+    DESCRIPTION_CACHE_SWEEP_INTERVAL = int(os.getenv('DESCRIPTION_CACHE_SWEEP_INTERVAL', '300'))
+
+    # 计划生成后预热运动介绍缓存
+    PREFETCH_ENABLED = os.getenv('PREFETCH_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    PREFETCH_CONCURRENCY = int(os.getenv('PREFETCH_CONCURRENCY', '2'))
+    PREFETCH_MAX_PER_PLAN = int(os.getenv('PREFETCH_MAX_PER_PLAN', '20'))
+
+    # 用户资料、活跃计划等查询结果的跨请求缓存秒数（仅进程内有效，0表示只做请求内去重）
+    MODEL_CACHE_TTL = int(os.getenv('MODEL_CACHE_TTL', '0'))
+
+    # DeepSeek异步客户端：同时在途的调用数上限、连接池和超时（秒）
+    LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '32'))
+    LLM_MAX_CONNECTIONS = int(os.getenv('LLM_MAX_CONNECTIONS', '64'))
+    LLM_MAX_KEEPALIVE = int(os.getenv('LLM_MAX_KEEPALIVE', '20'))
+    LLM_KEEPALIVE_EXPIRY = float(os.getenv('LLM_KEEPALIVE_EXPIRY', '30'))
+    LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', '60'))
+    # 安装了 h2 包时是否使用HTTP/2
+    LLM_HTTP2 = os.getenv('LLM_HTTP2', 'true').lower() in ('1', 'true', 'yes')
+    # 每次调用（含排队、限流和重试）的截止时间（秒）；生成计划和运动介绍分别配置
+    LLM_DEADLINE = float(os.getenv('LLM_DEADLINE', '30'))
+    LLM_PLAN_DEADLINE = float(os.getenv('LLM_PLAN_DEADLINE', '45'))
+    LLM_DESCRIPTION_DEADLINE = float(os.getenv('LLM_DESCRIPTION_DEADLINE', '20'))
+    # 重试：最多重试次数，指数退避的初始/最大等待秒数（实际等待带随机抖动）
+    LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '2'))
+    LLM_RETRY_BASE_DELAY = float(os.getenv('LLM_RETRY_BASE_DELAY', '0.5'))
+    LLM_RETRY_MAX_DELAY = float(os.getenv('LLM_RETRY_MAX_DELAY', '4'))
+    # 令牌桶限流：每秒请求数（0表示不限流）和允许的突发数，每个进程独立
+    LLM_RATE_LIMIT = float(os.getenv('LLM_RATE_LIMIT', '0'))
+    LLM_RATE_BURST = int(os.getenv('LLM_RATE_BURST', '10'))
+    # 熔断：连续失败次数阈值，熔断后多少秒放行一次试探调用
+    LLM_BREAKER_THRESHOLD = int(os.getenv('LLM_BREAKER_THRESHOLD', '5'))
+    LLM_BREAKER_RESET_SECONDS = float(os.getenv('LLM_BREAKER_RESET_SECONDS', '30'))
+
+    # 计划来源：auto（简单资料用规则引擎，其余调用DeepSeek）/ llm / local
+    PLAN_ENGINE_MODE = os.getenv('PLAN_ENGINE_MODE', 'auto').lower()
+
+    # DeepSeek计划模板：资料等价的用户复用已生成的计划
+    PLAN_TEMPLATE_ENABLED = os.getenv('PLAN_TEMPLATE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    # 每个资料指纹保存的不同模板数，不足时继续调用DeepSeek
+    PLAN_TEMPLATE_VARIANTS = int(os.getenv('PLAN_TEMPLATE_VARIANTS', '3'))
+    # 每个模板最多使用次数
+    PLAN_TEMPLATE_MAX_USES = int(os.getenv('PLAN_TEMPLATE_MAX_USES', '50'))
+    # 模板有效期（天）
+    PLAN_TEMPLATE_TTL_DAYS = int(os.getenv('PLAN_TEMPLATE_TTL_DAYS', '14'))
+    # 没有可复用的模板时，是否用去掉个人数据的资料生成新模板；为false时用完整资料为该用户单独生成，不保存为模板
+    PLAN_TEMPLATE_ANONYMOUS = os.getenv('PLAN_TEMPLATE_ANONYMOUS', 'true').lower() in ('1', 'true', 'yes')
+
+    # 批量预生成下周计划（python -m services.plan_batch run）
+    # 活跃计划在多少天内结束的用户需要预生成
+    PLAN_BATCH_HORIZON_DAYS = int(os.getenv('PLAN_BATCH_HORIZON_DAYS', '2'))
+    # 同时生成的计划数
+    PLAN_BATCH_WORKERS = int(os.getenv('PLAN_BATCH_WORKERS', '4'))
+    # 每页用户数，每页处理完记录一次断点
+    PLAN_BATCH_PAGE_SIZE = int(os.getenv('PLAN_BATCH_PAGE_SIZE', '50'))
+
+    # 体重记录和训练打卡的批量导入
+    # 每个事务写入的记录数
+    BULK_IMPORT_CHUNK_SIZE = int(os.getenv('BULK_IMPORT_CHUNK_SIZE', '500'))
+    # 每次上传最多处理的记录数，超出部分不处理（响应中 truncated 为 true）
+    BULK_IMPORT_MAX_ROWS = int(os.getenv('BULK_IMPORT_MAX_ROWS', '50000'))
+
+    # 启动时自动执行数据库迁移（默认关闭，应通过 flask init-db 或 python -m database.migrate upgrade 执行）
+    AUTO_MIGRATE = os.getenv('AUTO_MIGRATE', 'false').lower() in ('1', 'true', 'yes')
+
+    # 日志级别（DEBUG/INFO/WARNING/ERROR）
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
@@ -1,9 +1,19 @@
+import os
+import threading
+import time
+from collections import deque
+
 import pymysql
 import pymysql.cursors
 from config import Config
 
-def get_db_connection():
-    """返回一个MySQL数据库连接"""
+
+class PoolTimeoutError(pymysql.err.OperationalError):
+    """在等待超时时间内无法从连接池获取连接"""
+
+
+def _create_raw_connection():
+    """新建一个真实的MySQL连接"""
     return pymysql.connect(
         host=Config.DATABASE_HOST,
         user=Config.DATABASE_USER,
@@ -13,6 +23,224 @@ def get_db_connection():
         charset='utf8mb4'
     )
 
+
+class PooledConnection:
+    """
+    连接池中借出的连接。
+    行为与PyMySQL连接一致，但close()会把连接归还连接池而不是断开。
+    """
+
+    def __init__(self, pool, raw, created_at):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+
+    def __getattr__(self, name):
+        raw = self.__dict__.get('_raw')
+        if raw is None:
+            raise pymysql.err.InterfaceError(0, '连接已归还连接池')
+        return getattr(raw, name)
+
+    def close(self):
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._pool._release(raw, self._created_at)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ConnectionPool:
+    """
+    有界、线程安全、感知fork的MySQL连接池。
+    - max_size: 最大连接数（空闲 + 借出）
+    - timeout: 连接池耗尽时等待的秒数
+    - recycle: 连接最大存活秒数，超过后重建
+    - ping_interval: 空闲超过该秒数的连接在借出前先ping检查
+    """
+
+    def __init__(self, max_size=10, timeout=30, recycle=3600, ping_interval=30,
+                 connect=_create_raw_connection):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_interval = ping_interval
+        self._connect = connect
+        self._init_state()
+
+    def _init_state(self):
+        self._pid = os.getpid()
+        self._cond = threading.Condition(threading.Lock())
+        self._idle = deque()  # (raw, created_at, last_used)
+        self._size = 0
+        self._stats = {
+            'acquired': 0,
+            'created': 0,
+            'recycled': 0,
+            'discarded': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+        }
+
+    def _check_fork(self):
+        # 子进程不能复用父进程的socket：直接丢弃引用并重建状态，
+        # 不向服务器发送QUIT，避免影响父进程的会话。
+        if self._pid != os.getpid():
+            self._init_state()
+
+    def reset(self):
+        """丢弃所有空闲连接（用于fork之后或测试）"""
+        if self._pid != os.getpid():
+            self._init_state()
+            return
+        with self._cond:
+            idle, self._idle = self._idle, deque()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for raw, _, _ in idle:
+            self._close_quietly(raw)
+
+    def acquire(self):
+        """从连接池借出一个连接"""
+        self._check_fork()
+        start = time.monotonic()
+        deadline = start + self.timeout
+        waited = False
+        with self._cond:
+            while True:
+                if self._idle:
+                    raw, created_at, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    raw = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeoutError(0, f'等待数据库连接超时（{self.timeout}秒）')
+                waited = True
+                self._cond.wait(remaining)
+            wait_time = time.monotonic() - start
+            self._stats['acquired'] += 1
+            if waited:
+                self._stats['waits'] += 1
+                self._stats['wait_time_total'] += wait_time
+                self._stats['wait_time_max'] = max(self._stats['wait_time_max'], wait_time)
+
+        try:
+            if raw is not None:
+                raw, created_at = self._validate(raw, created_at, last_used)
+            if raw is None:
+                raw = self._connect()
+                created_at = time.monotonic()
+                with self._cond:
+                    self._stats['created'] += 1
+        except Exception:
+            # 建连失败，释放占用的名额
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        return PooledConnection(self, raw, created_at)
+
+    def _validate(self, raw, created_at, last_used):
+        """检查空闲连接是否可用；不可用时返回(None, None)由调用方重建"""
+        now = time.monotonic()
+        if now - created_at > self.recycle:
+            self._close_quietly(raw)
+            with self._cond:
+                self._stats['recycled'] += 1
+            return None, None
+        if now - last_used > self.ping_interval:
+            try:
+                raw.ping(reconnect=False)
+            except Exception:
+                self._close_quietly(raw)
+                with self._cond:
+                    self._stats['discarded'] += 1
+                return None, None
+        return raw, created_at
+
+    def _release(self, raw, created_at):
+        """归还连接；回滚未提交的事务，避免下一个使用者看到旧快照"""
+        if self._pid != os.getpid():
+            # 父进程借出的连接在子进程中归还，直接丢弃
+            return
+        try:
+            if not raw.open:
+                raise pymysql.err.InterfaceError(0, '连接已断开')
+            raw.rollback()
+        except Exception:
+            self._close_quietly(raw)
+            with self._cond:
+                self._size -= 1
+                self._stats['discarded'] += 1
+                self._cond.notify()
+            return
+        with self._cond:
+            self._idle.append((raw, created_at, time.monotonic()))
+            self._cond.notify()
+
+    @staticmethod
+    def _close_quietly(raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def stats(self):
+        """返回连接池状态和等待时间统计"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats['size'] = self._size
+            stats['idle'] = len(self._idle)
+            stats['in_use'] = self._size - len(self._idle)
+            stats['max_size'] = self.max_size
+        waits = stats['waits']
+        stats['wait_time_avg'] = stats['wait_time_total'] / waits if waits else 0.0
+        return stats
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """返回进程内共享的连接池（首次使用时创建）"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    max_size=Config.DB_POOL_SIZE,
+                    timeout=Config.DB_POOL_TIMEOUT,
+                    recycle=Config.DB_POOL_RECYCLE,
+                    ping_interval=Config.DB_POOL_PING_INTERVAL,
+                )
+    return _pool
+
+
+def reset_pool():
+    """丢弃当前进程的所有空闲连接（gunicorn post_fork等场景调用）"""
+    if _pool is not None:
+        _pool.reset()
+
+
+def get_pool_stats():
+    """返回连接池统计信息"""
+    return get_pool().stats()
+
+
+def get_db_connection():
+    """从连接池借出一个MySQL连接，使用完毕后调用close()归还"""
+    return get_pool().acquire()
+
 def execute_query(query, args=None, fetchone=False, fetchall=False):
     """执行SQL查询并返回结果"""
     conn = get_db_connection()
@@ -31,90 +259,10 @@ def execute_query(query, args=None, fetchone=False, fetchall=False):
         conn.close()
 
 def init_database():
-    """初始化所有表（如果不存在）"""
-    conn = get_db_connection()
-    with conn.cursor() as cursor:
-        # users
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                username VARCHAR(50) UNIQUE NOT NULL,
-                password_hash VARCHAR(255) NOT NULL,
-                email VARCHAR(100),
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        # user_profiles
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_profiles (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT NOT NULL,
-                age INT,
-                height_cm DECIMAL(5,2),
-                current_weight_kg DECIMAL(5,2),
-                target_weight_kg DECIMAL(5,2),
-                body_fat_percent DECIMAL(4,2),
-                available_equipment TEXT,
-                training_experience ENUM('beginner','intermediate','advanced'),
-                preferences TEXT,
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-            )
-        ''')
-        # weekly_plans
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS weekly_plans (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT NOT NULL,
-                plan_json TEXT,
-                generated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                start_date DATE,
-                end_date DATE,
-                is_active BOOLEAN DEFAULT TRUE,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-            )
-        ''')
-        # daily_workouts
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS daily_workouts (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                weekly_plan_id INT NOT NULL,
-                day_number INT,
-                date DATE,
-                workout_json TEXT,
-                completed BOOLEAN DEFAULT FALSE,
-                completion_time DATETIME,
-                user_notes TEXT,
-                FOREIGN KEY (weekly_plan_id) REFERENCES weekly_plans(id) ON DELETE CASCADE
-            )
-        ''')
-        # weight_logs
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS weight_logs (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT NOT NULL,
-                weight_kg DECIMAL(5,2),
-                measured_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                notes TEXT,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-            )
-        ''')
-        # exercise_logs
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS exercise_logs (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                daily_workout_id INT NOT NULL,
-                exercise_name VARCHAR(100),
-                sets INT,
-                reps INT,
-                weight_kg DECIMAL(5,2),
-                completed BOOLEAN DEFAULT FALSE,
-                FOREIGN KEY (daily_workout_id) REFERENCES daily_workouts(id) ON DELETE CASCADE
-            )
-        ''')
-        conn.commit()
-    conn.close()
-    print("MySQL数据库表初始化完成。")
+    """初始化数据库结构：执行所有尚未应用的迁移（见 database/migrations）"""
+    from database.migrate import migrate
+    applied = migrate()
+    print(f"MySQL数据库结构已是最新（本次应用 {len(applied)} 个迁移）。")
 
 if __name__ == '__main__':
     init_database()
\ No newline at end of file
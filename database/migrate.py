@@ -0,0 +1,227 @@
+"""
+版本化的数据库迁移执行器。
+
+    python -m database.migrate upgrade    # 执行所有未应用的迁移
+    python -m database.migrate status     # 查看已应用/待应用的迁移
+    python -m database.migrate check      # 用EXPLAIN检查热点查询是否使用了索引
+
+迁移文件位于 database/migrations，按文件名中的编号顺序执行。
+执行期间持有MySQL命名锁，多个进程同时启动时只有一个会真正执行迁移。
+"""
+import argparse
+import importlib
+import pkgutil
+import re
+import sys
+
+from database.db_connection import get_db_connection
+
+MIGRATIONS_PACKAGE = 'database.migrations'
+MIGRATION_LOCK_NAME = 'leangain_schema_migrate'
+MIGRATION_LOCK_TIMEOUT = 60
+
+# 热点查询及其应当使用的索引，供 check_query_plans() 检查
+HOT_QUERIES = [
+    {
+        'name': 'WeightLog.get_by_user',
+        'sql': "SELECT * FROM weight_logs WHERE user_id = %s ORDER BY measured_at DESC LIMIT %s",
+        'args': (1, 10),
+        'table': 'weight_logs',
+        'index': 'idx_weight_logs_user_measured',
+    },
+    {
+        'name': 'WeightLog.get_page',
+        'sql': ("SELECT id, weight_kg, measured_at, notes FROM weight_logs "
+                "WHERE user_id = %s AND (measured_at > %s OR (measured_at = %s AND id > %s)) "
+                "ORDER BY measured_at, id LIMIT %s"),
+        'args': (1, '2024-01-01', '2024-01-01', 0, 100),
+        'table': 'weight_logs',
+        'index': 'idx_weight_logs_user_measured',
+    },
+    {
+        'name': 'WeeklyPlan.get_active_plan',
+        'sql': ("SELECT * FROM weekly_plans WHERE user_id = %s AND is_active = TRUE "
+                "ORDER BY generated_at DESC LIMIT 1"),
+        'args': (1,),
+        'table': 'weekly_plans',
+        'index': 'idx_weekly_plans_user_active_generated',
+    },
+    {
+        'name': 'DailyWorkout.get_by_week_plan',
+        'sql': "SELECT * FROM daily_workouts WHERE weekly_plan_id = %s ORDER BY day_number",
+        'args': (1,),
+        'table': 'daily_workouts',
+        'index': 'idx_daily_workouts_plan_day',
+    },
+]
+
+
+def index_exists(cursor, table, index_name):
+    cursor.execute(
+        """SELECT 1 FROM information_schema.statistics
+           WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s LIMIT 1""",
+        (table, index_name)
+    )
+    return cursor.fetchone() is not None
+
+
+def create_index_if_missing(cursor, table, index_name, columns, unique=False):
+    """MySQL不支持 CREATE INDEX IF NOT EXISTS，先查询information_schema再创建"""
+    if index_exists(cursor, table, index_name):
+        return False
+    kind = 'UNIQUE INDEX' if unique else 'INDEX'
+    cursor.execute(f"CREATE {kind} {index_name} ON {table} ({', '.join(columns)})")
+    return True
+
+
+def column_exists(cursor, table, column):
+    cursor.execute(
+        """SELECT 1 FROM information_schema.columns
+           WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s LIMIT 1""",
+        (table, column)
+    )
+    return cursor.fetchone() is not None
+
+
+def discover_migrations():
+    """返回按版本号排序的 [(version, name, module_name)]"""
+    package = importlib.import_module(MIGRATIONS_PACKAGE)
+    migrations = []
+    for info in pkgutil.iter_modules(package.__path__):
+        match = re.match(r'^(\d{4})_(\w+)$', info.name)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), f"{MIGRATIONS_PACKAGE}.{info.name}"))
+    migrations.sort()
+    versions = [m[0] for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError('存在重复的迁移版本号')
+    return migrations
+
+
+def _ensure_version_table(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def _applied_versions(cursor):
+    cursor.execute("SELECT version FROM schema_version")
+    return {row['version'] for row in cursor.fetchall()}
+
+
+def current_version():
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            _ensure_version_table(cursor)
+            cursor.execute("SELECT MAX(version) AS version FROM schema_version")
+            row = cursor.fetchone()
+        conn.commit()
+    finally:
+        conn.close()
+    return row['version'] or 0
+
+
+def migrate(target=None):
+    """
+    按顺序执行所有未应用（且版本号不超过target）的迁移。
+    返回: 本次应用的迁移版本号列表
+    """
+    applied_now = []
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT GET_LOCK(%s, %s) AS locked", (MIGRATION_LOCK_NAME, MIGRATION_LOCK_TIMEOUT))
+            if not cursor.fetchone()['locked']:
+                raise RuntimeError('等待迁移锁超时，可能有其他进程正在执行迁移')
+            try:
+                _ensure_version_table(cursor)
+                applied = _applied_versions(cursor)
+                for version, name, module_name in discover_migrations():
+                    if version in applied or (target is not None and version > target):
+                        continue
+                    print(f"应用迁移 {version:04d}_{name} ...")
+                    module = importlib.import_module(module_name)
+                    module.upgrade(cursor)
+                    cursor.execute("INSERT INTO schema_version (version, name) VALUES (%s, %s)",
+                                   (version, name))
+                    conn.commit()
+                    applied_now.append(version)
+            finally:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK_NAME,))
+    finally:
+        conn.close()
+    return applied_now
+
+
+def migration_status():
+    """返回 [(version, name, 是否已应用)]"""
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            _ensure_version_table(cursor)
+            applied = _applied_versions(cursor)
+        conn.commit()
+    finally:
+        conn.close()
+    return [(version, name, version in applied) for version, name, _ in discover_migrations()]
+
+
+def check_query_plans():
+    """
+    对热点查询执行EXPLAIN，检查是否使用了预期的索引且没有filesort。
+    表中数据很少时优化器可能选择全表扫描，应在有代表性数据的环境中运行。
+    返回: [{name, index, key, extra, ok}]
+    """
+    results = []
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            for query in HOT_QUERIES:
+                cursor.execute("EXPLAIN " + query['sql'], query['args'])
+                rows = [r for r in cursor.fetchall() if r.get('table') == query['table']]
+                row = rows[0] if rows else {}
+                key = row.get('key')
+                extra = row.get('Extra') or ''
+                results.append({
+                    'name': query['name'],
+                    'index': query['index'],
+                    'key': key,
+                    'extra': extra,
+                    'ok': key == query['index'] and 'filesort' not in extra,
+                })
+    finally:
+        conn.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='数据库迁移')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    upgrade = subparsers.add_parser('upgrade', help='执行未应用的迁移')
+    upgrade.add_argument('--target', type=int, help='只迁移到指定版本')
+    subparsers.add_parser('status', help='查看迁移状态')
+    subparsers.add_parser('check', help='用EXPLAIN检查热点查询的索引使用情况')
+    args = parser.parse_args()
+
+    if args.command == 'upgrade':
+        applied = migrate(args.target)
+        print(f"已应用 {len(applied)} 个迁移，当前版本 {current_version()}。")
+    elif args.command == 'status':
+        for version, name, applied in migration_status():
+            print(f"{'[x]' if applied else '[ ]'} {version:04d}_{name}")
+    elif args.command == 'check':
+        results = check_query_plans()
+        for r in results:
+            status = 'OK ' if r['ok'] else 'BAD'
+            print(f"{status} {r['name']}: key={r['key']} (期望 {r['index']}) {r['extra']}")
+        if not all(r['ok'] for r in results):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
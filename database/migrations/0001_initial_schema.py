@@ -0,0 +1,100 @@
+"""
+初始表结构：与原 init_database() 创建的表一致。
+已有数据库中这些表已存在，CREATE TABLE IF NOT EXISTS 不会改动它们。
+"""
+
+
+def upgrade(cursor):
+    # users
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            username VARCHAR(50) UNIQUE NOT NULL,
+            password_hash VARCHAR(255) NOT NULL,
+            email VARCHAR(100),
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # user_profiles
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_profiles (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT NOT NULL,
+            age INT,
+            height_cm DECIMAL(5,2),
+            current_weight_kg DECIMAL(5,2),
+            target_weight_kg DECIMAL(5,2),
+            body_fat_percent DECIMAL(4,2),
+            available_equipment TEXT,
+            training_experience ENUM('beginner','intermediate','advanced'),
+            preferences TEXT,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    ''')
+    # weekly_plans
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS weekly_plans (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT NOT NULL,
+            plan_json TEXT,
+            generated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            start_date DATE,
+            end_date DATE,
+            is_active BOOLEAN DEFAULT TRUE,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    ''')
+    # daily_workouts
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_workouts (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            weekly_plan_id INT NOT NULL,
+            day_number INT,
+            date DATE,
+            workout_json TEXT,
+            completed BOOLEAN DEFAULT FALSE,
+            completion_time DATETIME,
+            user_notes TEXT,
+            FOREIGN KEY (weekly_plan_id) REFERENCES weekly_plans(id) ON DELETE CASCADE
+        )
+    ''')
+    # weight_logs
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS weight_logs (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT NOT NULL,
+            weight_kg DECIMAL(5,2),
+            measured_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            notes TEXT,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    ''')
+    # exercise_logs
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS exercise_logs (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            daily_workout_id INT NOT NULL,
+            exercise_name VARCHAR(100),
+            sets INT,
+            reps INT,
+            weight_kg DECIMAL(5,2),
+            completed BOOLEAN DEFAULT FALSE,
+            FOREIGN KEY (daily_workout_id) REFERENCES daily_workouts(id) ON DELETE CASCADE
+        )
+    ''')
+    # plan_jobs（后台生成计划任务）
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS plan_jobs (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT NOT NULL,
+            status ENUM('queued','running','succeeded','failed') DEFAULT 'queued',
+            weekly_plan_id INT,
+            error TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            started_at DATETIME,
+            finished_at DATETIME,
+            INDEX idx_plan_jobs_user_status (user_id, status),
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    ''')
@@ -0,0 +1,16 @@
+"""
+为模型层的热点查询添加复合索引，避免按user_id过滤后再filesort：
+- weight_logs(user_id, measured_at)：WeightLog.get_by_user
+- weekly_plans(user_id, is_active, generated_at)：WeeklyPlan.get_active_plan
+- daily_workouts(weekly_plan_id, day_number)：DailyWorkout.get_by_week_plan
+"""
+from database.migrate import create_index_if_missing
+
+
+def upgrade(cursor):
+    create_index_if_missing(cursor, 'weight_logs', 'idx_weight_logs_user_measured',
+                            ['user_id', 'measured_at'])
+    create_index_if_missing(cursor, 'weekly_plans', 'idx_weekly_plans_user_active_generated',
+                            ['user_id', 'is_active', 'generated_at'])
+    create_index_if_missing(cursor, 'daily_workouts', 'idx_daily_workouts_plan_day',
+                            ['weekly_plan_id', 'day_number'])
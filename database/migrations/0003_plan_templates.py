@@ -0,0 +1,24 @@
+"""
+计划模板：按归一化的资料指纹保存DeepSeek生成并通过校验的计划，供资料等价的用户复用。
+weekly_plans.template_id 记录计划来自哪个模板，用于避免同一用户连续拿到同一个模板。
+"""
+from database.migrate import column_exists
+
+
+def upgrade(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS plan_templates (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            fingerprint CHAR(40) NOT NULL,
+            profile_json TEXT NOT NULL,
+            plan_json LONGTEXT NOT NULL,
+            use_count INT NOT NULL DEFAULT 0,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            last_used_at DATETIME NULL,
+            expires_at DATETIME NOT NULL,
+            INDEX idx_plan_templates_fingerprint_expires (fingerprint, expires_at),
+            INDEX idx_plan_templates_expires (expires_at)
+        )
+    ''')
+    if not column_exists(cursor, 'weekly_plans', 'template_id'):
+        cursor.execute("ALTER TABLE weekly_plans ADD COLUMN template_id INT NULL")
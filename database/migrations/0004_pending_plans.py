@@ -0,0 +1,34 @@
+"""
+批量预生成下周计划：
+- weekly_plans.is_pending 标记已生成、到开始日期才生效的计划
+- plan_batch_runs 记录每次批量运行的进度（断点）和统计，中断后同一天再次运行从断点继续
+"""
+from database.migrate import column_exists, create_index_if_missing
+
+
+def upgrade(cursor):
+    if not column_exists(cursor, 'weekly_plans', 'is_pending'):
+        cursor.execute("ALTER TABLE weekly_plans ADD COLUMN is_pending BOOLEAN NOT NULL DEFAULT FALSE")
+    # 批量任务查找即将到期的活跃计划
+    create_index_if_missing(cursor, 'weekly_plans', 'idx_weekly_plans_active_end', ['is_active', 'end_date'])
+    # 激活到期的待生效计划
+    create_index_if_missing(cursor, 'weekly_plans', 'idx_weekly_plans_pending_start', ['is_pending', 'start_date'])
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS plan_batch_runs (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            run_date DATE NOT NULL,
+            horizon_days INT NOT NULL,
+            status ENUM('running', 'finished') NOT NULL DEFAULT 'running',
+            last_user_id INT NOT NULL DEFAULT 0,
+            processed INT NOT NULL DEFAULT 0,
+            succeeded INT NOT NULL DEFAULT 0,
+            failed INT NOT NULL DEFAULT 0,
+            skipped INT NOT NULL DEFAULT 0,
+            elapsed_seconds DOUBLE NOT NULL DEFAULT 0,
+            report TEXT,
+            started_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            finished_at DATETIME NULL,
+            UNIQUE KEY uniq_plan_batch_runs_date_horizon (run_date, horizon_days)
+        )
+    ''')
@@ -0,0 +1,154 @@
+"""
+训练记录和进度汇总表。
+exercise_logs 增加 user_id 和记录时间；以下汇总表在写入时增量维护（与写入在同一事务中），
+仪表板和统计只需按用户读取少量行，不必扫描历史记录：
+- user_progress: 每个用户一行（累计完成训练数、累计训练量、最新体重等）
+- user_weekly_stats: 每个用户每周一行（训练量、组数、完成训练数、周末体重）
+- user_personal_records: 每个用户每个动作一行（最大重量、单组最大训练量）
+最后用已有数据回填汇总表。
+"""
+from database.migrate import column_exists, create_index_if_missing
+
+
+def upgrade(cursor):
+    if not column_exists(cursor, 'exercise_logs', 'user_id'):
+        cursor.execute("ALTER TABLE exercise_logs ADD COLUMN user_id INT NULL AFTER daily_workout_id")
+        cursor.execute('''
+            UPDATE exercise_logs e
+            JOIN daily_workouts d ON d.id = e.daily_workout_id
+            JOIN weekly_plans p ON p.id = d.weekly_plan_id
+            SET e.user_id = p.user_id
+        ''')
+    if not column_exists(cursor, 'exercise_logs', 'logged_at'):
+        cursor.execute("ALTER TABLE exercise_logs ADD COLUMN logged_at DATETIME DEFAULT CURRENT_TIMESTAMP")
+    create_index_if_missing(cursor, 'exercise_logs', 'idx_exercise_logs_user_logged', ['user_id', 'logged_at'])
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_progress (
+            user_id INT PRIMARY KEY,
+            workouts_completed INT NOT NULL DEFAULT 0,
+            exercises_logged INT NOT NULL DEFAULT 0,
+            volume_kg DECIMAL(14,2) NOT NULL DEFAULT 0,
+            first_weight_kg DECIMAL(5,2) NULL,
+            first_weight_at DATETIME NULL,
+            latest_weight_kg DECIMAL(5,2) NULL,
+            latest_weight_at DATETIME NULL,
+            weight_logs INT NOT NULL DEFAULT 0,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_weekly_stats (
+            user_id INT NOT NULL,
+            week_start DATE NOT NULL,
+            workouts_completed INT NOT NULL DEFAULT 0,
+            exercises_logged INT NOT NULL DEFAULT 0,
+            sets_done INT NOT NULL DEFAULT 0,
+            reps_done INT NOT NULL DEFAULT 0,
+            volume_kg DECIMAL(12,2) NOT NULL DEFAULT 0,
+            last_weight_kg DECIMAL(5,2) NULL,
+            last_weight_at DATETIME NULL,
+            PRIMARY KEY (user_id, week_start),
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_personal_records (
+            user_id INT NOT NULL,
+            exercise_name VARCHAR(100) NOT NULL,
+            max_weight_kg DECIMAL(5,2) NOT NULL DEFAULT 0,
+            max_weight_reps INT NOT NULL DEFAULT 0,
+            max_weight_at DATETIME NULL,
+            best_set_volume_kg DECIMAL(10,2) NOT NULL DEFAULT 0,
+            best_set_volume_at DATETIME NULL,
+            PRIMARY KEY (user_id, exercise_name),
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    ''')
+    _backfill(cursor)
+
+
+def _backfill(cursor):
+    # 按周的完成训练数
+    cursor.execute('''
+        INSERT INTO user_weekly_stats (user_id, week_start, workouts_completed)
+        SELECT p.user_id, DATE(DATE_SUB(d.completion_time, INTERVAL WEEKDAY(d.completion_time) DAY)), COUNT(*)
+        FROM daily_workouts d JOIN weekly_plans p ON p.id = d.weekly_plan_id
+        WHERE d.completed = TRUE AND d.completion_time IS NOT NULL
+        GROUP BY 1, 2
+        ON DUPLICATE KEY UPDATE workouts_completed = VALUES(workouts_completed)
+    ''')
+    # 按周的动作记录和训练量
+    cursor.execute('''
+        INSERT INTO user_weekly_stats (user_id, week_start, exercises_logged, sets_done, reps_done, volume_kg)
+        SELECT user_id, DATE(DATE_SUB(logged_at, INTERVAL WEEKDAY(logged_at) DAY)), COUNT(*),
+               SUM(COALESCE(sets, 0)), SUM(COALESCE(sets, 0) * COALESCE(reps, 0)),
+               SUM(COALESCE(sets, 0) * COALESCE(reps, 0) * COALESCE(weight_kg, 0))
+        FROM exercise_logs
+        WHERE user_id IS NOT NULL AND completed = TRUE
+        GROUP BY 1, 2
+        ON DUPLICATE KEY UPDATE exercises_logged = VALUES(exercises_logged), sets_done = VALUES(sets_done),
+                                reps_done = VALUES(reps_done), volume_kg = VALUES(volume_kg)
+    ''')
+    # 每周最后一次体重
+    cursor.execute('''
+        INSERT INTO user_weekly_stats (user_id, week_start, last_weight_kg, last_weight_at)
+        SELECT w.user_id, DATE(DATE_SUB(w.measured_at, INTERVAL WEEKDAY(w.measured_at) DAY)), w.weight_kg, w.measured_at
+        FROM weight_logs w
+        JOIN (
+            SELECT user_id, MAX(measured_at) AS measured_at FROM weight_logs
+            GROUP BY user_id, YEARWEEK(measured_at, 3)
+        ) last ON last.user_id = w.user_id AND last.measured_at = w.measured_at
+        ON DUPLICATE KEY UPDATE last_weight_kg = VALUES(last_weight_kg), last_weight_at = VALUES(last_weight_at)
+    ''')
+    # 用户累计值
+    cursor.execute('''
+        INSERT INTO user_progress (user_id, workouts_completed, exercises_logged, volume_kg)
+        SELECT user_id, SUM(workouts_completed), SUM(exercises_logged), SUM(volume_kg)
+        FROM user_weekly_stats GROUP BY user_id
+        ON DUPLICATE KEY UPDATE workouts_completed = VALUES(workouts_completed),
+                                exercises_logged = VALUES(exercises_logged), volume_kg = VALUES(volume_kg)
+    ''')
+    cursor.execute('''
+        INSERT INTO user_progress (user_id, weight_logs, first_weight_at, latest_weight_at)
+        SELECT user_id, COUNT(*), MIN(measured_at), MAX(measured_at) FROM weight_logs GROUP BY user_id
+        ON DUPLICATE KEY UPDATE weight_logs = VALUES(weight_logs), first_weight_at = VALUES(first_weight_at),
+                                latest_weight_at = VALUES(latest_weight_at)
+    ''')
+    cursor.execute('''
+        UPDATE user_progress u
+        SET first_weight_kg = (SELECT weight_kg FROM weight_logs w
+                               WHERE w.user_id = u.user_id AND w.measured_at = u.first_weight_at LIMIT 1),
+            latest_weight_kg = (SELECT weight_kg FROM weight_logs w
+                                WHERE w.user_id = u.user_id AND w.measured_at = u.latest_weight_at LIMIT 1)
+        WHERE u.weight_logs > 0
+    ''')
+    # 个人记录：取达到最大重量 / 最大单组训练量的那一条记录（次数和时间都来自该行）。
+    # 增量更新只在严格超过旧记录时刷新，并列时保留最早的一条，这里按相同规则选取
+    cursor.execute('''
+        INSERT INTO user_personal_records (user_id, exercise_name, max_weight_kg, max_weight_reps, max_weight_at,
+                                           best_set_volume_kg, best_set_volume_at)
+        SELECT h.user_id, h.exercise_name, h.weight_kg, h.reps, h.logged_at, v.volume_kg, v.logged_at
+        FROM (
+            SELECT user_id, exercise_name, COALESCE(weight_kg, 0) AS weight_kg, COALESCE(reps, 0) AS reps,
+                   logged_at,
+                   ROW_NUMBER() OVER (PARTITION BY user_id, exercise_name
+                                      ORDER BY COALESCE(weight_kg, 0) DESC, logged_at, id) AS rn
+            FROM exercise_logs
+            WHERE user_id IS NOT NULL AND completed = TRUE AND exercise_name IS NOT NULL
+        ) h
+        JOIN (
+            SELECT user_id, exercise_name, COALESCE(reps, 0) * COALESCE(weight_kg, 0) AS volume_kg, logged_at,
+                   ROW_NUMBER() OVER (PARTITION BY user_id, exercise_name
+                                      ORDER BY COALESCE(reps, 0) * COALESCE(weight_kg, 0) DESC,
+                                               logged_at, id) AS rn
+            FROM exercise_logs
+            WHERE user_id IS NOT NULL AND completed = TRUE AND exercise_name IS NOT NULL
+        ) v ON v.user_id = h.user_id AND v.exercise_name = h.exercise_name AND v.rn = 1
+        WHERE h.rn = 1
+        ON DUPLICATE KEY UPDATE max_weight_kg = VALUES(max_weight_kg), max_weight_reps = VALUES(max_weight_reps),
+                                max_weight_at = VALUES(max_weight_at),
+                                best_set_volume_kg = VALUES(best_set_volume_kg),
+                                best_set_volume_at = VALUES(best_set_volume_at)
+    ''')
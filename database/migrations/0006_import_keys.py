@@ -0,0 +1,13 @@
+"""
+批量导入体重记录的幂等键：
+- weight_logs.import_key 由客户端提供（或由测量时间和体重生成），同一用户内唯一，
+  重试上传同一批数据不会产生重复记录；手动记录的体重该列为NULL，不受唯一约束影响
+"""
+from database.migrate import column_exists, create_index_if_missing
+
+
+def upgrade(cursor):
+    if not column_exists(cursor, 'weight_logs', 'import_key'):
+        cursor.execute("ALTER TABLE weight_logs ADD COLUMN import_key VARCHAR(64) NULL")
+    create_index_if_missing(cursor, 'weight_logs', 'uniq_weight_logs_user_import_key',
+                            ['user_id', 'import_key'], unique=True)
@@ -0,0 +1,6 @@
+"""
+数据库迁移。
+每个迁移是一个名为 NNNN_description.py 的模块，提供 upgrade(cursor) 函数，
+按编号顺序执行，已执行的版本记录在 schema_version 表中。
+MySQL的DDL会隐式提交，迁移应写成可重复执行的形式（IF NOT EXISTS 或先检查再修改）。
+"""
@@ -1,84 +1,177 @@
 from database.db_connection import get_db_connection
-from datetime import datetime
+from config import Config
+from contextvars import ContextVar
+from datetime import date, datetime, timedelta
+import copy
 import json
+import threading
+import time
+
+# 查询结果缓存分两层：
+# 1. 请求级身份映射：同一请求内同一行只查询一次（由app在请求开始/结束时开启/关闭）
+# 2. 可选的跨请求TTL缓存（MODEL_CACHE_TTL > 0 时启用，仅在本进程内有效），
+#    写操作会显式失效相关条目
+_identity_map = ContextVar('identity_map', default=None)
+_MISSING = object()
+
+class _TTLCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return _MISSING
+            expires_at, value = item
+            if time.monotonic() > expires_at:
+                del self._data[key]
+                return _MISSING
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+_shared_cache = _TTLCache()
+
+def begin_request_scope():
+    """开启请求级身份映射"""
+    _identity_map.set({})
+
+def end_request_scope():
+    """关闭请求级身份映射"""
+    _identity_map.set(None)
+
+def invalidate(*key):
+    """使某个缓存条目失效，如 invalidate('profile', user_id)"""
+    scope = _identity_map.get()
+    if scope is not None:
+        scope.pop(key, None)
+    _shared_cache.delete(key)
+
+def clear_model_cache():
+    _shared_cache.clear()
+
+def _cached(key, loader):
+    """
+    按key返回查询结果，依次查请求级身份映射、跨请求TTL缓存，都未命中时调用loader。
+    返回深拷贝，调用方修改结果不会影响缓存。
+    """
+    scope = _identity_map.get()
+    if scope is not None and key in scope:
+        return copy.deepcopy(scope[key])
+    ttl = Config.MODEL_CACHE_TTL
+    value = _shared_cache.get(key) if ttl > 0 else _MISSING
+    if value is _MISSING:
+        value = loader()
+        if ttl > 0:
+            _shared_cache.set(key, value, ttl)
+    if scope is not None:
+        scope[key] = value
+    return copy.deepcopy(value)
 
 class User:
     @staticmethod
     def create(username, password_hash, email=None):
         conn = get_db_connection()
-        with conn.cursor() as cursor:
-            sql = "INSERT INTO users (username, password_hash, email) VALUES (%s, %s, %s)"
-            cursor.execute(sql, (username, password_hash, email))
-            conn.commit()
-            user_id = cursor.lastrowid
-        conn.close()
+        try:
+            with conn.cursor() as cursor:
+                sql = "INSERT INTO users (username, password_hash, email) VALUES (%s, %s, %s)"
+                cursor.execute(sql, (username, password_hash, email))
+                conn.commit()
+                user_id = cursor.lastrowid
+        finally:
+            conn.close()
         return user_id
 
     @staticmethod
     def get_by_username(username):
         conn = get_db_connection()
-        with conn.cursor() as cursor:
-            sql = "SELECT * FROM users WHERE username = %s"
-            cursor.execute(sql, (username,))
-            user = cursor.fetchone()
-        conn.close()
+        try:
+            with conn.cursor() as cursor:
+                sql = "SELECT * FROM users WHERE username = %s"
+                cursor.execute(sql, (username,))
+                user = cursor.fetchone()
+        finally:
+            conn.close()
         return user
 
     @staticmethod
     def get_by_id(user_id):
         conn = get_db_connection()
-        with conn.cursor() as cursor:
-            sql = "SELECT * FROM users WHERE id = %s"
-            cursor.execute(sql, (user_id,))
-            user = cursor.fetchone()
-        conn.close()
+        try:
+            with conn.cursor() as cursor:
+                sql = "SELECT * FROM users WHERE id = %s"
+                cursor.execute(sql, (user_id,))
+                user = cursor.fetchone()
+        finally:
+            conn.close()
         return user
 
 class UserProfile:
     @staticmethod
     def create_or_update(user_id, **data):
         conn = get_db_connection()
-        with conn.cursor() as cursor:
-            # 检查是否存在
-            sql = "SELECT id FROM user_profiles WHERE user_id = %s"
-            cursor.execute(sql, (user_id,))
-            existing = cursor.fetchone()
-            if existing:
-                # 更新
-                fields = []
-                values = []
-                for key, value in data.items():
-                    if key == 'available_equipment' or key == 'preferences':
-                        value = json.dumps(value, ensure_ascii=False)
-                    fields.append(f"{key} = %s")
-                    values.append(value)
-                values.append(user_id)
-                sql = f"UPDATE user_profiles SET {', '.join(fields)} WHERE user_id = %s"
-                cursor.execute(sql, values)
-            else:
-                # 插入
-                keys = ['user_id']
-                placeholders = ['%s']
-                vals = [user_id]
-                for key, value in data.items():
-                    if key == 'available_equipment' or key == 'preferences':
-                        value = json.dumps(value, ensure_ascii=False)
-                    keys.append(key)
-                    placeholders.append('%s')
-                    vals.append(value)
-                sql = f"INSERT INTO user_profiles ({', '.join(keys)}) VALUES ({', '.join(placeholders)})"
-                cursor.execute(sql, vals)
-            conn.commit()
-        conn.close()
+        try:
+            with conn.cursor() as cursor:
+                # 检查是否存在
+                sql = "SELECT id FROM user_profiles WHERE user_id = %s"
+                cursor.execute(sql, (user_id,))
+                existing = cursor.fetchone()
+                if existing:
+                    # 更新
+                    fields = []
+                    values = []
+                    for key, value in data.items():
+                        if key == 'available_equipment' or key == 'preferences':
+                            value = json.dumps(value, ensure_ascii=False)
+                        fields.append(f"{key} = %s")
+                        values.append(value)
+                    values.append(user_id)
+                    sql = f"UPDATE user_profiles SET {', '.join(fields)} WHERE user_id = %s"
+                    cursor.execute(sql, values)
+                else:
+                    # 插入
+                    keys = ['user_id']
+                    placeholders = ['%s']
+                    vals = [user_id]
+                    for key, value in data.items():
+                        if key == 'available_equipment' or key == 'preferences':
+                            value = json.dumps(value, ensure_ascii=False)
+                        keys.append(key)
+                        placeholders.append('%s')
+                        vals.append(value)
+                    sql = f"INSERT INTO user_profiles ({', '.join(keys)}) VALUES ({', '.join(placeholders)})"
+                    cursor.execute(sql, vals)
+                conn.commit()
+        finally:
+            conn.close()
+        invalidate('profile', user_id)
 
     @staticmethod
     def get_by_user_id(user_id):
+        return _cached(('profile', user_id), lambda: UserProfile._load(user_id))
+
+    @staticmethod
+    def _load(user_id):
         conn = get_db_connection()
-        with conn.cursor() as cursor:
-            sql = "SELECT * FROM user_profiles WHERE user_id = %s"
-            cursor.execute(sql, (user_id,))
-            profile = cursor.fetchone()
-        conn.close()
+        try:
+            with conn.cursor() as cursor:
+                sql = "SELECT * FROM user_profiles WHERE user_id = %s"
+                cursor.execute(sql, (user_id,))
+                profile = cursor.fetchone()
+        finally:
+            conn.close()
         if profile:
             # 解析JSON字段
             for field in ['available_equipment', 'preferences']:
@@ -93,46 +186,333 @@ class WeeklyPlan:
     @staticmethod
     def create(user_id, plan_json, start_date, end_date, is_active=True):
         conn = get_db_connection()
-        with conn.cursor() as cursor:
-            sql = """INSERT INTO weekly_plans (user_id, plan_json, start_date, end_date, is_active)
-                     VALUES (%s, %s, %s, %s, %s)"""
-            cursor.execute(sql, (user_id, plan_json, start_date, end_date, is_active))
+        try:
+            with conn.cursor() as cursor:
+                sql = """INSERT INTO weekly_plans (user_id, plan_json, start_date, end_date, is_active)
+                         VALUES (%s, %s, %s, %s, %s)"""
+                cursor.execute(sql, (user_id, plan_json, start_date, end_date, is_active))
+                conn.commit()
+                plan_id = cursor.lastrowid
+        finally:
+            conn.close()
+        invalidate('active_plan', user_id)
+        return plan_id
+
+    @staticmethod
+    def _insert_with_workouts(cursor, user_id, plan_json, start_date, end_date, days, template_id,
+                              is_active, is_pending):
+        sql = """INSERT INTO weekly_plans (user_id, plan_json, start_date, end_date, is_active, is_pending,
+                                           template_id)
+                 VALUES (%s, %s, %s, %s, %s, %s, %s)"""
+        cursor.execute(sql, (user_id, plan_json, start_date, end_date, is_active, is_pending, template_id))
+        plan_id = cursor.lastrowid
+        rows = [
+            (plan_id, day['day'], start_date + timedelta(days=day['day'] - 1),
+             json.dumps(day, ensure_ascii=False))
+            for day in days
+        ]
+        if rows:
+            # PyMySQL会把executemany合并为一条多行INSERT
+            sql = """INSERT INTO daily_workouts (weekly_plan_id, day_number, date, workout_json)
+                     VALUES (%s, %s, %s, %s)"""
+            cursor.executemany(sql, rows)
+        return plan_id
+
+    @staticmethod
+    def create_with_workouts(user_id, plan_json, start_date, end_date, days, template_id=None):
+        """
+        在一个事务中保存周计划及其每日锻炼，并停用该用户之前的活跃计划和待生效计划。
+        days: 计划中的每日数据列表（包含day字段）
+        template_id: 计划来自计划模板时的模板ID
+        返回: 新计划ID
+        """
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                # 用户手动生成的计划优先，批量预生成的待生效计划作废
+                cursor.execute(
+                    """UPDATE weekly_plans SET is_active = FALSE, is_pending = FALSE
+                       WHERE user_id = %s AND (is_active = TRUE OR is_pending = TRUE)""",
+                    (user_id,)
+                )
+                plan_id = WeeklyPlan._insert_with_workouts(cursor, user_id, plan_json, start_date, end_date,
+                                                           days, template_id, True, False)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        invalidate('active_plan', user_id)
+        return plan_id
+
+    @staticmethod
+    def create_pending(user_id, plan_json, start_date, end_date, days, template_id=None):
+        """
+        保存一个到start_date才生效的待生效计划（批量预生成），不影响当前的活跃计划。
+        该用户已有待生效计划时不重复创建，返回None。
+        """
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                # 锁住该用户的计划行，避免并发运行重复创建
+                cursor.execute("SELECT id, is_pending FROM weekly_plans WHERE user_id = %s FOR UPDATE", (user_id,))
+                if any(row['is_pending'] for row in cursor.fetchall()):
+                    conn.rollback()
+                    return None
+                plan_id = WeeklyPlan._insert_with_workouts(cursor, user_id, plan_json, start_date, end_date,
+                                                           days, template_id, False, True)
             conn.commit()
-            plan_id = cursor.lastrowid
-        conn.close()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
         return plan_id
 
+    @staticmethod
+    def find_expiring(end_from, end_before, after_user_id=0, limit=100):
+        """
+        活跃计划在 [end_from, end_before] 内结束、且还没有待生效计划的用户，按user_id分页（键集分页）。
+        计划已经结束的用户（不再使用的用户）不在其中，以免每周为他们生成计划；
+        他们回来后手动生成新计划即可。
+        返回: [{'user_id', 'end_date'}]
+        """
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                sql = """SELECT p.user_id, MAX(p.end_date) AS end_date FROM weekly_plans p
+                         WHERE p.is_active = TRUE AND p.user_id > %s
+                           AND NOT EXISTS (SELECT 1 FROM weekly_plans q
+                                           WHERE q.user_id = p.user_id AND q.is_pending = TRUE)
+                         GROUP BY p.user_id
+                         HAVING MAX(p.end_date) BETWEEN %s AND %s
+                         ORDER BY p.user_id LIMIT %s"""
+                cursor.execute(sql, (after_user_id, end_from, end_before, limit))
+                rows = cursor.fetchall()
+        finally:
+            conn.close()
+        return rows
+
+    @staticmethod
+    def activate_due(user_id=None):
+        """
+        激活开始日期已到的待生效计划（可只处理一个用户），同时停用这些用户原来的活跃计划。
+        返回: 激活的计划数
+        """
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                sql = "SELECT id, user_id FROM weekly_plans WHERE is_pending = TRUE AND start_date <= CURDATE()"
+                args = ()
+                if user_id is not None:
+                    sql += " AND user_id = %s"
+                    args = (user_id,)
+                cursor.execute(sql + " FOR UPDATE", args)
+                due = cursor.fetchall()
+                if not due:
+                    conn.rollback()
+                    return 0
+                user_ids = sorted({row['user_id'] for row in due})
+                plan_ids = [row['id'] for row in due]
+                user_marks = ', '.join(['%s'] * len(user_ids))
+                plan_marks = ', '.join(['%s'] * len(plan_ids))
+                cursor.execute(
+                    f"UPDATE weekly_plans SET is_active = FALSE WHERE user_id IN ({user_marks}) AND is_active = TRUE",
+                    user_ids
+                )
+                cursor.execute(
+                    f"UPDATE weekly_plans SET is_active = TRUE, is_pending = FALSE WHERE id IN ({plan_marks})",
+                    plan_ids
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        for activated_user in user_ids:
+            invalidate('active_plan', activated_user)
+        return len(plan_ids)
+
+    @staticmethod
+    def replace_days(plan_id, user_id, plan_json, days):
+        """
+        原地更新计划中的几天：在一个事务中更新 weekly_plans.plan_json 和对应的 daily_workouts 行
+        （重置完成状态），不新建计划。
+        days: 新的当天计划列表（包含day字段）
+        调用方负责确认计划属于该用户。
+        """
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "UPDATE weekly_plans SET plan_json = %s WHERE id = %s AND user_id = %s",
+                    (plan_json, plan_id, user_id)
+                )
+                sql = """UPDATE daily_workouts SET workout_json = %s, completed = FALSE, completion_time = NULL
+                         WHERE weekly_plan_id = %s AND day_number = %s"""
+                cursor.executemany(sql, [
+                    (json.dumps(day, ensure_ascii=False), plan_id, day['day']) for day in days
+                ])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        invalidate('active_plan', user_id)
+        invalidate('workouts', plan_id)
+
     @staticmethod
     def get_active_plan(user_id):
+        return _cached(('active_plan', user_id), lambda: WeeklyPlan._load_active(user_id))
+
+    @staticmethod
+    def _load_active(user_id):
         conn = get_db_connection()
-        with conn.cursor() as cursor:
-            sql = "SELECT * FROM weekly_plans WHERE user_id = %s AND is_active = TRUE ORDER BY generated_at DESC LIMIT 1"
-            cursor.execute(sql, (user_id,))
-            plan = cursor.fetchone()
-        conn.close()
+        try:
+            with conn.cursor() as cursor:
+                sql = "SELECT * FROM weekly_plans WHERE user_id = %s AND is_active = TRUE ORDER BY generated_at DESC LIMIT 1"
+                cursor.execute(sql, (user_id,))
+                plan = cursor.fetchone()
+        finally:
+            conn.close()
+        if WeeklyPlan.activate_if_expired(user_id, plan):
+            return WeeklyPlan._load_active(user_id)
         return plan
 
+    @staticmethod
+    def activate_if_expired(user_id, plan):
+        """
+        活跃计划已过期时激活该用户到期的待生效计划（批量任务的激活步骤之外的兜底）。
+        返回: 是否激活了新计划（调用方需要重新读取活跃计划）
+        """
+        if plan and plan.get('end_date') and plan['end_date'] < date.today():
+            return WeeklyPlan.activate_due(user_id) > 0
+        return False
+
 class DailyWorkout:
     @staticmethod
     def create(weekly_plan_id, day_number, date, workout_json):
         conn = get_db_connection()
-        with conn.cursor() as cursor:
-            sql = """INSERT INTO daily_workouts (weekly_plan_id, day_number, date, workout_json)
-                     VALUES (%s, %s, %s, %s)"""
-            cursor.execute(sql, (weekly_plan_id, day_number, date, workout_json))
-            conn.commit()
-            workout_id = cursor.lastrowid
-        conn.close()
+        try:
+            with conn.cursor() as cursor:
+                sql = """INSERT INTO daily_workouts (weekly_plan_id, day_number, date, workout_json)
+                         VALUES (%s, %s, %s, %s)"""
+                cursor.execute(sql, (weekly_plan_id, day_number, date, workout_json))
+                conn.commit()
+                workout_id = cursor.lastrowid
+        finally:
+            conn.close()
+        invalidate('workouts', weekly_plan_id)
         return workout_id
 
+    @staticmethod
+    def get_owned(daily_id, user_id):
+        """返回属于该用户的每日锻炼（含user_id），不存在或不属于该用户时返回None"""
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                sql = """SELECT d.*, p.user_id FROM daily_workouts d
+                         JOIN weekly_plans p ON p.id = d.weekly_plan_id
+                         WHERE d.id = %s AND p.user_id = %s"""
+                cursor.execute(sql, (daily_id, user_id))
+                workout = cursor.fetchone()
+        finally:
+            conn.close()
+        return workout
+
+    @staticmethod
+    def mark_completed(daily_id, user_id):
+        """
+        标记每日锻炼已完成，并在同一事务中更新该用户的完成训练数汇总。
+        返回: 是否由未完成变为已完成（重复标记不会重复计数）
+        """
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                sql = """UPDATE daily_workouts d JOIN weekly_plans p ON p.id = d.weekly_plan_id
+                         SET d.completed = TRUE, d.completion_time = NOW()
+                         WHERE d.id = %s AND p.user_id = %s AND d.completed = FALSE"""
+                changed = cursor.execute(sql, (daily_id, user_id)) > 0
+                if changed:
+                    Progress.record(cursor, user_id, datetime.now(), workouts_completed=1)
+                cursor.execute("SELECT weekly_plan_id FROM daily_workouts WHERE id = %s", (daily_id,))
+                row = cursor.fetchone()
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        if row:
+            invalidate('workouts', row['weekly_plan_id'])
+        invalidate('progress', user_id)
+        return changed
+
+    @staticmethod
+    def complete_many(user_id, checkins):
+        """
+        批量标记完成 [(daily_id, completed_at)]，一个事务，并按完成时间所在周更新汇总。
+        已完成的训练日不重复计数（离线客户端重试提交是幂等的）。
+        返回: (新完成数, 之前已完成数, 不存在或不属于该用户的daily_id列表)
+        """
+        earliest = {}
+        for daily_id, completed_at in checkins:
+            if daily_id not in earliest or completed_at < earliest[daily_id]:
+                earliest[daily_id] = completed_at
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                placeholders = ', '.join(['%s'] * len(earliest))
+                cursor.execute(
+                    f"""SELECT d.id, d.weekly_plan_id, d.completed FROM daily_workouts d
+                        JOIN weekly_plans p ON p.id = d.weekly_plan_id
+                        WHERE p.user_id = %s AND d.id IN ({placeholders}) FOR UPDATE""",
+                    [user_id] + list(earliest)
+                )
+                rows = cursor.fetchall()
+                pending = [row for row in rows if not row['completed']]
+                if pending:
+                    cursor.executemany(
+                        "UPDATE daily_workouts SET completed = TRUE, completion_time = %s WHERE id = %s",
+                        [(earliest[row['id']], row['id']) for row in pending]
+                    )
+                    by_week = {}
+                    for row in pending:
+                        moment = earliest[row['id']]
+                        week = week_start_of(moment)
+                        by_week[week] = (moment, by_week.get(week, (None, 0))[1] + 1)
+                    for moment, count in by_week.values():
+                        Progress.record(cursor, user_id, moment, workouts_completed=count)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        for plan_id in {row['weekly_plan_id'] for row in pending}:
+            invalidate('workouts', plan_id)
+        if pending:
+            invalidate('progress', user_id)
+        found = {row['id'] for row in rows}
+        return len(pending), len(rows) - len(pending), [daily_id for daily_id in earliest if daily_id not in found]
+
     @staticmethod
     def get_by_week_plan(weekly_plan_id):
+        return _cached(('workouts', weekly_plan_id), lambda: DailyWorkout._load_by_week_plan(weekly_plan_id))
+
+    @staticmethod
+    def _load_by_week_plan(weekly_plan_id):
         conn = get_db_connection()
-        with conn.cursor() as cursor:
-            sql = "SELECT * FROM daily_workouts WHERE weekly_plan_id = %s ORDER BY day_number"
-            cursor.execute(sql, (weekly_plan_id,))
-            workouts = cursor.fetchall()
-        conn.close()
+        try:
+            with conn.cursor() as cursor:
+                sql = "SELECT * FROM daily_workouts WHERE weekly_plan_id = %s ORDER BY day_number"
+                cursor.execute(sql, (weekly_plan_id,))
+                workouts = cursor.fetchall()
+        finally:
+            conn.close()
         # 将date字段从字符串转换为datetime.date
         for w in workouts:
             if w.get('date') and isinstance(w['date'], str):
@@ -142,19 +522,519 @@ class DailyWorkout:
 class WeightLog:
     @staticmethod
     def add(user_id, weight_kg, notes=''):
+        """记录体重，并在同一事务中更新最新体重和本周体重汇总"""
+        measured_at = datetime.now().replace(microsecond=0)
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                sql = "INSERT INTO weight_logs (user_id, weight_kg, notes, measured_at) VALUES (%s, %s, %s, %s)"
+                cursor.execute(sql, (user_id, weight_kg, notes, measured_at))
+                Progress.record_weights(cursor, user_id, [(measured_at, weight_kg)])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        invalidate('progress', user_id)
+
+    @staticmethod
+    def import_chunk(user_id, rows):
+        """
+        批量写入一批体重记录 [(import_key, measured_at, weight_kg, notes)]，一个事务、一条多行INSERT，
+        并在同一事务中更新体重汇总。已存在的import_key（重试上传）跳过。
+        返回: 新写入的记录数
+        """
         conn = get_db_connection()
-        with conn.cursor() as cursor:
-            sql = "INSERT INTO weight_logs (user_id, weight_kg, notes) VALUES (%s, %s, %s)"
-            cursor.execute(sql, (user_id, weight_kg, notes))
+        try:
+            with conn.cursor() as cursor:
+                placeholders = ', '.join(['%s'] * len(rows))
+                # FOR UPDATE 同时锁住不存在的键，并发上传同一批数据时后到的请求等待而不是重复写入
+                cursor.execute(
+                    f"""SELECT import_key FROM weight_logs
+                        WHERE user_id = %s AND import_key IN ({placeholders}) FOR UPDATE""",
+                    [user_id] + [row[0] for row in rows]
+                )
+                seen = {row['import_key'] for row in cursor.fetchall()}
+                new_rows = []
+                for row in rows:
+                    if row[0] not in seen:
+                        seen.add(row[0])
+                        new_rows.append(row)
+                if new_rows:
+                    cursor.executemany(
+                        """INSERT INTO weight_logs (user_id, import_key, measured_at, weight_kg, notes)
+                           VALUES (%s, %s, %s, %s, %s)""",
+                        [(user_id,) + row for row in new_rows]
+                    )
+                    Progress.record_weights(cursor, user_id, [(row[1], row[2]) for row in new_rows])
             conn.commit()
-        conn.close()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        if new_rows:
+            invalidate('progress', user_id)
+        return len(new_rows)
+
+    @staticmethod
+    def get_page(user_id, after=None, start_at=None, end_at=None, limit=500):
+        """
+        按 (measured_at, id) 升序的键集分页读取体重记录（使用 (user_id, measured_at) 索引）。
+        after: 上一页最后一条的 (measured_at, id)，None表示从头开始
+        start_at / end_at: 可选的时间范围 [start_at, end_at)
+        """
+        conditions = ["user_id = %s"]
+        args = [user_id]
+        if after is not None:
+            conditions.append("(measured_at > %s OR (measured_at = %s AND id > %s))")
+            args.extend([after[0], after[0], after[1]])
+        if start_at is not None:
+            conditions.append("measured_at >= %s")
+            args.append(start_at)
+        if end_at is not None:
+            conditions.append("measured_at < %s")
+            args.append(end_at)
+        args.append(limit)
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                sql = f"""SELECT id, weight_kg, measured_at, notes FROM weight_logs
+                          WHERE {' AND '.join(conditions)}
+                          ORDER BY measured_at, id LIMIT %s"""
+                cursor.execute(sql, args)
+                logs = cursor.fetchall()
+        finally:
+            conn.close()
+        return logs
 
     @staticmethod
     def get_by_user(user_id, limit=30):
         conn = get_db_connection()
-        with conn.cursor() as cursor:
-            sql = "SELECT * FROM weight_logs WHERE user_id = %s ORDER BY measured_at DESC LIMIT %s"
-            cursor.execute(sql, (user_id, limit))
-            logs = cursor.fetchall()
-        conn.close()
-        return logs
\ No newline at end of file
+        try:
+            with conn.cursor() as cursor:
+                sql = "SELECT * FROM weight_logs WHERE user_id = %s ORDER BY measured_at DESC LIMIT %s"
+                cursor.execute(sql, (user_id, limit))
+                logs = cursor.fetchall()
+        finally:
+            conn.close()
+        return logs
+
+class PlanJob:
+    """后台生成计划任务的持久化记录"""
+
+    # 是否超时在数据库中按NOW()计算，与时间字段使用同一时钟和时区；
+    # 已开始的任务从started_at算起，排队等待的时间不计入执行时间
+    SELECT_SQL = """SELECT *, COALESCE(started_at, created_at) < NOW() - INTERVAL %s SECOND AS is_stale
+                    FROM plan_jobs"""
+
+    @staticmethod
+    def create(user_id):
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                sql = "INSERT INTO plan_jobs (user_id, status) VALUES (%s, 'queued')"
+                cursor.execute(sql, (user_id,))
+                conn.commit()
+                job_id = cursor.lastrowid
+        finally:
+            conn.close()
+        return job_id
+
+    @staticmethod
+    def get(job_id):
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                sql = PlanJob.SELECT_SQL + " WHERE id = %s"
+                cursor.execute(sql, (Config.PLAN_JOB_STALE_SECONDS, job_id))
+                job = cursor.fetchone()
+        finally:
+            conn.close()
+        return job
+
+    @staticmethod
+    def get_pending_by_user(user_id):
+        """返回用户尚未结束的最新任务（排队中或运行中）"""
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                sql = PlanJob.SELECT_SQL + """ WHERE user_id = %s AND status IN ('queued', 'running')
+                         ORDER BY id DESC LIMIT 1"""
+                cursor.execute(sql, (Config.PLAN_JOB_STALE_SECONDS, user_id))
+                job = cursor.fetchone()
+        finally:
+            conn.close()
+        return job
+
+    @staticmethod
+    def mark_running(job_id):
+        PlanJob._update(job_id, "status = 'running', started_at = NOW()")
+
+    @staticmethod
+    def mark_succeeded(job_id, weekly_plan_id):
+        PlanJob._update(job_id, "status = 'succeeded', weekly_plan_id = %s, finished_at = NOW()",
+                        (weekly_plan_id,))
+
+    @staticmethod
+    def mark_failed(job_id, error):
+        PlanJob._update(job_id, "status = 'failed', error = %s, finished_at = NOW()", (error,))
+
+    @staticmethod
+    def _update(job_id, assignments, args=()):
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                sql = f"UPDATE plan_jobs SET {assignments} WHERE id = %s"
+                cursor.execute(sql, (*args, job_id))
+                conn.commit()
+        finally:
+            conn.close()
+
+
+class PlanTemplate:
+    """按资料指纹保存的可复用计划"""
+
+    @staticmethod
+    def create(fingerprint, profile_json, plan_json, ttl_days):
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                # 生成模板的用户本身算作第一次使用
+                sql = """INSERT INTO plan_templates (fingerprint, profile_json, plan_json, use_count,
+                                                     last_used_at, expires_at)
+                         VALUES (%s, %s, %s, 1, NOW(), NOW() + INTERVAL %s DAY)"""
+                cursor.execute(sql, (fingerprint, profile_json, plan_json, ttl_days))
+                template_id = cursor.lastrowid
+                # 顺便清理少量过期模板，表不会无限增长
+                cursor.execute("DELETE FROM plan_templates WHERE expires_at < NOW() LIMIT 100")
+            conn.commit()
+        finally:
+            conn.close()
+        return template_id
+
+    @staticmethod
+    def get_available(fingerprint, max_uses):
+        """返回该指纹下未过期、使用次数未达上限的模板，使用次数少的在前"""
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                sql = """SELECT id, plan_json, use_count FROM plan_templates
+                         WHERE fingerprint = %s AND expires_at > NOW() AND use_count < %s
+                         ORDER BY use_count, id"""
+                cursor.execute(sql, (fingerprint, max_uses))
+                templates = cursor.fetchall()
+        finally:
+            conn.close()
+        return templates
+
+    @staticmethod
+    def claim(template_id, max_uses):
+        """占用一次模板；模板已过期或被其他请求用满时返回False"""
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                sql = """UPDATE plan_templates SET use_count = use_count + 1, last_used_at = NOW()
+                         WHERE id = %s AND expires_at > NOW() AND use_count < %s"""
+                claimed = cursor.execute(sql, (template_id, max_uses)) == 1
+                conn.commit()
+        finally:
+            conn.close()
+        return claimed
+
+
+class PlanBatchRun:
+    """批量预生成计划的运行记录（断点和统计）"""
+
+    @staticmethod
+    def start_or_resume(run_date, horizon_days):
+        """返回当天该窗口的运行记录；已有未完成的记录时从其断点继续"""
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """INSERT INTO plan_batch_runs (run_date, horizon_days) VALUES (%s, %s)
+                       ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)""",
+                    (run_date, horizon_days)
+                )
+                run_id = cursor.lastrowid
+                cursor.execute("SELECT * FROM plan_batch_runs WHERE id = %s", (run_id,))
+                run = cursor.fetchone()
+                conn.commit()
+        finally:
+            conn.close()
+        return run
+
+    @staticmethod
+    def checkpoint(run_id, last_user_id, counts, elapsed_seconds):
+        """记录断点：last_user_id 及之前的用户都已处理"""
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                sql = """UPDATE plan_batch_runs
+                         SET last_user_id = %s, processed = %s, succeeded = %s, failed = %s, skipped = %s,
+                             elapsed_seconds = %s
+                         WHERE id = %s"""
+                cursor.execute(sql, (last_user_id, counts['processed'], counts['succeeded'], counts['failed'],
+                                     counts['skipped'], elapsed_seconds, run_id))
+                conn.commit()
+        finally:
+            conn.close()
+
+    @staticmethod
+    def reopen(run_id):
+        """把已完成的运行记录重置为从头开始（强制重新运行）"""
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                sql = """UPDATE plan_batch_runs
+                         SET status = 'running', last_user_id = 0, processed = 0, succeeded = 0, failed = 0,
+                             skipped = 0, elapsed_seconds = 0, report = NULL, finished_at = NULL
+                         WHERE id = %s"""
+                cursor.execute(sql, (run_id,))
+                conn.commit()
+        finally:
+            conn.close()
+
+    @staticmethod
+    def finish(run_id, report):
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                sql = """UPDATE plan_batch_runs SET status = 'finished', finished_at = NOW(), report = %s
+                         WHERE id = %s"""
+                cursor.execute(sql, (report, run_id))
+                conn.commit()
+        finally:
+            conn.close()
+
+    @staticmethod
+    def get_recent(limit=10):
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT * FROM plan_batch_runs ORDER BY id DESC LIMIT %s", (limit,))
+                runs = cursor.fetchall()
+        finally:
+            conn.close()
+        return runs
+
+
+def week_start_of(moment):
+    """moment所在周的周一"""
+    day = moment.date() if isinstance(moment, datetime) else moment
+    return day - timedelta(days=day.weekday())
+
+
+class ExerciseLog:
+    """动作级训练记录"""
+
+    @staticmethod
+    def add(user_id, daily_workout_id, exercise_name, sets, reps, weight_kg=None, completed=True):
+        """
+        记录一个动作的完成情况，并在同一事务中增量更新周训练量、累计值和个人记录。
+        调用方负责确认每日锻炼属于该用户。
+        返回: (记录ID, 是否刷新了个人记录)
+        """
+        logged_at = datetime.now().replace(microsecond=0)
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                sql = """INSERT INTO exercise_logs (daily_workout_id, user_id, exercise_name, sets, reps,
+                                                    weight_kg, completed, logged_at)
+                         VALUES (%s, %s, %s, %s, %s, %s, %s, %s)"""
+                cursor.execute(sql, (daily_workout_id, user_id, exercise_name, sets, reps, weight_kg,
+                                     completed, logged_at))
+                log_id = cursor.lastrowid
+                new_record = False
+                if completed:
+                    weight = float(weight_kg or 0)
+                    Progress.record(cursor, user_id, logged_at, exercises_logged=1, sets_done=sets,
+                                    reps_done=sets * reps, volume_kg=sets * reps * weight)
+                    new_record = Progress.record_personal_best(cursor, user_id, exercise_name, reps, weight,
+                                                               logged_at)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        invalidate('progress', user_id)
+        return log_id, new_record
+
+    @staticmethod
+    def get_by_daily_workout(daily_workout_id):
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                sql = "SELECT * FROM exercise_logs WHERE daily_workout_id = %s ORDER BY id"
+                cursor.execute(sql, (daily_workout_id,))
+                logs = cursor.fetchall()
+        finally:
+            conn.close()
+        return logs
+
+
+class Progress:
+    """
+    用户进度汇总（user_progress / user_weekly_stats / user_personal_records）。
+    record* 方法接收调用方的游标，在写入原始记录的同一事务中增量更新汇总；
+    读取时每个用户只需读取固定数量的行。
+    """
+
+    @staticmethod
+    def record(cursor, user_id, moment, workouts_completed=0, exercises_logged=0, sets_done=0, reps_done=0,
+               volume_kg=0.0):
+        """把增量累加到moment所在周和用户累计值"""
+        cursor.execute(
+            """INSERT INTO user_weekly_stats (user_id, week_start, workouts_completed, exercises_logged,
+                                              sets_done, reps_done, volume_kg)
+               VALUES (%s, %s, %s, %s, %s, %s, %s)
+               ON DUPLICATE KEY UPDATE workouts_completed = workouts_completed + VALUES(workouts_completed),
+                                       exercises_logged = exercises_logged + VALUES(exercises_logged),
+                                       sets_done = sets_done + VALUES(sets_done),
+                                       reps_done = reps_done + VALUES(reps_done),
+                                       volume_kg = volume_kg + VALUES(volume_kg)""",
+            (user_id, week_start_of(moment), workouts_completed, exercises_logged, sets_done, reps_done, volume_kg)
+        )
+        cursor.execute(
+            """INSERT INTO user_progress (user_id, workouts_completed, exercises_logged, volume_kg)
+               VALUES (%s, %s, %s, %s)
+               ON DUPLICATE KEY UPDATE workouts_completed = workouts_completed + VALUES(workouts_completed),
+                                       exercises_logged = exercises_logged + VALUES(exercises_logged),
+                                       volume_kg = volume_kg + VALUES(volume_kg)""",
+            (user_id, workouts_completed, exercises_logged, volume_kg)
+        )
+
+    @staticmethod
+    def record_weights(cursor, user_id, weights):
+        """
+        把一批体重 [(measured_at, weight_kg)] 合并到汇总中：每周只保留时间最晚的一次，
+        用户的最早/最新体重按测量时间比较（补录的历史记录不会覆盖更新的体重）。
+        """
+        if not weights:
+            return
+        latest_by_week = {}
+        for measured_at, weight_kg in weights:
+            week = week_start_of(measured_at)
+            current = latest_by_week.get(week)
+            if current is None or measured_at >= current[0]:
+                latest_by_week[week] = (measured_at, weight_kg)
+        # 同一条语句中先更新体重再更新时间（MySQL按顺序执行赋值，后面的赋值看到的是新值）
+        cursor.executemany(
+            """INSERT INTO user_weekly_stats (user_id, week_start, last_weight_kg, last_weight_at)
+               VALUES (%s, %s, %s, %s)
+               ON DUPLICATE KEY UPDATE
+                   last_weight_kg = IF(last_weight_at IS NULL OR VALUES(last_weight_at) >= last_weight_at,
+                                       VALUES(last_weight_kg), last_weight_kg),
+                   last_weight_at = IF(last_weight_at IS NULL OR VALUES(last_weight_at) >= last_weight_at,
+                                       VALUES(last_weight_at), last_weight_at)""",
+            [(user_id, week, weight_kg, measured_at) for week, (measured_at, weight_kg) in latest_by_week.items()]
+        )
+        first = min(weights, key=lambda item: item[0])
+        latest = max(weights, key=lambda item: item[0])
+        cursor.execute(
+            """INSERT INTO user_progress (user_id, weight_logs, first_weight_kg, first_weight_at,
+                                          latest_weight_kg, latest_weight_at)
+               VALUES (%s, %s, %s, %s, %s, %s)
+               ON DUPLICATE KEY UPDATE
+                   weight_logs = weight_logs + VALUES(weight_logs),
+                   first_weight_kg = IF(first_weight_at IS NULL OR VALUES(first_weight_at) < first_weight_at,
+                                        VALUES(first_weight_kg), first_weight_kg),
+                   first_weight_at = IF(first_weight_at IS NULL OR VALUES(first_weight_at) < first_weight_at,
+                                        VALUES(first_weight_at), first_weight_at),
+                   latest_weight_kg = IF(latest_weight_at IS NULL OR VALUES(latest_weight_at) >= latest_weight_at,
+                                         VALUES(latest_weight_kg), latest_weight_kg),
+                   latest_weight_at = IF(latest_weight_at IS NULL OR VALUES(latest_weight_at) >= latest_weight_at,
+                                         VALUES(latest_weight_at), latest_weight_at)""",
+            (user_id, len(weights), first[1], first[0], latest[1], latest[0])
+        )
+
+    @staticmethod
+    def record_personal_best(cursor, user_id, exercise_name, reps, weight_kg, moment):
+        """更新动作的个人记录，返回是否刷新了记录（最大重量或单组训练量）"""
+        set_volume = reps * weight_kg
+        cursor.execute(
+            """SELECT max_weight_kg, best_set_volume_kg FROM user_personal_records
+               WHERE user_id = %s AND exercise_name = %s FOR UPDATE""",
+            (user_id, exercise_name)
+        )
+        row = cursor.fetchone()
+        if row is None:
+            cursor.execute(
+                """INSERT INTO user_personal_records (user_id, exercise_name, max_weight_kg, max_weight_reps,
+                                                      max_weight_at, best_set_volume_kg, best_set_volume_at)
+                   VALUES (%s, %s, %s, %s, %s, %s, %s)""",
+                (user_id, exercise_name, weight_kg, reps, moment, set_volume, moment)
+            )
+            return weight_kg > 0
+        heavier = weight_kg > float(row['max_weight_kg'])
+        bigger = set_volume > float(row['best_set_volume_kg'])
+        if heavier:
+            cursor.execute(
+                """UPDATE user_personal_records SET max_weight_kg = %s, max_weight_reps = %s, max_weight_at = %s
+                   WHERE user_id = %s AND exercise_name = %s""",
+                (weight_kg, reps, moment, user_id, exercise_name)
+            )
+        if bigger:
+            cursor.execute(
+                """UPDATE user_personal_records SET best_set_volume_kg = %s, best_set_volume_at = %s
+                   WHERE user_id = %s AND exercise_name = %s""",
+                (set_volume, moment, user_id, exercise_name)
+            )
+        return heavier or bigger
+
+    @staticmethod
+    def get_summary(user_id):
+        return _cached(('progress', user_id), lambda: Progress.load_summary(user_id))
+
+    # 三张汇总表合成一次查询：列按位置对齐，kind区分来源
+    SUMMARY_SQL = """
+        (SELECT 'total' AS kind, NULL AS exercise_name, NULL AS week_start, workouts_completed, volume_kg,
+                latest_weight_kg AS weight_kg, first_weight_kg, weight_logs AS quantity, NULL AS recorded_at
+         FROM user_progress WHERE user_id = %s)
+        UNION ALL
+        (SELECT 'week', NULL, week_start, workouts_completed, volume_kg, last_weight_kg, NULL, NULL, NULL
+         FROM user_weekly_stats WHERE user_id = %s ORDER BY week_start DESC LIMIT %s)
+        UNION ALL
+        (SELECT 'record', exercise_name, NULL, NULL, NULL, max_weight_kg, NULL, max_weight_reps, max_weight_at
+         FROM user_personal_records WHERE user_id = %s ORDER BY max_weight_at DESC LIMIT %s)
+    """
+
+    @staticmethod
+    def load_summary(user_id, weeks=8, cursor=None, records=10):
+        """
+        返回 {'totals': 累计值或None, 'weeks': 最近weeks周（新的在前）, 'records': 最近刷新的个人记录}
+        一次查询，每个用户读取的行数固定，与历史记录多少无关。
+        totals: workouts_completed, volume_kg, latest_weight_kg, first_weight_kg, weight_logs
+        weeks: week_start, workouts_completed, volume_kg, last_weight_kg
+        records: exercise_name, max_weight_kg, max_weight_reps, max_weight_at
+        cursor: 复用调用方的游标（如仪表板的一次性加载），不传时使用新连接
+        """
+        if cursor is None:
+            conn = get_db_connection()
+            try:
+                with conn.cursor() as cursor:
+                    return Progress.load_summary(user_id, weeks, cursor, records)
+            finally:
+                conn.close()
+        cursor.execute(Progress.SUMMARY_SQL, (user_id, user_id, weeks, user_id, records))
+        totals = None
+        weekly = []
+        personal_records = []
+        for row in cursor.fetchall():
+            if row['kind'] == 'total':
+                totals = {'workouts_completed': row['workouts_completed'], 'volume_kg': row['volume_kg'],
+                          'latest_weight_kg': row['weight_kg'], 'first_weight_kg': row['first_weight_kg'],
+                          'weight_logs': row['quantity']}
+            elif row['kind'] == 'week':
+                weekly.append({'week_start': row['week_start'], 'workouts_completed': row['workouts_completed'],
+                               'volume_kg': row['volume_kg'], 'last_weight_kg': row['weight_kg']})
+            else:
+                personal_records.append({'exercise_name': row['exercise_name'], 'max_weight_kg': row['weight_kg'],
+                                         'max_weight_reps': row['quantity'], 'max_weight_at': row['recorded_at']})
+        # UNION ALL 不保证各部分内部的顺序
+        weekly.sort(key=lambda week: week['week_start'], reverse=True)
+        personal_records.sort(key=lambda record: record['max_weight_at'] or datetime.min, reverse=True)
+        return {'totals': totals, 'weeks': weekly, 'records': personal_records}
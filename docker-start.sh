@@ -54,4 +54,4 @@ echo "查看日志: docker-compose logs -f"
 echo "停止服务: docker-compose down"
 echo ""
 echo "初始化数据库（如果需要）:"
-echo "  访问 http://localhost:5000/initdb 创建表"
\ No newline at end of file
+echo "  docker-compose exec app python -m database.migrate upgrade"
\ No newline at end of file
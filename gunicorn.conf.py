@@ -0,0 +1,76 @@
+"""
+gunicorn配置：gunicorn -c gunicorn.conf.py app:app
+
+工作模型
+--------
+DeepSeek相关的路由几乎全部时间都在等待网络：生成计划已放到后台任务队列，
+运动介绍（尤其是SSE流式输出）仍会在请求期间占用一个处理单元直到生成结束。
+默认的sync worker每个进程同一时刻只能处理一个请求，一个流式请求就会让整个进程
+无法响应其他用户，因此这里使用 gthread：少量进程 × 每进程多个线程。
+LLM调用本身在每个进程的后台事件循环中异步执行（services/llm_client.py），
+请求线程只是等待结果，同时在途的调用数由 LLM_MAX_CONCURRENCY 限制，而不是由线程数决定。
+- workers: 进程数，建议约等于CPU核数（默认 min(CPU核数, 4)）
+- threads: 每个进程的线程数，即该进程能同时挂起的慢请求数（默认4，
+  与默认的 DB_POOL_SIZE=10、PLAN_JOB_WORKERS=4、PREFETCH_CONCURRENCY=2 相匹配；
+  流式介绍请求较多时可调大，并相应调大 DB_POOL_SIZE）
+- 每个进程另有 PLAN_JOB_WORKERS 个计划任务线程和 PREFETCH_CONCURRENCY 个预热线程，
+  它们与请求线程共用连接池，DB_POOL_SIZE 应不小于这三者之和（启动时会检查并告警）
+- timeout 要大于一次LLM调用的最长时间（客户端超时60秒），否则流式请求会被误杀
+
+预加载
+------
+preload_app=True 时应用在master进程中导入一次，fork出的工作进程通过写时复制共享
+已导入的模块，减少每个进程的内存并加快工作进程启动/回收。启动时不会连接数据库或
+创建DeepSeek客户端；post_fork 仍会重置连接池和LLM客户端，确保子进程不复用父进程的socket。
+
+所有参数都可以用环境变量覆盖，见 .env.example 的 gunicorn 部分。
+"""
+import multiprocessing
+import os
+
+
+def _env_bool(name, default):
+    return os.getenv(name, default).lower() in ('1', 'true', 'yes')
+
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('GUNICORN_WORKERS', str(min(multiprocessing.cpu_count(), 4))))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+preload_app = _env_bool('GUNICORN_PRELOAD', 'true')
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+# 定期回收工作进程，避免缓慢的内存增长；加抖动防止所有进程同时重启
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '2000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '200'))
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-') or None  # 设为空字符串关闭访问日志
+
+
+def post_fork(server, worker):
+    """子进程中丢弃从master继承的数据库连接、LLM事件循环和HTTP客户端"""
+    from database.db_connection import reset_pool
+    from services.llm_client import reset
+    reset_pool()
+    reset()
+
+
+def when_ready(server):
+    """master启动完成后检查连接池大小是否足够"""
+    from config import Config
+    if worker_class != 'gthread':
+        return
+    needed = threads + Config.PLAN_JOB_WORKERS + Config.PREFETCH_CONCURRENCY
+    if Config.DB_POOL_SIZE < needed:
+        server.log.warning("DB_POOL_SIZE=%s 小于 请求线程(%s)+计划任务线程(%s)+预热线程(%s)，高峰时请求可能等待连接",
+                           Config.DB_POOL_SIZE, threads, Config.PLAN_JOB_WORKERS,
+                           Config.PREFETCH_CONCURRENCY)
+
+
+def worker_exit(server, worker):
+    """工作进程退出前等待进行中的计划任务结束（受graceful_timeout限制）"""
+    from services.plan_jobs import plan_job_queue
+    try:
+        plan_job_queue.shutdown(wait=True)
+    except Exception:
+        worker.log.exception('关闭计划任务队列失败')
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+比较不同gunicorn运行模式的内存占用和吞吐量。
+对每种模式启动一次 gunicorn -c gunicorn.conf.py app:app，预热后用多个客户端线程
+压测指定路径，再读取每个工作进程的RSS和PSS（PSS按共享页面均摊，更能体现预加载的写时复制收益）。
+
+    python scripts/bench_gunicorn.py                          # 默认压测 /about
+    python scripts/bench_gunicorn.py --modes sync gthread-preload --duration 20
+    python scripts/bench_gunicorn.py --path /dashboard --cookie 'session=...'
+
+压测LLM相关路由时可以配合 scripts/stub_llm_server.py --delay 使用，模拟慢速上游。
+仅支持Linux（读取 /proc）。
+"""
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODES = {
+    'sync': {'GUNICORN_WORKER_CLASS': 'sync', 'GUNICORN_PRELOAD': 'false'},
+    'sync-preload': {'GUNICORN_WORKER_CLASS': 'sync', 'GUNICORN_PRELOAD': 'true'},
+    'gthread': {'GUNICORN_WORKER_CLASS': 'gthread', 'GUNICORN_PRELOAD': 'false'},
+    'gthread-preload': {'GUNICORN_WORKER_CLASS': 'gthread', 'GUNICORN_PRELOAD': 'true'},
+}
+
+
+def _children(pid):
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            children.append(int(entry))
+    return children
+
+
+def _memory_kb(pid):
+    """返回 (RSS, PSS)，单位KB"""
+    rss = pss = 0
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                rss = int(line.split()[1])
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    pss = int(line.split()[1])
+    except OSError:
+        pass
+    return rss, pss
+
+
+def _wait_ready(port, path, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', path)
+            conn.getresponse().read()
+            return True
+        except (OSError, http.client.HTTPException):
+            time.sleep(0.2)
+    return False
+
+
+def _load(port, path, cookie, clients, duration):
+    headers = {'Cookie': cookie} if cookie else {}
+    counts = {'ok': 0, 'error': 0}
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def worker():
+        ok = error = 0
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+        while time.monotonic() < stop_at:
+            try:
+                conn.request('GET', path, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                if response.status < 500:
+                    ok += 1
+                else:
+                    error += 1
+            except (OSError, http.client.HTTPException):
+                error += 1
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+        conn.close()
+        with lock:
+            counts['ok'] += ok
+            counts['error'] += error
+
+    threads = [threading.Thread(target=worker) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return counts
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def run_mode(name, args):
+    port = _free_port()
+    env = dict(os.environ)
+    env.update(MODES[name])
+    env.update({
+        'GUNICORN_BIND': f'127.0.0.1:{port}',
+        'GUNICORN_WORKERS': str(args.workers),
+        'GUNICORN_THREADS': str(args.threads),
+        'GUNICORN_ACCESS_LOG': '',
+        'GUNICORN_MAX_REQUESTS': '0',
+    })
+    env.setdefault('DEEPSEEK_API_KEY', 'bench')
+    proc = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    try:
+        if not _wait_ready(port, args.path):
+            raise RuntimeError(f'{name}: gunicorn未能启动')
+        _load(port, args.path, args.cookie, args.clients, 2)  # 预热
+        counts = _load(port, args.path, args.cookie, args.clients, args.duration)
+        workers = _children(proc.pid)
+        memory = [_memory_kb(pid) for pid in workers]
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+    return {
+        'mode': name,
+        'workers': len(workers),
+        'rss_avg_mb': sum(m[0] for m in memory) / len(memory) / 1024 if memory else 0,
+        'pss_avg_mb': sum(m[1] for m in memory) / len(memory) / 1024 if memory else 0,
+        'rps': counts['ok'] / args.duration,
+        'errors': counts['error'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='比较gunicorn运行模式的内存和吞吐量')
+    parser.add_argument('--modes', nargs='+', choices=sorted(MODES), default=['sync', 'gthread-preload'])
+    parser.add_argument('--path', default='/about', help='压测的路径')
+    parser.add_argument('--cookie', help='请求携带的Cookie（压测需要登录的页面时使用）')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--clients', type=int, default=16, help='并发客户端数')
+    parser.add_argument('--duration', type=float, default=10, help='每种模式的压测秒数')
+    args = parser.parse_args()
+
+    print(f"{'模式':<16}{'进程数':>6}{'RSS/进程(MB)':>14}{'PSS/进程(MB)':>14}{'请求/秒':>10}{'错误':>6}")
+    for name in args.modes:
+        r = run_mode(name, args)
+        print(f"{r['mode']:<16}{r['workers']:>6}{r['rss_avg_mb']:>14.1f}{r['pss_avg_mb']:>14.1f}"
+              f"{r['rps']:>10.1f}{r['errors']:>6}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+应用启动耗时基准：在全新的解释器中多次导入 app 模块（相当于gunicorn启动/回收一个工作进程），
+统计耗时的中位数和最大值，以及导入失败的次数。
+
+    python scripts/bench_startup.py                      # 测量当前代码
+    python scripts/bench_startup.py --repo /tmp/old      # 测量另一份检出（如 git worktree add /tmp/old <rev>）
+    python scripts/bench_startup.py --first-call         # 额外测量首次启动LLM事件循环并创建客户端的耗时
+
+把 DATABASE_HOST 指向一个不可达的地址，可以观察MySQL短暂不可用时工作进程能否启动。
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+IMPORT_SNIPPET = """
+import json, time
+t = time.perf_counter()
+import app
+elapsed = time.perf_counter() - t
+result = {'import': elapsed}
+if FIRST_CALL:
+    t = time.perf_counter()
+    from services.llm_client import warm_up
+    warm_up()
+    result['first_client'] = time.perf_counter() - t
+print('BENCH ' + json.dumps(result))
+"""
+
+
+def run_once(repo, first_call, env):
+    code = IMPORT_SNIPPET.replace('FIRST_CALL', repr(first_call))
+    proc = subprocess.run([sys.executable, '-c', code], cwd=repo, env=env,
+                          capture_output=True, text=True)
+    for line in proc.stdout.splitlines():
+        if line.startswith('BENCH '):
+            return json.loads(line[len('BENCH '):]), None
+    error = (proc.stderr.strip().splitlines() or ['未知错误'])[-1]
+    return None, error
+
+
+def main():
+    parser = argparse.ArgumentParser(description='应用启动耗时基准')
+    parser.add_argument('--repo', default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        help='要测量的代码目录（默认当前仓库）')
+    parser.add_argument('--runs', type=int, default=10, help='重复次数')
+    parser.add_argument('--first-call', action='store_true', help='同时测量首次启动LLM事件循环并创建客户端的耗时')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault('DEEPSEEK_API_KEY', 'bench')
+
+    timings = {}
+    failures = []
+    for _ in range(args.runs):
+        result, error = run_once(args.repo, args.first_call, env)
+        if result is None:
+            failures.append(error)
+            continue
+        for name, value in result.items():
+            timings.setdefault(name, []).append(value)
+
+    print(f"代码目录: {args.repo}")
+    print(f"运行次数: {args.runs}，失败: {len(failures)}")
+    for name, values in timings.items():
+        print(f"{name:>14}: 中位数 {statistics.median(values) * 1000:8.1f} ms  "
+              f"最大 {max(values) * 1000:8.1f} ms")
+    if failures:
+        print(f"最近一次失败: {failures[-1]}")
+
+
+if __name__ == '__main__':
+    main()
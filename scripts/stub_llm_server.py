@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+本地DeepSeek桩服务，用于在没有API密钥的环境中测试计划生成任务队列。
+
+用法：
+    python scripts/stub_llm_server.py --port 8001 --delay 5
+    DEEPSEEK_BASE_URL=http://127.0.0.1:8001 DEEPSEEK_API_KEY=stub python app.py
+
+服务实现了OpenAI兼容的 POST /chat/completions 接口，
+按 --delay 秒延迟后返回固定内容，可用来模拟慢响应；
+请求中带 stream=true 时按SSE格式逐段返回。
+"""
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STUB_PLAN = {
+    "days": [
+        {
+            "day": i + 1,
+            "focus": focus,
+            "exercises": [
+                {"name": name, "sets": 3, "reps": "8-12", "weight": "适中", "rest": "60-90秒"}
+                for name in exercises
+            ],
+            "tips": "保持动作规范，循序渐进。"
+        }
+        for i, (focus, exercises) in enumerate([
+            ("胸部、三头肌", ["卧推", "双杠臂屈伸"]),
+            ("背部、二头肌", ["引体向上", "哑铃弯举"]),
+            ("腿部", ["深蹲", "箭步蹲"]),
+            ("休息", []),
+            ("肩部、核心", ["哑铃推举", "平板支撑"]),
+            ("全身", ["硬拉", "俯卧撑"]),
+            ("休息", []),
+        ])
+    ]
+}
+
+STUB_DESCRIPTION = "这是本地桩服务返回的运动介绍。\n\n动作要领：保持核心收紧，控制动作节奏。"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    delay = 0.0
+    stream_interval = 0.05
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self.send_error(404)
+            return
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+        time.sleep(self.delay)
+        wants_json = (body.get('response_format') or {}).get('type') == 'json_object'
+        content = json.dumps(STUB_PLAN, ensure_ascii=False) if wants_json else STUB_DESCRIPTION
+        if body.get('stream'):
+            self._send_stream(body.get('model', 'deepseek-chat'), content)
+        else:
+            self._send_completion(body.get('model', 'deepseek-chat'), content)
+
+    def _send_completion(self, model, content):
+        payload = {
+            "id": "stub-completion",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        }
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, model, content, chunk_size=4):
+        """按OpenAI流式格式逐段发送内容"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        pieces = [content[i:i + chunk_size] for i in range(0, len(content), chunk_size)]
+        for piece in pieces + ['']:
+            chunk = {
+                "id": "stub-completion",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "delta": {"content": piece} if piece else {},
+                    "finish_reason": None if piece else "stop"
+                }]
+            }
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+            time.sleep(self.stream_interval)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        print(f"[stub-llm] {self.address_string()} {format % args}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地DeepSeek桩服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--delay', type=float, default=0.0, help='每次响应前的延迟秒数')
+    args = parser.parse_args()
+    StubHandler.delay = args.delay
+    # 默认的监听队列只有5，大量并发连接时会被内核延迟重试，影响并发测试
+    ThreadingHTTPServer.request_queue_size = 128
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    print(f"本地DeepSeek桩服务运行在 http://{args.host}:{args.port}（延迟 {args.delay} 秒）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,309 @@
+"""
+体重记录和训练打卡的批量导入（从其他应用迁移、可穿戴设备同步、离线客户端补交打卡）。
+- 支持CSV（带表头）、JSON数组和NDJSON（每行一个对象），逐条流式解析，
+  内存占用与文件大小无关（只保留当前的一批记录）
+- 每条记录单独校验（体重20-300公斤，时间不能晚于现在），不合格的记录跳过并在报告中列出行号
+- 每 BULK_IMPORT_CHUNK_SIZE 条记录一个事务，用一条多行INSERT写入，并在同一事务中更新进度汇总
+- 体重记录按 (user_id, import_key) 幂等：客户端可以提供key，未提供时由测量时间和体重生成，
+  重试上传同一批数据不会产生重复记录；打卡以训练日的完成状态为准，重复提交不会重复计数
+解析到一半遇到格式错误时抛出BulkImportError，之前的批次已经写入，修正后重新上传即可。
+"""
+import codecs
+import csv
+import hashlib
+import json
+from datetime import datetime, timedelta
+
+from config import Config
+from database.models import DailyWorkout, WeightLog
+
+WEIGHT_MIN_KG = 20
+WEIGHT_MAX_KG = 300
+MAX_KEY_LENGTH = 64
+# 报告中最多列出的错误数
+MAX_REPORTED_ERRORS = 20
+# 允许客户端时钟比服务器快的时间
+CLOCK_SKEW = timedelta(hours=24)
+READ_SIZE = 64 * 1024
+# 单条JSON记录的最大长度，防止一条异常的记录占满内存
+MAX_RECORD_CHARS = 64 * 1024
+
+
+class BulkImportError(ValueError):
+    """上传内容无法继续解析（编码错误、JSON格式错误、缺少表头等）"""
+
+
+def detect_format(content_type, filename=None):
+    """根据Content-Type或文件扩展名判断格式，返回 'csv' / 'json'，无法判断时返回None"""
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    if content_type in ('text/csv', 'application/csv'):
+        return 'csv'
+    if content_type in ('application/json', 'application/x-ndjson', 'application/jsonl'):
+        return 'json'
+    extension = (filename or '').rsplit('.', 1)[-1].lower()
+    if extension == 'csv':
+        return 'csv'
+    if extension in ('json', 'ndjson', 'jsonl'):
+        return 'json'
+    return None
+
+
+def _iter_lines(stream):
+    """
+    按块读取并增量解码，逐行产出文本（保留行尾，供csv处理带引号的多行字段）。
+    只需要stream.read()：Werkzeug上传文件所用的SpooledTemporaryFile在Python 3.9中
+    没有readable()，不能直接套 io.TextIOWrapper。
+    """
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    pending = ''
+    while True:
+        chunk = stream.read(READ_SIZE)
+        pending += decoder.decode(chunk or b'', final=not chunk)
+        lines = pending.split('\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line + '\n'
+        if not chunk:
+            break
+    if pending:
+        yield pending
+
+
+def iter_csv_records(stream):
+    """逐行读取CSV，产出 (行号, 记录dict)；第一行为表头"""
+    reader = csv.DictReader(_iter_lines(stream))
+    try:
+        if not reader.fieldnames:
+            return
+        reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+        for record in reader:
+            yield reader.line_num, record
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise BulkImportError(f'第 {reader.line_num} 行: CSV格式错误: {e}') from None
+
+
+def iter_json_records(stream):
+    """
+    流式读取JSON数组（[{...}, {...}]）或NDJSON（每行一个对象），产出 (序号, 记录)。
+    每次只解码缓冲区中的下一个完整值，缓冲区大小取决于单条记录而不是整个文件。
+    """
+    decoder = json.JSONDecoder()
+    reader = codecs.getincrementaldecoder('utf-8-sig')()
+    buffer = ''
+    pos = 0
+    eof = False
+    index = 0
+
+    def fill():
+        nonlocal buffer, pos, eof
+        chunk = stream.read(READ_SIZE)
+        try:
+            text = reader.decode(chunk or b'', final=not chunk)
+        except UnicodeDecodeError:
+            raise BulkImportError(f'第 {index + 1} 条记录附近: 不是有效的UTF-8编码') from None
+        buffer = buffer[pos:] + text
+        pos = 0
+        eof = not chunk
+
+    def next_char():
+        # 跳过空白，返回下一个字符（到达末尾时返回空字符串）
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos < len(buffer) or eof:
+                return buffer[pos:pos + 1]
+            fill()
+
+    first = next_char()
+    if not first:
+        return
+    in_array = first == '['
+    if in_array:
+        pos += 1
+        if next_char() == ']':
+            return
+    while True:
+        char = next_char()
+        if not char:
+            if in_array:
+                raise BulkImportError(f'第 {index} 条记录之后: JSON数组没有结束')
+            return
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except ValueError:
+                value, end = None, None
+            # 值恰好在缓冲区末尾结束时可能被截断（如数字），读入更多内容再解码
+            if end is not None and (end < len(buffer) or eof):
+                break
+            if eof:
+                raise BulkImportError(f'第 {index + 1} 条记录: JSON格式错误')
+            if len(buffer) - pos > MAX_RECORD_CHARS:
+                raise BulkImportError(f'第 {index + 1} 条记录: 超过{MAX_RECORD_CHARS}个字符或JSON格式错误')
+            fill()
+        pos = end
+        index += 1
+        yield index, value
+        if in_array:
+            char = next_char()
+            if char == ']':
+                return
+            if char != ',':
+                raise BulkImportError(f'第 {index} 条记录之后: JSON数组中缺少逗号')
+            pos += 1
+
+
+def iter_records(stream, fmt):
+    if fmt == 'csv':
+        return iter_csv_records(stream)
+    return iter_json_records(stream)
+
+
+def _parse_time(value, now):
+    if isinstance(value, str):
+        value = value.strip()
+    if not value:
+        return None
+    text = str(value).replace('/', '-')
+    if text[-1:] in ('Z', 'z'):
+        # Python 3.9的fromisoformat不接受表示UTC的Z后缀
+        text = text[:-1] + '+00:00'
+    try:
+        moment = datetime.fromisoformat(text)
+    except ValueError:
+        raise ValueError(f'无法识别的时间: {value}') from None
+    if moment.tzinfo is not None:
+        # 带时区的时间转换为服务器本地时间（与 datetime.now() 写入的记录一致）
+        moment = moment.astimezone().replace(tzinfo=None)
+    moment = moment.replace(microsecond=0)
+    if moment > now + CLOCK_SKEW:
+        raise ValueError(f'时间晚于当前时间: {value}')
+    return moment
+
+
+def parse_weight_record(record, now):
+    """校验一条体重记录，返回 (import_key, measured_at, weight_kg, notes)；不合格时抛出ValueError"""
+    if not isinstance(record, dict):
+        raise ValueError('记录应为对象')
+    raw_weight = record.get('weight_kg', record.get('weight'))
+    try:
+        weight_kg = round(float(raw_weight), 2)
+    except (TypeError, ValueError):
+        raise ValueError(f'无效的体重: {raw_weight}') from None
+    if not WEIGHT_MIN_KG <= weight_kg <= WEIGHT_MAX_KG:
+        raise ValueError(f'体重应在{WEIGHT_MIN_KG}-{WEIGHT_MAX_KG}公斤之间: {raw_weight}')
+    measured_at = _parse_time(record.get('measured_at', record.get('date')), now)
+    if measured_at is None:
+        raise ValueError('缺少测量时间 measured_at')
+    key = str(record.get('key') or '').strip()
+    if len(key) > MAX_KEY_LENGTH:
+        raise ValueError(f'key不能超过{MAX_KEY_LENGTH}个字符')
+    if not key:
+        # 没有key时同一时间、同一体重视为同一条记录
+        digest = hashlib.sha1(f'{measured_at.isoformat()}|{weight_kg:.2f}'.encode('utf-8')).hexdigest()
+        key = f'auto:{digest}'
+    notes = str(record.get('notes') or '').strip()
+    return key, measured_at, weight_kg, notes
+
+
+def parse_checkin_record(record, now):
+    """校验一条打卡记录，返回 (daily_id, completed_at)；不合格时抛出ValueError"""
+    if not isinstance(record, dict):
+        raise ValueError('记录应为对象')
+    raw_id = record.get('daily_workout_id', record.get('daily_id'))
+    try:
+        daily_id = int(raw_id)
+    except (TypeError, ValueError):
+        raise ValueError(f'无效的daily_workout_id: {raw_id}') from None
+    completed_at = _parse_time(record.get('completed_at'), now) or now
+    return daily_id, completed_at
+
+
+class ImportReport:
+    """一次导入的统计"""
+
+    def __init__(self):
+        self.received = 0
+        self.imported = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.not_found = 0
+        self.errors = []
+        self.truncated = False
+
+    def reject(self, line, message):
+        self.invalid += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'error': message})
+
+    def as_dict(self):
+        return {
+            'received': self.received,
+            'imported': self.imported,
+            'duplicates': self.duplicates,
+            'invalid': self.invalid,
+            'not_found': self.not_found,
+            'errors': self.errors,
+            'truncated': self.truncated,
+        }
+
+
+def _run_import(records, parse, write, report, chunk_size, max_rows):
+    chunk_size = chunk_size or Config.BULK_IMPORT_CHUNK_SIZE
+    max_rows = max_rows or Config.BULK_IMPORT_MAX_ROWS
+    now = datetime.now().replace(microsecond=0)
+    chunk = []
+    try:
+        for line, record in records:
+            if report.received >= max_rows:
+                report.truncated = True
+                break
+            report.received += 1
+            try:
+                chunk.append(parse(record, now))
+            except ValueError as e:
+                report.reject(line, str(e))
+                continue
+            if len(chunk) >= chunk_size:
+                # 先清空再写入：写入失败时异常直接向上抛出，不会重试同一批
+                batch, chunk = chunk, []
+                write(batch)
+    except (BulkImportError, OSError):
+        # 上传内容格式错误或读取中断时，仍写入出错位置之前的记录
+        if chunk:
+            write(chunk)
+        raise
+    if chunk:
+        write(chunk)
+    return report
+
+
+def import_weight_logs(user_id, records, report=None, chunk_size=None, max_rows=None):
+    """
+    导入体重记录。records为 (行号, 记录dict) 的可迭代对象（见 iter_records）。
+    report: 可选的ImportReport，解析出错（BulkImportError）时调用方仍可读取已写入的统计
+    """
+    report = report or ImportReport()
+
+    def write(chunk):
+        imported = WeightLog.import_chunk(user_id, chunk)
+        report.imported += imported
+        report.duplicates += len(chunk) - imported
+
+    return _run_import(records, parse_weight_record, write, report, chunk_size, max_rows)
+
+
+def import_checkins(user_id, records, report=None, chunk_size=None, max_rows=None):
+    """导入训练打卡，参数同 import_weight_logs"""
+    report = report or ImportReport()
+
+    def write(chunk):
+        completed, _, missing = DailyWorkout.complete_many(user_id, chunk)
+        missing = set(missing)
+        not_found = sum(1 for daily_id, _ in chunk if daily_id in missing)
+        report.imported += completed
+        report.duplicates += len(chunk) - completed - not_found
+        report.not_found += not_found
+
+    return _run_import(records, parse_checkin_record, write, report, chunk_size, max_rows)
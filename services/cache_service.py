@@ -1,116 +1,584 @@
+"""
+运动介绍缓存。
+两级结构：进程内的LRU内存缓存在前，SQLite持久缓存在后，读写都经过两级。
+SQLite中所有条目保存在单个文件中：按cache_key主键查找，按expires_at索引批量过期，
+内容以zlib压缩存储。旧版按文件存储的缓存可通过 migrate_file_cache() 迁移：
+
+    python -m services.cache_service migrate
+"""
 import json
 import os
+import re
+import time
+import zlib
+import sqlite3
 import hashlib
-from datetime import datetime, timedelta
+import logging
+import argparse
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from config import Config
+
+logger = logging.getLogger(__name__)
 
-CACHE_DIR = "cache/exercise_descriptions"
+CACHE_DB_PATH = "cache/exercise_descriptions.db"
+CACHE_DIR = "cache/exercise_descriptions"  # 旧版文件缓存目录（仅用于迁移）
+LOCK_DIR = "cache/locks"  # 跨进程合并请求用的文件锁
 CACHE_TTL_DAYS = 7  # 缓存有效期7天
+WEIGHT_BAND_KG = 5  # 体重分桶宽度
+AGE_BAND_YEARS = 10  # 年龄分桶宽度
 
-def _ensure_cache_dir():
-    """确保缓存目录存在"""
-    os.makedirs(CACHE_DIR, exist_ok=True)
+# 按资料分桶统计的命中/未命中次数（进程内）
+_stats_lock = threading.Lock()
+_bucket_stats = {}
 
-def _get_cache_key(exercise_name, user_profile):
+class LRUCache:
     """
-    根据运动名称和用户资料生成缓存键。
-    使用运动名称和用户资料的哈希（简化：使用用户ID和运动名称）
+    线程安全的内存LRU缓存。
+    - max_entries / max_bytes: 条目数和内容字节数上限，任一超出即淘汰最久未使用的条目
+    - ttl_seconds: 条目在内存中的最长存活秒数
     """
-    # 如果user_profile包含user_id，使用它；否则使用整个profile的JSON字符串哈希
-    user_id = user_profile.get('user_id') if user_profile else None
-    if user_id:
-        key = f"{user_id}_{exercise_name}"
-    else:
-        # 如果没有user_id，使用profile的JSON表示（排序确保一致）
-        # 首先确保profile可序列化
-        serializable_profile = _make_json_serializable(user_profile) if user_profile else {}
-        profile_str = json.dumps(serializable_profile, sort_keys=True)
-        hash_obj = hashlib.md5(profile_str.encode())
-        key = f"{hash_obj.hexdigest()}_{exercise_name}"
+
+    def __init__(self, max_entries=256, max_bytes=4 * 1024 * 1024, ttl_seconds=3600):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._data = OrderedDict()  # key -> (value, size, expires_at)
+        self._bytes = 0
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self._stats['misses'] += 1
+                return None
+            value, size, expires_at = item
+            if time.time() > expires_at:
+                self._remove(key)
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._data.move_to_end(key)
+            self._stats['hits'] += 1
+            return value
+
+    def set(self, key, value, expires_at=None):
+        """写入条目；expires_at为持久层的过期时间，内存中不会比它存活更久"""
+        size = len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        expiry = time.time() + self.ttl_seconds
+        if expires_at is not None:
+            expiry = min(expiry, expires_at)
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, size, expiry)
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self._stats['evictions'] += 1
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._data)
+            stats['bytes'] = self._bytes
+            stats['max_entries'] = self.max_entries
+            stats['max_bytes'] = self.max_bytes
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+
+memory_cache = LRUCache(max_entries=Config.DESCRIPTION_LRU_MAX_ENTRIES,
+                        max_bytes=Config.DESCRIPTION_LRU_MAX_BYTES,
+                        ttl_seconds=Config.DESCRIPTION_LRU_TTL_SECONDS)
+
+_local = threading.local()
+# 表结构在每个进程中只初始化一次（按 (pid, 路径) 记录），之后新线程的连接直接使用
+_schema_lock = threading.Lock()
+_schema_ready = None
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS descriptions (
+    cache_key TEXT PRIMARY KEY,
+    exercise_name TEXT NOT NULL,
+    bucket_id TEXT NOT NULL,
+    content BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    size INTEGER NOT NULL DEFAULT 0,
+    last_access REAL NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_descriptions_expires_at ON descriptions (expires_at);
+"""
+
+# 条目数和总字节数由触发器增量维护，检查容量时无需扫描全表
+_TOTALS_SCHEMA = """
+CREATE INDEX IF NOT EXISTS idx_descriptions_last_access ON descriptions (last_access);
+CREATE TABLE IF NOT EXISTS cache_totals (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    entries INTEGER NOT NULL,
+    bytes INTEGER NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS trg_descriptions_insert AFTER INSERT ON descriptions BEGIN
+    UPDATE cache_totals SET entries = entries + 1, bytes = bytes + NEW.size WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_descriptions_delete AFTER DELETE ON descriptions BEGIN
+    UPDATE cache_totals SET entries = entries - 1, bytes = bytes - OLD.size WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_descriptions_update AFTER UPDATE OF size ON descriptions BEGIN
+    UPDATE cache_totals SET bytes = bytes + NEW.size - OLD.size WHERE id = 1;
+END;
+"""
+
+def _get_conn():
+    """
+    返回当前线程的SQLite连接。
+    SQLite连接不能跨线程或跨fork使用，因此按线程创建并在fork后重建。
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.pid == os.getpid() and _local.path == CACHE_DB_PATH:
+        return conn
+    db_dir = os.path.dirname(CACHE_DB_PATH)
+    if db_dir:
+        os.makedirs(db_dir, exist_ok=True)
+    conn = sqlite3.connect(CACHE_DB_PATH, timeout=5.0, isolation_level=None)
+    # auto_vacuum只对新建的数据库生效，旧库在第一次压缩时通过VACUUM转换
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    _ensure_schema(conn)
+    _local.conn = conn
+    _local.pid = os.getpid()
+    _local.path = CACHE_DB_PATH
+    _start_sweeper()
+    return conn
+
+def _ensure_schema(conn):
+    global _schema_ready
+    marker = (os.getpid(), CACHE_DB_PATH)
+    if _schema_ready == marker:
+        return
+    with _schema_lock:
+        if _schema_ready != marker:
+            _init_schema(conn)
+            _schema_ready = marker
+
+def _init_schema(conn):
+    conn.executescript(_SCHEMA)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(descriptions)")}
+        if 'size' not in columns:
+            # 旧版缓存库没有size/last_access列
+            conn.execute("ALTER TABLE descriptions ADD COLUMN size INTEGER NOT NULL DEFAULT 0")
+            conn.execute("ALTER TABLE descriptions ADD COLUMN last_access REAL NOT NULL DEFAULT 0")
+            conn.execute("UPDATE descriptions SET size = length(content), last_access = created_at")
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    conn.executescript("BEGIN IMMEDIATE;" + _TOTALS_SCHEMA + "COMMIT;")
+    # 只有在汇总行还不存在（新库或旧版缓存库）时才扫描一次全表，之后由触发器维护
+    if conn.execute("SELECT 1 FROM cache_totals WHERE id = 1").fetchone() is None:
+        conn.execute(
+            """INSERT OR IGNORE INTO cache_totals (id, entries, bytes)
+               SELECT 1, COUNT(*), COALESCE(SUM(size), 0) FROM descriptions"""
+        )
+
+def _compress(content):
+    return zlib.compress(content.encode('utf-8'), 6)
+
+def _decompress(blob):
+    return zlib.decompress(blob).decode('utf-8')
+
+def _band(value, width):
+    """把数值归入宽度为width的区间，如 62.5 -> '60-64'"""
+    if value is None or value == '':
+        return 'unknown'
+    try:
+        low = int(float(value) // width * width)
+    except (TypeError, ValueError):
+        return 'unknown'
+    return f"{low}-{low + width - 1}"
+
+def get_profile_bucket(user_profile):
+    """
+    把用户资料归一化为粗粒度分桶：训练经验、排序后的器械、体重区间、年龄区间。
+    资料等价的用户落在同一个分桶，共享同一条缓存。
+    """
+    user_profile = user_profile or {}
+    equipment = user_profile.get('available_equipment') or []
+    if not isinstance(equipment, list):
+        equipment = [str(equipment)]
+    return {
+        'training_experience': user_profile.get('training_experience') or 'beginner',
+        'available_equipment': sorted({str(e).strip() for e in equipment if str(e).strip()}),
+        'weight_band': _band(user_profile.get('current_weight_kg'), WEIGHT_BAND_KG),
+        'age_band': _band(user_profile.get('age'), AGE_BAND_YEARS),
+    }
+
+def _bucket_id(bucket):
+    bucket_str = json.dumps(bucket, sort_keys=True, ensure_ascii=False)
+    return hashlib.md5(bucket_str.encode('utf-8')).hexdigest()[:12]
+
+def get_cache_key(exercise_name, user_profile):
+    """
+    根据运动名称和用户资料分桶生成缓存键。
+    不再按user_id区分，资料等价的用户共享缓存；资料变化后自动落入新分桶。
+    """
+    bucket_id = _bucket_id(get_profile_bucket(user_profile))
+    key = f"{bucket_id}_{exercise_name.strip()}"
     # 文件名安全
-    import re
     key = re.sub(r'[^\w\-_]', '_', key)
     return key
 
-def get_cached_description(exercise_name, user_profile):
-    """获取缓存的运动介绍，如果存在且未过期则返回内容，否则返回None"""
-    _ensure_cache_dir()
-    key = _get_cache_key(exercise_name, user_profile)
-    filepath = os.path.join(CACHE_DIR, f"{key}.json")
-    if not os.path.exists(filepath):
-        return None
+def _record_lookup(user_profile, hit):
+    bucket = get_profile_bucket(user_profile)
+    bucket_id = _bucket_id(bucket)
+    with _stats_lock:
+        stats = _bucket_stats.get(bucket_id)
+        if stats is None:
+            stats = _bucket_stats[bucket_id] = {'bucket': bucket, 'hits': 0, 'misses': 0}
+        stats['hits' if hit else 'misses'] += 1
+
+def get_cache_stats():
+    """返回缓存命中统计：总体命中率及每个资料分桶的命中/未命中次数"""
+    with _stats_lock:
+        buckets = {bucket_id: dict(stats) for bucket_id, stats in _bucket_stats.items()}
+    hits = sum(b['hits'] for b in buckets.values())
+    misses = sum(b['misses'] for b in buckets.values())
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / total if total else 0.0,
+        'buckets': buckets,
+        'memory': memory_cache.stats(),
+        'store': _store_stats(),
+    }
+
+def _store_stats():
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        # 检查过期时间
-        expires_at = datetime.fromisoformat(data['expires_at'])
-        if datetime.now() > expires_at:
-            # 缓存过期，删除文件
-            os.remove(filepath)
+        entries, total_bytes = _get_totals(_get_conn())
+    except sqlite3.Error:
+        entries, total_bytes = None, None
+    return {
+        'entries': entries,
+        'bytes': total_bytes,
+        'max_entries': Config.DESCRIPTION_CACHE_MAX_ENTRIES,
+        'max_bytes': Config.DESCRIPTION_CACHE_MAX_BYTES,
+        'last_sweep': _last_sweep,
+    }
+
+def get_cached_description(exercise_name, user_profile, record_stats=True):
+    """
+    获取缓存的运动介绍，如果存在且未过期则返回内容，否则返回None
+    record_stats: 是否计入命中统计（合并请求时的二次检查不计入）
+    """
+    content = _read_cached_description(exercise_name, user_profile)
+    if record_stats:
+        _record_lookup(user_profile, content is not None)
+    return content
+
+def _read_cached_description(exercise_name, user_profile):
+    key = get_cache_key(exercise_name, user_profile)
+    content = memory_cache.get(key)
+    if content is not None:
+        _touch(key)
+        return content
+    try:
+        row = _get_conn().execute(
+            "SELECT content, expires_at FROM descriptions WHERE cache_key = ?", (key,)
+        ).fetchone()
+        if row is None:
             return None
-        return data['content']
-    except (json.JSONDecodeError, KeyError, IOError):
-        # 文件损坏，删除
-        try:
-            os.remove(filepath)
-        except:
-            pass
+        content, expires_at = row
+        if time.time() > expires_at:
+            # 缓存过期，删除该条目
+            _get_conn().execute("DELETE FROM descriptions WHERE cache_key = ?", (key,))
+            return None
+        content = _decompress(content)
+        memory_cache.set(key, content, expires_at)
+        _touch(key)
+        return content
+    except (sqlite3.Error, zlib.error, UnicodeDecodeError) as e:
+        logger.warning("读取运动介绍缓存失败: %s", e)
         return None
 
-def _make_json_serializable(obj):
-    """递归地将对象转换为JSON可序列化的格式，处理Decimal等类型"""
-    import decimal
-    if isinstance(obj, decimal.Decimal):
-        return float(obj)
-    elif isinstance(obj, dict):
-        return {k: _make_json_serializable(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [_make_json_serializable(v) for v in obj]
-    elif isinstance(obj, tuple):
-        return tuple(_make_json_serializable(v) for v in obj)
-    elif isinstance(obj, (str, int, float, bool, type(None))):
-        return obj
-    else:
-        # 对于其他类型，尝试转换为字符串
-        return str(obj)
-
 def set_cached_description(exercise_name, user_profile, content, ttl_days=CACHE_TTL_DAYS):
     """将运动介绍存入缓存"""
-    _ensure_cache_dir()
-    key = _get_cache_key(exercise_name, user_profile)
-    filepath = os.path.join(CACHE_DIR, f"{key}.json")
-    expires_at = datetime.now() + timedelta(days=ttl_days)
-    # 确保user_profile可序列化
-    serializable_profile = _make_json_serializable(user_profile)
-    data = {
-        'exercise_name': exercise_name,
-        'user_profile': serializable_profile,
-        'content': content,
-        'created_at': datetime.now().isoformat(),
-        'expires_at': expires_at.isoformat()
-    }
+    key = get_cache_key(exercise_name, user_profile)
+    bucket_id = _bucket_id(get_profile_bucket(user_profile))
+    now = time.time()
+    expires_at = now + ttl_days * 86400
+    memory_cache.set(key, content, expires_at)
+    return _store(key, exercise_name, bucket_id, content, now, expires_at)
+
+def _store(key, exercise_name, bucket_id, content, created_at, expires_at):
+    blob = _compress(content)
     try:
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        # 使用UPSERT而不是INSERT OR REPLACE：REPLACE删除旧行时不会触发DELETE触发器
+        _get_conn().execute(
+            """INSERT INTO descriptions
+               (cache_key, exercise_name, bucket_id, content, created_at, expires_at, size, last_access)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (cache_key) DO UPDATE SET
+                   content = excluded.content, created_at = excluded.created_at,
+                   expires_at = excluded.expires_at, size = excluded.size,
+                   last_access = excluded.last_access""",
+            (key, exercise_name, bucket_id, blob, created_at, expires_at, len(blob), created_at)
+        )
         return True
-    except IOError:
+    except sqlite3.Error as e:
+        logger.warning("写入运动介绍缓存失败: %s", e)
         return False
 
 def clear_expired_cache():
-    """清理过期的缓存文件（可选，可以在后台任务中调用）"""
-    _ensure_cache_dir()
-    now = datetime.now()
-    for filename in os.listdir(CACHE_DIR):
-        if filename.endswith('.json'):
-            filepath = os.path.join(CACHE_DIR, filename)
+    """删除所有过期条目（按expires_at索引的一次范围删除），返回删除的条目数"""
+    cursor = _get_conn().execute("DELETE FROM descriptions WHERE expires_at < ?", (time.time(),))
+    return cursor.rowcount
+
+# 读命中只记录在内存中，由清理线程批量写回last_access，读路径上不产生写操作
+_touch_lock = threading.Lock()
+_touched = {}
+_sweeper_lock = threading.Lock()
+_sweeper_pid = None
+_last_sweep = None
+
+def _touch(key):
+    with _touch_lock:
+        _touched[key] = time.time()
+
+def _flush_touches(conn):
+    global _touched
+    with _touch_lock:
+        touched, _touched = _touched, {}
+    if touched:
+        conn.executemany(
+            "UPDATE descriptions SET last_access = ? WHERE cache_key = ? AND last_access < ?",
+            [(ts, key, ts) for key, ts in touched.items()]
+        )
+
+def _get_totals(conn):
+    row = conn.execute("SELECT entries, bytes FROM cache_totals WHERE id = 1").fetchone()
+    return row if row else (0, 0)
+
+def sweep_cache(max_bytes=None, max_entries=None, batch_size=500):
+    """
+    清理持久缓存：删除过期条目，超出容量时按最近访问时间淘汰最旧的条目，
+    直到降到容量的90%，最后回收数据库文件中的空闲页。
+    返回本次清理的统计（删除条目数、回收的内容字节数和文件字节数）。
+    """
+    max_bytes = Config.DESCRIPTION_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    max_entries = Config.DESCRIPTION_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+    start = time.time()
+    conn = _get_conn()
+    file_size_before = _db_file_size()
+    _flush_touches(conn)
+    entries_before, bytes_before = _get_totals(conn)
+    expired = clear_expired_cache()
+    evicted = 0
+    entries, total_bytes = _get_totals(conn)
+    if entries > max_entries or total_bytes > max_bytes:
+        target_entries = int(max_entries * 0.9)
+        target_bytes = int(max_bytes * 0.9)
+        while entries > target_entries or total_bytes > target_bytes:
+            # 按平均条目大小估算需要淘汰的条数，避免一次删除过多
+            avg_size = total_bytes / entries if entries else 1
+            needed = max(entries - target_entries,
+                         int((total_bytes - target_bytes) / avg_size) + 1 if avg_size else 0, 1)
+            cursor = conn.execute(
+                """DELETE FROM descriptions WHERE cache_key IN (
+                       SELECT cache_key FROM descriptions ORDER BY last_access LIMIT ?)""",
+                (min(batch_size, needed),)
+            )
+            if not cursor.rowcount:
+                break
+            evicted += cursor.rowcount
+            entries, total_bytes = _get_totals(conn)
+    if expired or evicted:
+        _compact(conn)
+    _remove_stale_lock_files()
+    result = {
+        'expired': expired,
+        'evicted': evicted,
+        'entries': entries,
+        'bytes': total_bytes,
+        'bytes_reclaimed': bytes_before - total_bytes,
+        'file_bytes_reclaimed': max(file_size_before - _db_file_size(), 0),
+        'finished_at': datetime.now().isoformat(timespec='seconds'),
+        'duration': round(time.time() - start, 3),
+    }
+    if expired or evicted:
+        logger.info("运动介绍缓存清理: 过期 %d 条，淘汰 %d 条，回收 %d 字节",
+                    expired, evicted, result['bytes_reclaimed'])
+    return result
+
+def _compact(conn):
+    """回收空闲页；旧库不是incremental模式时执行一次VACUUM完成转换"""
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        conn.execute("PRAGMA incremental_vacuum").fetchall()
+    else:
+        conn.execute("VACUUM")
+    # 把WAL写回主文件并截断，释放的页才会真正从磁盘上回收
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+
+def _db_file_size():
+    size = 0
+    for suffix in ('', '-wal'):
+        try:
+            size += os.path.getsize(CACHE_DB_PATH + suffix)
+        except OSError:
+            pass
+    return size
+
+def _remove_stale_lock_files(max_age=86400):
+    """删除一天以上未使用的请求合并锁文件"""
+    if not os.path.isdir(LOCK_DIR):
+        return
+    cutoff = time.time() - max_age
+    for entry in os.scandir(LOCK_DIR):
+        try:
+            if entry.name.endswith('.lock') and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+def _start_sweeper():
+    """在当前进程启动后台清理线程（每个进程一个，fork后在子进程中重新启动）"""
+    global _sweeper_pid
+    interval = Config.DESCRIPTION_CACHE_SWEEP_INTERVAL
+    if interval <= 0 or _sweeper_pid == os.getpid():
+        return
+    with _sweeper_lock:
+        if _sweeper_pid == os.getpid():
+            return
+        _sweeper_pid = os.getpid()
+    thread = threading.Thread(target=_sweeper_loop, args=(interval,),
+                              name='description-cache-sweeper', daemon=True)
+    thread.start()
+
+def _sweeper_loop(interval):
+    global _last_sweep
+    try:
+        import fcntl
+    except ImportError:
+        fcntl = None
+    while True:
+        time.sleep(interval)
+        try:
+            _flush_touches(_get_conn())
+            # 多个工作进程时只由拿到锁的一个进程执行清理
+            os.makedirs(LOCK_DIR, exist_ok=True)
+            with open(os.path.join(LOCK_DIR, 'sweeper.lock'), 'a') as lock_file:
+                if fcntl is not None:
+                    try:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        continue
+                _last_sweep = sweep_cache()
+        except Exception as e:
+            logger.exception("运动介绍缓存清理失败: %s", e)
+
+def migrate_file_cache(cache_dir=CACHE_DIR, remove_files=True):
+    """
+    把旧版文件缓存（每条一个JSON文件）导入SQLite。
+    旧版按user_id生成的条目会按其中保存的用户资料重新计算分桶键；
+    同一分桶已存在的条目保留不覆盖。已过期或损坏的文件直接跳过。
+    返回: (导入条数, 跳过条数)
+    """
+    if not os.path.isdir(cache_dir):
+        return 0, 0
+    imported = skipped = 0
+    now = time.time()
+    conn = _get_conn()
+    conn.execute("BEGIN")
+    try:
+        for filename in os.listdir(cache_dir):
+            if not filename.endswith('.json'):
+                continue
+            filepath = os.path.join(cache_dir, filename)
             try:
                 with open(filepath, 'r', encoding='utf-8') as f:
                     data = json.load(f)
-                expires_at = datetime.fromisoformat(data['expires_at'])
-                if now > expires_at:
-                    os.remove(filepath)
-            except:
-                # 如果文件损坏，也删除
+                exercise_name = data['exercise_name']
+                content = data['content']
+                created_at = datetime.fromisoformat(data['created_at']).timestamp()
+                expires_at = datetime.fromisoformat(data['expires_at']).timestamp()
+            except (json.JSONDecodeError, KeyError, ValueError, IOError):
+                skipped += 1
+                continue
+            if expires_at <= now:
+                skipped += 1
+                continue
+            if 'profile_bucket' in data:
+                key = filename[:-len('.json')]
+                bucket_id = _bucket_id(data['profile_bucket'])
+            else:
+                profile = data.get('user_profile') or {}
+                key = get_cache_key(exercise_name, profile)
+                bucket_id = _bucket_id(get_profile_bucket(profile))
+            blob = _compress(content)
+            cursor = conn.execute(
+                """INSERT OR IGNORE INTO descriptions
+                   (cache_key, exercise_name, bucket_id, content, created_at, expires_at, size, last_access)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (key, exercise_name, bucket_id, blob, created_at, expires_at, len(blob), created_at)
+            )
+            if cursor.rowcount:
+                imported += 1
+            else:
+                skipped += 1
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    if remove_files:
+        for filename in os.listdir(cache_dir):
+            if filename.endswith('.json'):
                 try:
-                    os.remove(filepath)
-                except:
-                    pass
\ No newline at end of file
+                    os.remove(os.path.join(cache_dir, filename))
+                except OSError:
+                    pass
+    return imported, skipped
+
+def main():
+    parser = argparse.ArgumentParser(description='运动介绍缓存维护')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    migrate = subparsers.add_parser('migrate', help='把旧版文件缓存导入SQLite')
+    migrate.add_argument('--keep-files', action='store_true', help='导入后保留原JSON文件')
+    subparsers.add_parser('clear-expired', help='删除过期条目')
+    subparsers.add_parser('sweep', help='删除过期条目并按容量上限淘汰、压缩')
+    args = parser.parse_args()
+    if args.command == 'migrate':
+        imported, skipped = migrate_file_cache(remove_files=not args.keep_files)
+        print(f"已导入 {imported} 条，跳过 {skipped} 条。")
+    elif args.command == 'clear-expired':
+        print(f"已删除 {clear_expired_cache()} 条过期缓存。")
+    elif args.command == 'sweep':
+        print(json.dumps(sweep_cache(), ensure_ascii=False, indent=2))
+
+if __name__ == '__main__':
+    main()
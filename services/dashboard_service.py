@@ -0,0 +1,141 @@
+"""
+仪表板数据加载。
+通过一个连接、两条查询取回仪表板需要的全部数据：
+活跃计划连同其每日锻炼（LEFT JOIN），以及增量维护的进度汇总
+（一条UNION ALL查询，每个用户固定的几行，不扫描历史记录；是否有体重记录也由汇总得到）。
+活跃计划已过期时与 WeeklyPlan.get_active_plan 一样先激活到期的待生效计划。
+"""
+import json
+import logging
+from datetime import date, datetime
+
+from database.db_connection import get_db_connection
+from database.models import Progress, WeeklyPlan, week_start_of
+
+logger = logging.getLogger(__name__)
+
+PLAN_COLUMNS = ('id', 'user_id', 'plan_json', 'generated_at', 'start_date', 'end_date', 'is_active')
+WORKOUT_COLUMNS = ('id', 'weekly_plan_id', 'day_number', 'date', 'workout_json',
+                   'completed', 'completion_time', 'user_notes')
+
+ACTIVE_PLAN_WITH_WORKOUTS_SQL = """
+    SELECT p.id AS plan_id, p.user_id, p.plan_json, p.generated_at, p.start_date, p.end_date, p.is_active,
+           d.id AS workout_id, d.day_number, d.date, d.workout_json, d.completed,
+           d.completion_time, d.user_notes
+    FROM (
+        SELECT * FROM weekly_plans
+        WHERE user_id = %s AND is_active = TRUE
+        ORDER BY generated_at DESC LIMIT 1
+    ) p
+    LEFT JOIN daily_workouts d ON d.weekly_plan_id = p.id
+    ORDER BY d.day_number
+"""
+
+
+def _load_plan_rows(user_id):
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(ACTIVE_PLAN_WITH_WORKOUTS_SQL, (user_id,))
+            return cursor.fetchall()
+    finally:
+        conn.close()
+
+
+def load_dashboard(user_id, today=None):
+    """
+    返回仪表板模板需要的数据：
+    has_weight_logs, plan, daily_workouts, today_workout（已解析workout_data和focus）, today, progress
+    """
+    today = today or date.today()
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(ACTIVE_PLAN_WITH_WORKOUTS_SQL, (user_id,))
+            rows = cursor.fetchall()
+            summary = Progress.load_summary(user_id, cursor=cursor)
+    finally:
+        conn.close()
+    # 每行都带有计划的列，第一行即计划本身
+    if rows and WeeklyPlan.activate_if_expired(user_id, rows[0]):
+        rows = _load_plan_rows(user_id)
+
+    plan = None
+    daily_workouts = []
+    today_workout = None
+    for row in rows:
+        if plan is None:
+            plan = {col: row[col] for col in PLAN_COLUMNS if col != 'id'}
+            plan['id'] = row['plan_id']
+        if row['workout_id'] is None:
+            continue
+        workout = {col: row[col] for col in WORKOUT_COLUMNS if col not in ('id', 'weekly_plan_id')}
+        workout['id'] = row['workout_id']
+        workout['weekly_plan_id'] = row['plan_id']
+        if isinstance(workout['date'], str):
+            workout['date'] = datetime.strptime(workout['date'], '%Y-%m-%d').date()
+        if today_workout is None and workout['date'] == today:
+            today_workout = workout
+        daily_workouts.append(workout)
+
+    if today_workout is not None:
+        _parse_workout(today_workout)
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("dashboard user_id=%s plan_id=%s workouts=%d today=%s today_workout_id=%s",
+                     user_id, plan['id'] if plan else None, len(daily_workouts), today,
+                     today_workout['id'] if today_workout else None)
+        for dw in daily_workouts:
+            logger.debug("  id=%s date=%s day_number=%s completed=%s",
+                         dw['id'], dw['date'], dw['day_number'], dw.get('completed'))
+
+    return {
+        'has_weight_logs': bool(summary['totals'] and summary['totals']['weight_logs']),
+        'plan': plan,
+        'daily_workouts': daily_workouts,
+        'today_workout': today_workout,
+        'today': today,
+        'progress': summarize_progress(summary, today),
+    }
+
+
+def summarize_progress(summary, today):
+    """把进度汇总整理成仪表板展示的数值"""
+    totals = summary['totals'] or {}
+    weeks = summary['weeks']
+    this_week = weeks[0] if weeks and weeks[0]['week_start'] == week_start_of(today) else None
+    # 最近两个有体重记录的周，周末体重之差即最近一周的增重
+    weighed = [week for week in weeks if week['last_weight_kg'] is not None][:2]
+    weekly_gain = None
+    if len(weighed) == 2:
+        days = (weighed[0]['week_start'] - weighed[1]['week_start']).days or 7
+        weekly_gain = round(float(weighed[0]['last_weight_kg'] - weighed[1]['last_weight_kg']) * 7 / days, 2)
+    total_gain = None
+    if totals.get('latest_weight_kg') is not None and totals.get('first_weight_kg') is not None:
+        total_gain = round(float(totals['latest_weight_kg'] - totals['first_weight_kg']), 2)
+    return {
+        'workouts_completed': totals.get('workouts_completed', 0),
+        'volume_kg': float(totals.get('volume_kg') or 0),
+        'week_workouts_completed': this_week['workouts_completed'] if this_week else 0,
+        'week_volume_kg': float(this_week['volume_kg']) if this_week else 0.0,
+        'latest_weight_kg': totals.get('latest_weight_kg'),
+        'total_gain_kg': total_gain,
+        'weekly_gain_kg': weekly_gain,
+        'records': summary['records'],
+    }
+
+
+def _parse_workout(workout):
+    """解析workout_json，并把focus提取到顶层方便模板使用"""
+    data = None
+    if workout.get('workout_json'):
+        try:
+            data = json.loads(workout['workout_json'])
+        except (TypeError, ValueError):
+            logger.warning("无法解析每日锻炼 %s 的workout_json", workout['id'])
+    if not isinstance(data, dict):
+        data = {'focus': '未知', 'exercises': []}
+        workout['focus'] = '未知'
+    else:
+        workout['focus'] = data.get('focus', '')
+    workout['workout_data'] = data
@@ -1,50 +1,44 @@
-import openai
-import json
+import asyncio
+import logging
+
 from config import Config
-import httpx
-import re
-from services.cache_service import get_cached_description, set_cached_description
-
-# 配置OpenAI客户端以使用DeepSeek
-client = openai.OpenAI(
-    api_key=Config.DEEPSEEK_API_KEY,
-    base_url=Config.DEEPSEEK_BASE_URL,
-    http_client=httpx.Client(timeout=60.0)
-)
-
-def fix_json_common_issues(json_str):
-    """
-    尝试修复常见的JSON格式问题：
-    1. 在数组或对象末尾添加缺失的逗号（当后面跟着新字段时）
-    2. 移除对象或数组中的尾随逗号
-    3. 修复未转义的双引号（简单处理）
-    """
-    # 修复：在 ']' 后缺少逗号，后面跟着 '"'
-    # 模式：]\\s*\"   => 在 ] 和 " 之间插入逗号
-    import re
-    fixed = re.sub(r'\]\s*\"', '], "', json_str)
-    # 修复：在 '}' 后缺少逗号，后面跟着 '"'
-    fixed = re.sub(r'\}\s*\"', '}, "', fixed)
-    # 移除对象中的尾随逗号（如 ,\s*} -> }）
-    fixed = re.sub(r',\s*}', '}', fixed)
-    # 移除数组中的尾随逗号（如 ,\s*] -> ]）
-    fixed = re.sub(r',\s*]', ']', fixed)
-    # 修复未闭合的字符串（简单处理：忽略）
-    return fixed
-
-def generate_workout_plan(profile):
-    """
-    根据用户资料生成周锻炼计划
+from services.cache_service import (get_cached_description, set_cached_description, get_profile_bucket,
+                                    get_cache_key, LOCK_DIR)
+from services.llm_client import chat_completion, stream_chat_completion, run_sync, iterate_sync
+from services.llm_json import LLMJSONError, parse_llm_json
+from services.plan_schema import ValidationError, cut_inside_day, validate_plan
+from services.resilience import CircuitOpenError, DeadlineExceeded
+from services.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# 合并并发的相同运动介绍请求（跨线程及跨工作进程）
+description_flight = SingleFlight(lock_dir=LOCK_DIR)
+
+PLAN_SYSTEM_PROMPT = "你是一位专业的健身教练，擅长为瘦子（外胚型）设计增重增肌的锻炼计划。请根据用户信息生成一份为期一周的锻炼计划，以JSON格式输出。"
+
+def generate_workout_plan(profile, fallback=True):
+    """
+    根据用户资料生成周锻炼计划（同步接口，在后台事件循环中执行 agenerate_workout_plan）
     profile: 用户资料字典
-    返回: JSON字符串格式的周计划
+    fallback: 调用失败或输出无法解析时是否返回默认计划；为False时返回None
+    返回: 校验后的周计划（dict，{"days": [...]}）
+    """
+    return run_sync(agenerate_workout_plan(profile, fallback))
+
+async def agenerate_workout_plan(profile, fallback=True):
+    """
+    generate_workout_plan 的异步版本
+    返回: 校验后的周计划（dict）
     """
     # 构建提示
     prompt = build_prompt(profile)
     try:
-        response = client.chat.completions.create(
+        content = await chat_completion(
+            deadline=Config.LLM_PLAN_DEADLINE,
             model="deepseek-chat",
             messages=[
-                {"role": "system", "content": "你是一位专业的健身教练，擅长为瘦子（外胚型）设计增重增肌的锻炼计划。请根据用户信息生成一份为期一周的锻炼计划，以JSON格式输出。"},
+                {"role": "system", "content": PLAN_SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.7,
@@ -52,45 +46,41 @@ def generate_workout_plan(profile):
                 'type': 'json_object'
             },
             max_tokens=2000,
-            stream=False,
         )
-        content = response.choices[0].message.content
-        print(f"DeepSeek API原始响应: {content[:500]}...")  # 打印前500字符
-        # 提取JSON部分
-        json_match = re.search(r'\{.*\}', content, re.DOTALL)
-        if json_match:
-            json_str = json_match.group()
-            print(f"提取的JSON字符串 (长度 {len(json_str)}): {json_str[:200]}...")
-            # 尝试修复常见JSON问题
-            fixed = fix_json_common_issues(json_str)
-            # 验证JSON
-            try:
-                parsed = json.loads(fixed)
-                print("JSON解析成功（修复后）")
-                return fixed
-            except json.JSONDecodeError as je:
-                print(f"JSON解析失败（修复后）: {je}")
-                print(f"有问题的JSON片段: {fixed[je.pos-50:je.pos+50]}")
-                # 返回默认计划
-                return get_default_plan(profile)
-        else:
-            print("未找到JSON结构，使用默认计划")
-            # 如果没找到JSON，返回一个默认计划
-            return get_default_plan(profile)
+    except (CircuitOpenError, DeadlineExceeded) as e:
+        logger.warning("DeepSeek暂不可用，使用默认计划: %s", e)
+        return get_default_plan(profile) if fallback else None
     except Exception as e:
-        import traceback
-        print(f"DeepSeek API错误详情:")
-        print(f"异常类型: {type(e).__name__}")
-        print(f"异常消息: {str(e)}")
-        traceback.print_exc()
-        # 如果是httpx或openai错误，尝试获取更多信息
-        if hasattr(e, 'response'):
-            try:
-                print(f"响应状态码: {e.response.status_code}")
-                print(f"响应内容: {e.response.text}")
-            except:
-                pass
-        return get_default_plan(profile)
+        # openai的APIStatusError带有响应状态码，便于区分限流、鉴权和服务端错误
+        logger.exception("DeepSeek API调用失败（生成计划，状态码 %s），使用默认计划",
+                         getattr(getattr(e, 'response', None), 'status_code', None))
+        return get_default_plan(profile) if fallback else None
+    return _extract_plan_json(content, profile, fallback)
+
+def _extract_plan_json(content, profile, fallback=True):
+    """
+    从模型输出中解析并校验计划（一次扫描完成提取、修复和解析）。
+    输出被max_tokens截断在某个训练日之内时丢弃这个不完整的训练日；
+    fallback为True时缺少的训练日由规则引擎补齐，解析失败时返回默认计划，
+    fallback为False时返回可能不足7天的计划，解析失败时返回None。
+    """
+    # 原始输出包含根据用户资料生成的内容，只在DEBUG级别记录长度和开头一小段
+    logger.debug("DeepSeek计划输出 %d 字符: %.80s", len(content), content)
+    try:
+        data, cut_path = parse_llm_json(content)
+        if cut_inside_day(cut_path):
+            logger.warning("DeepSeek输出被截断（长度 %d），丢弃最后一个不完整的训练日", len(content))
+        plan = validate_plan(data, cut_path)
+    except (LLMJSONError, ValidationError) as e:
+        logger.warning("计划JSON解析或校验失败，使用默认计划: %s", e)
+        return get_default_plan(profile) if fallback else None
+    if not plan['days']:
+        logger.warning("计划中没有有效的训练日，使用默认计划")
+        return get_default_plan(profile) if fallback else None
+    if fallback:
+        from services.plan_engine import complete_plan
+        plan = complete_plan(plan, profile)
+    return plan
 
 def build_prompt(profile):
     """构建提示文本"""
@@ -142,53 +132,105 @@ def build_prompt(profile):
     return prompt
 
 def get_default_plan(profile):
-    """返回一个默认计划（当API失败时）"""
-    days = []
-    focus_areas = [
-        "胸部、三头肌",
-        "背部、二头肌",
-        "腿部、肩部",
-        "全身",
-        "核心、有氧",
-        "休息",
-        "活动恢复"
-    ]
-    for i in range(7):
-        days.append({
-            "day": i+1,
-            "focus": focus_areas[i],
-            "exercises": [
-                {
-                    "name": "示例动作",
-                    "sets": 3,
-                    "reps": "10-15",
-                    "weight": "自重或轻重量",
-                    "rest": "60秒"
-                }
-            ],
-            "tips": "根据自身感受调整强度。"
-        })
-    return json.dumps({"days": days}, ensure_ascii=False)
-def generate_exercise_description(exercise_name, user_profile):
+    """返回规则引擎生成的计划（dict，当API失败时）"""
+    from services.plan_engine import fallback_plan
+    return fallback_plan(profile)
+
+DAY_SYSTEM_PROMPT = "你是一位专业的健身教练，擅长为瘦子（外胚型）设计增重增肌的锻炼计划。请只重新设计指定的训练日，以JSON格式输出。"
+
+# 重新生成单日时每天的输出上限（整周计划为2000）
+DAY_MAX_TOKENS = 400
+
+def generate_workout_days(profile, plan, day_numbers, note=''):
     """
-    生成运动的详细介绍，使用缓存避免重复调用API。
-    exercise_name: 运动名称（字符串）
-    user_profile: 用户资料字典（包含user_id等）
-    返回: (介绍文本, 是否缓存)
+    只重新生成周计划中的指定几天（同步接口）
+    plan: 当前周计划（dict）
+    day_numbers: 要重新生成的天（1-7）
+    note: 用户的调整要求，如"不想做深蹲"
+    返回: {day: 当天计划dict}，只包含成功生成的天；调用失败时返回空dict
     """
-    # 首先检查缓存
-    cached = get_cached_description(exercise_name, user_profile)
-    if cached is not None:
-        print(f"[INFO] 使用缓存的运动介绍: {exercise_name}")
-        return cached, True
+    return run_sync(agenerate_workout_days(profile, plan, day_numbers, note))
 
-    print(f"[INFO] 调用DeepSeek API生成运动介绍: {exercise_name}")
-    # 构建提示
-    equipment = user_profile.get('available_equipment', [])
+async def agenerate_workout_days(profile, plan, day_numbers, note=''):
+    """generate_workout_days 的异步版本"""
+    prompt = build_days_prompt(profile, plan, day_numbers, note)
+    try:
+        content = await chat_completion(
+            deadline=Config.LLM_PLAN_DEADLINE,
+            model="deepseek-chat",
+            messages=[
+                {"role": "system", "content": DAY_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.9,
+            response_format={
+                'type': 'json_object'
+            },
+            max_tokens=DAY_MAX_TOKENS * len(day_numbers),
+        )
+    except (CircuitOpenError, DeadlineExceeded) as e:
+        logger.warning("DeepSeek暂不可用，由规则引擎重新生成: %s", e)
+        return {}
+    except Exception as e:
+        logger.exception("重新生成训练日失败，由规则引擎重新生成")
+        return {}
+    try:
+        data, cut_path = parse_llm_json(content)
+        days = validate_plan(data, cut_path)['days']
+    except (LLMJSONError, ValidationError) as e:
+        logger.warning("重新生成的训练日解析或校验失败: %s", e)
+        return {}
+    wanted = set(day_numbers)
+    return {day['day']: day for day in days if day['day'] in wanted and day['exercises']}
+
+def _day_outline(day):
+    names = '、'.join(exercise['name'] for exercise in day.get('exercises', [])) or '无'
+    return f"第{day.get('day')}天 {day.get('focus', '')}：{names}"
+
+def build_days_prompt(profile, plan, day_numbers, note=''):
+    """
+    构建重新生成指定训练日的提示：只包含训练相关的资料、本周其余各天的概要（用于避免重复和保持分化）
+    以及要替换的那几天的当前内容，不包含整周的完整计划。
+    """
+    preferences = profile.get('preferences') or {}
+    equipment = profile.get('available_equipment', [])
     if isinstance(equipment, list):
         equipment_str = '、'.join(equipment) if equipment else '无器械（自重训练）'
     else:
         equipment_str = str(equipment)
+    wanted = set(day_numbers)
+    others = [_day_outline(day) for day in plan.get('days', []) if day.get('day') not in wanted]
+    current = [_day_outline(day) for day in plan.get('days', []) if day.get('day') in wanted]
+    prompt = f"""
+用户信息：训练经验 {profile.get('training_experience', 'beginner')}；可用器械 {equipment_str}；
+每次训练 {preferences.get('session_minutes', 60)} 分钟；避免 {preferences.get('avoid', '无')}
+
+本周其他训练日（保持不变）：
+{chr(10).join(others) or '无'}
+
+需要替换的训练日（当前内容）：
+{chr(10).join(current)}
+"""
+    if note:
+        prompt += f"\n用户的调整要求：{note}\n"
+    prompt += f"""
+请重新设计第{'、'.join(str(n) for n in sorted(wanted))}天：训练部位与原来一致或与其他训练日互补，换用不同的动作。
+只输出这几天，JSON结构：{{"days": [{{"day": 2, "focus": "...", "exercises": [{{"name": "...", "sets": 3, "reps": "8-12", "weight": "...", "rest": "..."}}], "tips": "..."}}]}}
+"""
+    return prompt
+
+EXERCISE_SYSTEM_PROMPT = "你是一位专业的健身教练，擅长为瘦子（外胚型）设计增重增肌的锻炼计划。请根据用户信息提供运动的详细介绍。"
+
+def build_exercise_prompt(exercise_name, user_profile):
+    """
+    构建运动介绍的提示文本。
+    只使用资料分桶中的信息，保证共享同一缓存条目的用户得到的介绍都适用。
+    """
+    bucket = get_profile_bucket(user_profile)
+    equipment = bucket['available_equipment']
+    equipment_str = '、'.join(equipment) if equipment else '无器械（自重训练）'
+    age_band = bucket['age_band'] if bucket['age_band'] != 'unknown' else '未提供'
+    weight_band = bucket['weight_band'] if bucket['weight_band'] != 'unknown' else '未提供'
 
     prompt = f"""
 你是一位专业的健身教练，擅长为瘦子（外胚型）设计增重增肌的锻炼计划。
@@ -198,45 +240,136 @@ def generate_exercise_description(exercise_name, user_profile):
 3. 适合的训练阶段（初学者/中级/高级）
 4. 变式动作（如果有）
 5. 安全注意事项
-6. 与该用户个人情况的结合建议（根据用户资料）
+6. 与该类用户情况的结合建议（根据用户资料）
 
 用户信息：
-- 年龄：{user_profile.get('age', '未提供')}
-- 身高：{user_profile.get('height_cm', '未提供')} cm
-- 当前体重：{user_profile.get('current_weight_kg', '未提供')} kg
-- 目标体重：{user_profile.get('target_weight_kg', '未提供')} kg
-- 训练经验：{user_profile.get('training_experience', 'beginner')}
+- 年龄段：{age_band} 岁
+- 体重区间：{weight_band} kg
+- 训练经验：{bucket['training_experience']}
 - 可用器械：{equipment_str}
 
 请针对运动「{exercise_name}」提供详细介绍。
 请用中文回答，语言亲切、专业，段落清晰。
 """
+    return prompt
+
+def get_default_description(exercise_name):
+    """返回一个默认介绍（当API失败时）"""
+    return f"""
+运动名称：{exercise_name}
+
+动作要领：请保持标准姿势，注意控制节奏。
+目标肌肉群：根据动作而定。
+适合阶段：初学者。
+安全注意事项：避免重量过大导致受伤。
+结合建议：根据您的个人情况，建议从轻重量开始，逐渐增加强度。
+"""
+
+def generate_exercise_description(exercise_name, user_profile):
+    """
+    生成运动的详细介绍，使用缓存避免重复调用API。
+    exercise_name: 运动名称（字符串）
+    user_profile: 用户资料字典（按资料分桶共享缓存）
+    返回: (介绍文本, 是否缓存)
+    """
+    # 首先检查缓存
+    cached = get_cached_description(exercise_name, user_profile)
+    if cached is not None:
+        logger.info("使用缓存的运动介绍: %s", exercise_name)
+        return cached, True
+
+    hit = []
+
+    def recheck():
+        # 等到锁后再查一次缓存：其他线程或进程可能刚刚生成过
+        content = get_cached_description(exercise_name, user_profile, record_stats=False)
+        if content is not None:
+            hit.append(True)
+        return content
+
+    # 与 stream_exercise_description 共用同一个key，结果统一为介绍全文（跟随者可能拿到流式调用的结果）
+    key = get_cache_key(exercise_name, user_profile)
+    content = description_flight.do(
+        key, lambda: run_sync(_agenerate_description_from_api(exercise_name, user_profile))[0],
+        recheck=recheck)
+    return content, bool(hit)
+
+async def _agenerate_description_from_api(exercise_name, user_profile):
+    logger.info("调用DeepSeek API生成运动介绍: %s", exercise_name)
+    prompt = build_exercise_prompt(exercise_name, user_profile)
     try:
-        response = client.chat.completions.create(
+        content = await chat_completion(
+            deadline=Config.LLM_DESCRIPTION_DEADLINE,
             model="deepseek-chat",
             messages=[
-                {"role": "system", "content": "你是一位专业的健身教练，擅长为瘦子（外胚型）设计增重增肌的锻炼计划。请根据用户信息提供运动的详细介绍。"},
+                {"role": "system", "content": EXERCISE_SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.7,
             max_tokens=1500
         )
-        content = response.choices[0].message.content.strip()
-        # 存入缓存
-        set_cached_description(exercise_name, user_profile, content)
-        return content, False
-    except Exception as e:
-        import traceback
-        print(f"DeepSeek API错误（生成运动介绍）: {e}")
-        traceback.print_exc()
+        content = content.strip()
+    except (CircuitOpenError, DeadlineExceeded) as e:
+        logger.warning("DeepSeek暂不可用，使用默认介绍（%s）: %s", exercise_name, e)
+        return get_default_description(exercise_name), False
+    except Exception:
+        logger.exception("DeepSeek API调用失败（生成运动介绍 %s）", exercise_name)
         # 返回一个默认介绍
-        default_desc = f"""
-运动名称：{exercise_name}
+        return get_default_description(exercise_name), False
+    # 存入缓存（在线程池中写入，不阻塞事件循环）
+    await asyncio.to_thread(set_cached_description, exercise_name, user_profile, content)
+    return content, False
 
-动作要领：请保持标准姿势，注意控制节奏。
-目标肌肉群：根据动作而定。
-适合阶段：初学者。
-安全注意事项：避免重量过大导致受伤。
-结合建议：根据您的个人情况，建议从轻重量开始，逐渐增加强度。
-"""
-        return default_desc, False
\ No newline at end of file
+def stream_exercise_description(exercise_name, user_profile):
+    """
+    流式生成运动介绍。
+    返回: (文本片段迭代器, 是否缓存)
+    缓存命中时迭代器只产生一个完整片段；否则逐个转发DeepSeek返回的token，
+    流结束后把拼接好的全文写入缓存。并发的相同请求只有一个真正调用API，
+    其余请求等待其结束后一次性得到全文。
+    输出部分内容后上游出错时迭代器抛出异常（不写缓存），调用方应告知客户端介绍不完整。
+    """
+    cached = get_cached_description(exercise_name, user_profile)
+    if cached is not None:
+        logger.info("使用缓存的运动介绍: %s", exercise_name)
+        return iter([cached]), True
+    key = get_cache_key(exercise_name, user_profile)
+    chunks = description_flight.stream(
+        key, lambda: _stream_from_api(exercise_name, user_profile),
+        recheck=lambda: get_cached_description(exercise_name, user_profile, record_stats=False))
+    return chunks, False
+
+def _stream_from_api(exercise_name, user_profile):
+    logger.info("流式调用DeepSeek API生成运动介绍: %s", exercise_name)
+    prompt = build_exercise_prompt(exercise_name, user_profile)
+    parts = []
+    try:
+        # token在后台事件循环中接收，这里逐个取出转发
+        stream = iterate_sync(stream_chat_completion(
+            deadline=Config.LLM_DESCRIPTION_DEADLINE,
+            model="deepseek-chat",
+            messages=[
+                {"role": "system", "content": EXERCISE_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.7,
+            max_tokens=1500,
+        ))
+        for text in stream:
+            parts.append(text)
+            yield text
+    except Exception as e:
+        if parts:
+            # 已输出部分内容时不能再换成默认介绍：向上抛出，不写缓存，
+            # 由路由发送failed事件，合并到本次调用的其他请求也得到同一个异常
+            logger.warning("流式生成运动介绍中断（%s，已输出 %d 段）: %s", exercise_name, len(parts), e)
+            raise
+        if isinstance(e, (CircuitOpenError, DeadlineExceeded)):
+            logger.warning("DeepSeek暂不可用，使用默认介绍（%s）: %s", exercise_name, e)
+        else:
+            logger.exception("DeepSeek API调用失败（流式生成运动介绍 %s）", exercise_name)
+        yield get_default_description(exercise_name)
+        return
+    content = ''.join(parts).strip()
+    if content:
+        set_cached_description(exercise_name, user_profile, content)
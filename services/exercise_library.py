@@ -0,0 +1,121 @@
+"""
+本地动作库，供规则计划引擎（services/plan_engine.py）使用。
+每个动作标注训练部位、动作模式、所需器械、最低训练水平和类型，
+并按 (部位, 水平) 建立索引，查询时再按用户的器械过滤。
+部位和器械名称与资料页的选项一致。
+"""
+from collections import defaultdict
+
+LEVELS = ('beginner', 'intermediate', 'advanced')
+
+# 不需要额外器械即可使用的"器械"
+BODYWEIGHT_EQUIPMENT = {'无器械', '瑜伽垫'}
+
+# name, area, pattern, equipment（全部需要）, level（最低水平）, kind, tags（用于匹配"希望避免"）
+# pattern: push / pull / legs / core / cardio
+# kind: compound（复合）/ isolation（孤立）/ core / hold（静态保持）/ cardio
+_EXERCISES = [
+    # 胸部
+    ('俯卧撑', '胸部', 'push', (), 'beginner', 'compound', ('手腕',)),
+    ('跪姿俯卧撑', '胸部', 'push', (), 'beginner', 'compound', ('手腕',)),
+    ('下斜俯卧撑', '胸部', 'push', (), 'intermediate', 'compound', ('手腕',)),
+    ('哑铃卧推', '胸部', 'push', ('哑铃',), 'beginner', 'compound', ('卧推',)),
+    ('上斜哑铃卧推', '胸部', 'push', ('哑铃',), 'intermediate', 'compound', ('卧推',)),
+    ('哑铃飞鸟', '胸部', 'push', ('哑铃',), 'beginner', 'isolation', ()),
+    ('杠铃卧推', '胸部', 'push', ('杠铃', '卧推架'), 'intermediate', 'compound', ('卧推',)),
+    ('弹力带夹胸', '胸部', 'push', ('弹力带',), 'beginner', 'isolation', ()),
+    # 背部
+    ('引体向上', '背部', 'pull', ('引体向上杆',), 'intermediate', 'compound', ('悬垂',)),
+    ('弹力带辅助引体向上', '背部', 'pull', ('引体向上杆', '弹力带'), 'beginner', 'compound', ('悬垂',)),
+    ('哑铃单臂划船', '背部', 'pull', ('哑铃',), 'beginner', 'compound', ('划船',)),
+    ('杠铃俯身划船', '背部', 'pull', ('杠铃',), 'intermediate', 'compound', ('划船', '腰')),
+    ('杠铃硬拉', '背部', 'pull', ('杠铃',), 'intermediate', 'compound', ('硬拉', '腰')),
+    ('壶铃摆荡', '背部', 'pull', ('壶铃',), 'intermediate', 'compound', ('腰',)),
+    ('弹力带坐姿划船', '背部', 'pull', ('弹力带',), 'beginner', 'compound', ('划船',)),
+    ('俯身Y字伸展', '背部', 'pull', (), 'beginner', 'isolation', ()),
+    ('超人式', '背部', 'pull', (), 'beginner', 'isolation', ('腰',)),
+    # 肩部
+    ('哑铃推举', '肩部', 'push', ('哑铃',), 'beginner', 'compound', ('过头', '推举')),
+    ('杠铃站姿推举', '肩部', 'push', ('杠铃',), 'intermediate', 'compound', ('过头', '推举', '腰')),
+    ('派克俯卧撑', '肩部', 'push', (), 'intermediate', 'compound', ('过头', '手腕')),
+    ('哑铃侧平举', '肩部', 'push', ('哑铃',), 'beginner', 'isolation', ()),
+    ('弹力带侧平举', '肩部', 'push', ('弹力带',), 'beginner', 'isolation', ()),
+    ('哑铃俯身飞鸟', '肩部', 'pull', ('哑铃',), 'beginner', 'isolation', ()),
+    ('弹力带面拉', '肩部', 'pull', ('弹力带',), 'beginner', 'isolation', ()),
+    ('墙壁天使', '肩部', 'pull', (), 'beginner', 'isolation', ()),
+    # 腿部
+    ('自重深蹲', '腿部', 'legs', (), 'beginner', 'compound', ('深蹲', '膝')),
+    ('箭步蹲', '腿部', 'legs', (), 'beginner', 'compound', ('膝',)),
+    ('保加利亚分腿蹲', '腿部', 'legs', (), 'intermediate', 'compound', ('膝',)),
+    ('哑铃高脚杯深蹲', '腿部', 'legs', ('哑铃',), 'beginner', 'compound', ('深蹲', '膝')),
+    ('壶铃高脚杯深蹲', '腿部', 'legs', ('壶铃',), 'beginner', 'compound', ('深蹲', '膝')),
+    ('哑铃罗马尼亚硬拉', '腿部', 'legs', ('哑铃',), 'beginner', 'compound', ('硬拉', '腰')),
+    ('杠铃深蹲', '腿部', 'legs', ('杠铃', '深蹲架'), 'intermediate', 'compound', ('深蹲', '膝', '腰')),
+    ('杠铃前蹲', '腿部', 'legs', ('杠铃', '深蹲架'), 'advanced', 'compound', ('深蹲', '膝', '手腕')),
+    ('臀桥', '腿部', 'legs', (), 'beginner', 'isolation', ()),
+    ('单腿臀桥', '腿部', 'legs', (), 'intermediate', 'isolation', ()),
+    ('提踵', '腿部', 'legs', (), 'beginner', 'isolation', ()),
+    # 手臂
+    ('哑铃弯举', '手臂', 'pull', ('哑铃',), 'beginner', 'isolation', ()),
+    ('哑铃锤式弯举', '手臂', 'pull', ('哑铃',), 'beginner', 'isolation', ()),
+    ('杠铃弯举', '手臂', 'pull', ('杠铃',), 'intermediate', 'isolation', ('手腕',)),
+    ('弹力带弯举', '手臂', 'pull', ('弹力带',), 'beginner', 'isolation', ()),
+    ('钻石俯卧撑', '手臂', 'push', (), 'intermediate', 'compound', ('手腕',)),
+    ('椅子臂屈伸', '手臂', 'push', (), 'beginner', 'compound', ('肩',)),
+    ('哑铃颈后臂屈伸', '手臂', 'push', ('哑铃',), 'beginner', 'isolation', ('过头',)),
+    ('弹力带下压', '手臂', 'push', ('弹力带',), 'beginner', 'isolation', ()),
+    # 核心
+    ('平板支撑', '核心', 'core', (), 'beginner', 'hold', ()),
+    ('侧平板支撑', '核心', 'core', (), 'beginner', 'hold', ()),
+    ('死虫式', '核心', 'core', (), 'beginner', 'core', ()),
+    ('卷腹', '核心', 'core', (), 'beginner', 'core', ('颈',)),
+    ('俄罗斯转体', '核心', 'core', (), 'beginner', 'core', ('腰',)),
+    ('悬垂举腿', '核心', 'core', ('引体向上杆',), 'intermediate', 'core', ('悬垂',)),
+    ('健腹轮', '核心', 'core', (), 'advanced', 'core', ('腰',)),
+    # 有氧（外胚型增重期控制有氧量，只作为热身或少量补充）
+    ('快走', '有氧', 'cardio', (), 'beginner', 'cardio', ()),
+    ('跑步机坡度快走', '有氧', 'cardio', ('跑步机',), 'beginner', 'cardio', ()),
+    ('动感单车', '有氧', 'cardio', ('动感单车',), 'beginner', 'cardio', ()),
+    ('开合跳', '有氧', 'cardio', (), 'beginner', 'cardio', ('膝',)),
+    ('登山跑', '有氧', 'cardio', (), 'intermediate', 'cardio', ('手腕',)),
+]
+
+EXERCISES = [
+    {'name': name, 'area': area, 'pattern': pattern, 'equipment': frozenset(equipment),
+     'level': level, 'kind': kind, 'tags': tags}
+    for name, area, pattern, equipment, level, kind, tags in _EXERCISES
+]
+
+_INDEX = defaultdict(list)
+for _exercise in EXERCISES:
+    _INDEX[(_exercise['area'], _exercise['level'])].append(_exercise)
+
+
+def normalize_level(level):
+    return level if level in LEVELS else 'beginner'
+
+
+def available_equipment_set(equipment):
+    """把资料中的器械列表转换为集合（总是包含无需器械的选项）"""
+    if isinstance(equipment, str):
+        equipment = [equipment]
+    return set(equipment or []) | BODYWEIGHT_EQUIPMENT
+
+
+def find_exercises(area, level, equipment, pattern=None):
+    """
+    返回某部位中适合该水平（不超过用户水平）且器械满足的动作。
+    排序：复合动作在前；同类中负重动作在前（增肌更容易渐进超负荷），再按难度从高到低（更接近用户水平）。
+    """
+    level = normalize_level(level)
+    available = available_equipment_set(equipment)
+    results = []
+    for candidate_level in LEVELS[:LEVELS.index(level) + 1]:
+        for exercise in _INDEX.get((area, candidate_level), ()):
+            if pattern is not None and exercise['pattern'] != pattern:
+                continue
+            if exercise['equipment'] <= available:
+                results.append(exercise)
+    kind_order = {'compound': 0, 'isolation': 1, 'core': 1, 'hold': 1, 'cardio': 2}
+    results.sort(key=lambda e: (kind_order[e['kind']], not e['equipment'], -LEVELS.index(e['level'])))
+    return results
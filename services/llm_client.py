@@ -0,0 +1,262 @@
+"""
+DeepSeek异步客户端层。
+所有LLM调用都在每个进程一个的后台事件循环线程中，通过 openai.AsyncOpenAI 执行：
+- httpx.AsyncClient 复用keep-alive连接，安装了 h2 时启用HTTP/2（同一连接上多路复用）
+- 全局信号量限制同时在途的调用数（LLM_MAX_CONCURRENCY），超出的调用在事件循环中排队
+- 令牌桶限流、带抖动的重试、熔断器和每次调用的截止时间（见 services/resilience.py），
+  上游故障时调用方能在截止时间内拿到异常并降级，而不是每次都等满HTTP超时
+等待上游响应时不占用线程，一个进程可以同时挂起几十个调用。
+同步代码（Flask路由、计划任务线程）通过 run_sync() / iterate_sync() 调用异步函数。
+"""
+import asyncio
+import importlib.util
+import os
+import threading
+import time
+
+from config import Config
+from services.resilience import CircuitBreaker, DeadlineExceeded, TokenBucket, call_with_retry
+
+_lock = threading.Lock()
+_loop = None
+_loop_pid = None
+_client = None
+_semaphore = None
+_stats = {'calls': 0, 'streams': 0, 'errors': 0, 'retries': 0, 'in_flight': 0, 'in_flight_max': 0,
+          'queued': 0, 'queue_timeouts': 0, 'wait_time_total': 0.0, 'wait_time_max': 0.0}
+_retry_reasons = {}
+
+# 限流和熔断状态按进程保存，只在事件循环线程中访问
+rate_limiter = TokenBucket(Config.LLM_RATE_LIMIT, Config.LLM_RATE_BURST)
+breaker = CircuitBreaker(Config.LLM_BREAKER_THRESHOLD, Config.LLM_BREAKER_RESET_SECONDS)
+
+
+def http2_available():
+    return importlib.util.find_spec('h2') is not None
+
+
+def get_loop():
+    """返回本进程的后台事件循环（首次调用或fork后启动）"""
+    global _loop, _loop_pid, _client, _semaphore
+    if _loop is None or _loop_pid != os.getpid():
+        with _lock:
+            if _loop is None or _loop_pid != os.getpid():
+                # fork后父进程的事件循环线程不存在，客户端的连接也属于父进程，全部丢弃
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=_run_loop, args=(loop,), name='llm-event-loop', daemon=True)
+                thread.start()
+                _client = None
+                _semaphore = None
+                _loop = loop
+                _loop_pid = os.getpid()
+    return _loop
+
+
+def _run_loop(loop):
+    asyncio.set_event_loop(loop)
+    loop.run_forever()
+
+
+def reset():
+    """丢弃当前进程的事件循环和客户端（gunicorn post_fork中调用），下次使用时重新创建"""
+    global _lock, _loop, _loop_pid, _client, _semaphore
+    _lock = threading.Lock()
+    _loop = None
+    _loop_pid = None
+    _client = None
+    _semaphore = None
+
+
+def run_sync(coro, timeout=None):
+    """在后台事件循环中执行协程并等待结果（供同步代码调用，不能在事件循环线程中调用）"""
+    future = asyncio.run_coroutine_threadsafe(coro, get_loop())
+    return future.result(timeout)
+
+
+def iterate_sync(agen):
+    """把异步生成器转换为同步生成器；调用方提前停止迭代时关闭异步生成器"""
+    loop = get_loop()
+    try:
+        while True:
+            try:
+                item = asyncio.run_coroutine_threadsafe(agen.__anext__(), loop).result()
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        asyncio.run_coroutine_threadsafe(agen.aclose(), loop).result()
+
+
+def get_async_client():
+    """返回本进程共享的AsyncOpenAI客户端（必须在后台事件循环中调用）"""
+    global _client
+    if _client is None:
+        import httpx
+        import openai
+        http_client = httpx.AsyncClient(
+            http2=Config.LLM_HTTP2 and http2_available(),
+            timeout=httpx.Timeout(Config.LLM_TIMEOUT, connect=10.0),
+            limits=httpx.Limits(max_connections=Config.LLM_MAX_CONNECTIONS,
+                                max_keepalive_connections=Config.LLM_MAX_KEEPALIVE,
+                                keepalive_expiry=Config.LLM_KEEPALIVE_EXPIRY),
+        )
+        _client = openai.AsyncOpenAI(
+            api_key=Config.DEEPSEEK_API_KEY,
+            base_url=Config.DEEPSEEK_BASE_URL,
+            http_client=http_client,
+            # 重试由 call_with_retry 负责，受截止时间和熔断器约束
+            max_retries=0,
+        )
+    return _client
+
+
+def _get_semaphore():
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(Config.LLM_MAX_CONCURRENCY)
+    return _semaphore
+
+
+class _Slot:
+    """
+    占用一个并发名额，并记录排队时间和在途数。
+    在重试（call_with_retry）之外获取：本地排队等待不计入每次尝试的超时，
+    排队超过截止时间抛出的DeadlineExceeded也不会被熔断器当作上游故障。
+    """
+
+    def __init__(self, deadline=None):
+        self.deadline = deadline
+
+    async def __aenter__(self):
+        semaphore = _get_semaphore()
+        start = time.monotonic()
+        queued = semaphore.locked()
+        if queued:
+            _stats['queued'] += 1
+        if self.deadline is None:
+            await semaphore.acquire()
+        else:
+            try:
+                await asyncio.wait_for(semaphore.acquire(), max(self.deadline - start, 0))
+            except asyncio.TimeoutError:
+                _stats['queue_timeouts'] += 1
+                raise DeadlineExceeded('等待并发名额超过截止时间') from None
+        wait_time = time.monotonic() - start
+        if queued:
+            _stats['wait_time_total'] += wait_time
+            _stats['wait_time_max'] = max(_stats['wait_time_max'], wait_time)
+        _stats['in_flight'] += 1
+        _stats['in_flight_max'] = max(_stats['in_flight_max'], _stats['in_flight'])
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        _stats['in_flight'] -= 1
+        if exc_type is not None and not issubclass(exc_type, GeneratorExit):
+            _stats['errors'] += 1
+        _get_semaphore().release()
+
+
+def _is_retryable(exc):
+    """超时、连接错误、429和5xx值得重试；其他4xx（请求本身有问题）不重试"""
+    import openai
+    if isinstance(exc, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code == 429 or exc.status_code >= 500
+    return False
+
+
+def _retry_after(exc):
+    response = getattr(exc, 'response', None)
+    if response is None or getattr(response, 'status_code', None) != 429:
+        return None
+    try:
+        return float(response.headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+def _on_retry(attempt, exc, delay):
+    _stats['retries'] += 1
+    reason = type(exc).__name__
+    _retry_reasons[reason] = _retry_reasons.get(reason, 0) + 1
+
+
+def _retry(fn, deadline):
+    """按配置的重试策略和本进程的熔断器执行fn"""
+    return call_with_retry(
+        fn, deadline,
+        max_retries=Config.LLM_MAX_RETRIES,
+        base_delay=Config.LLM_RETRY_BASE_DELAY,
+        max_delay=Config.LLM_RETRY_MAX_DELAY,
+        is_retryable=_is_retryable,
+        retry_after=_retry_after,
+        breaker=breaker,
+        on_retry=_on_retry,
+    )
+
+
+async def chat_completion(deadline=None, **kwargs):
+    """
+    调用chat.completions.create（非流式），返回消息内容。
+    deadline: 本次调用（含排队、限流和所有重试）最多花费的秒数，默认 LLM_DEADLINE
+    超时抛出DeadlineExceeded，熔断中抛出CircuitOpenError，调用方应降级处理。
+    """
+    deadline = time.monotonic() + (deadline or Config.LLM_DEADLINE)
+    _stats['calls'] += 1
+
+    async def attempt():
+        await rate_limiter.acquire(deadline)
+        return await get_async_client().chat.completions.create(stream=False, **kwargs)
+
+    # 名额在重试之外获取，重试之间的退避等待也保持占用
+    async with _Slot(deadline):
+        response = await _retry(attempt, deadline)
+    return response.choices[0].message.content
+
+
+async def stream_chat_completion(deadline=None, **kwargs):
+    """
+    流式调用chat.completions.create，逐个产生文本片段；整个流期间占用一个并发名额。
+    deadline只约束建立流（收到响应头）之前的部分，包括重试；之后每个片段的间隔受HTTP读超时约束。
+    """
+    deadline = time.monotonic() + (deadline or Config.LLM_DEADLINE)
+    _stats['streams'] += 1
+
+    async def open_stream():
+        await rate_limiter.acquire(deadline)
+        return await get_async_client().chat.completions.create(stream=True, **kwargs)
+
+    async with _Slot(deadline):
+        stream = await _retry(open_stream, deadline)
+        try:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                text = chunk.choices[0].delta.content
+                if text:
+                    yield text
+        finally:
+            await stream.close()
+
+
+async def _warm_up():
+    get_async_client()
+
+
+def warm_up():
+    """启动事件循环并创建客户端（用于测量首次调用的开销）"""
+    run_sync(_warm_up())
+
+
+def get_llm_stats():
+    """返回LLM调用的并发和排队统计（计数只在事件循环线程中更新）"""
+    stats = dict(_stats)
+    queued = stats['queued']
+    stats['wait_time_avg'] = stats['wait_time_total'] / queued if queued else 0.0
+    stats['max_concurrency'] = Config.LLM_MAX_CONCURRENCY
+    stats['http2'] = Config.LLM_HTTP2 and http2_available()
+    stats['retry_reasons'] = dict(_retry_reasons)
+    stats['rate_limiter'] = rate_limiter.stats()
+    stats['breaker'] = breaker.stats()
+    return stats
@@ -0,0 +1,215 @@
+"""
+容错的LLM输出JSON解析器。
+从模型输出中找到第一个JSON对象并直接解析为Python对象，只扫描一遍（线性时间），
+同时修复模型常见的格式问题：
+- JSON前后的说明文字、```json 代码块标记
+- 缺失的逗号（如 `] "tips"`）、多余的逗号（如 `,]`、`,,`）
+- 字符串中未转义的换行等控制字符
+- 因 max_tokens 截断而不完整的输出：丢弃最后一个不完整的字符串、数字或键，
+  自动闭合所有未闭合的对象和数组，并返回截断时仍未闭合的最内层容器的路径，
+  调用方据此判断哪一部分可能不完整（只缺最后的 `}` 时路径为空，其中的值都是完整的）
+修复只发生在字符串之外，字符串内容（即使包含 `] "` 之类的字符）保持原样。
+"""
+import json
+import re
+
+# 字符串内容：普通字符或转义序列（到下一个未转义的引号或输入末尾为止）
+_STRING_BODY = re.compile(r'(?:[^"\\]|\\.)*', re.DOTALL)
+_NUMBER = re.compile(r'-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?')
+_WHITESPACE = re.compile(r'[\s﻿]*')
+_LITERALS = {'true': True, 'false': False, 'null': None}
+
+
+class LLMJSONError(ValueError):
+    """输出中没有可以解析的JSON对象"""
+
+
+class _Truncated(Exception):
+    """输入在一个值的中间结束"""
+
+
+class _Parser:
+
+    def __init__(self, text, pos):
+        self.text = text
+        self.pos = pos
+        self.end = len(text)
+        self.repairs = 0
+
+    def _skip_ws(self):
+        self.pos = _WHITESPACE.match(self.text, self.pos).end()
+
+    def _peek(self):
+        self._skip_ws()
+        if self.pos >= self.end:
+            raise _Truncated()
+        return self.text[self.pos]
+
+    def parse_value(self):
+        char = self._peek()
+        if char == '{':
+            return self._parse_object()
+        if char == '[':
+            return self._parse_array()
+        if char == '"':
+            return self._parse_string()
+        match = _NUMBER.match(self.text, self.pos)
+        if match:
+            self.pos = match.end()
+            if self.pos >= self.end:
+                # 数字位于输入末尾，可能被截断（如 12 截成 1）
+                raise _Truncated()
+            number = match.group()
+            return float(number) if any(c in number for c in '.eE') else int(number)
+        for literal, value in _LITERALS.items():
+            if self.text.startswith(literal, self.pos):
+                self.pos += len(literal)
+                return value
+            if literal.startswith(self.text[self.pos:self.pos + len(literal)]) and \
+                    self.pos + len(literal) > self.end:
+                raise _Truncated()
+        raise LLMJSONError(f'位置 {self.pos} 处无法识别的内容: {self.text[self.pos:self.pos + 20]!r}')
+
+    def _parse_string(self):
+        start = self.pos + 1
+        body_end = _STRING_BODY.match(self.text, start).end()
+        if body_end >= self.end:
+            self.pos = self.end
+            raise _Truncated()
+        self.pos = body_end + 1
+        body = self.text[start:body_end]
+        if '\\' not in body:
+            return body
+        try:
+            # strict=False 允许字符串中出现原始的换行和制表符
+            return json.loads(f'"{body}"', strict=False)
+        except ValueError:
+            self.repairs += 1
+            return body.replace('\\"', '"')
+
+    def _separator(self, closer):
+        """
+        读取值之后的分隔符。返回True表示容器结束。
+        容忍多余的逗号；下一个字符能开始一个新值时视为缺失了逗号。
+        """
+        char = self._peek()
+        if char == closer:
+            self.pos += 1
+            return True
+        if char == ',':
+            self.pos += 1
+            while self._peek() == ',':
+                self.pos += 1
+                self.repairs += 1
+            if self.text[self.pos] == closer:
+                # 尾随逗号
+                self.pos += 1
+                self.repairs += 1
+                return True
+            return False
+        if char in '"{[' or char.isdigit() or char in '-tfn':
+            self.repairs += 1
+            return False
+        if char in '}]':
+            # 括号不匹配（如数组以 } 结束），按当前容器结束处理
+            self.pos += 1
+            self.repairs += 1
+            return True
+        raise LLMJSONError(f'位置 {self.pos} 处缺少分隔符: {self.text[self.pos:self.pos + 20]!r}')
+
+    def _parse_object(self):
+        self.pos += 1
+        result = {}
+        while True:
+            try:
+                char = self._peek()
+            except _Truncated:
+                raise _TruncatedValue(result) from None
+            if char == '}':
+                self.pos += 1
+                return result
+            if char == ',':
+                self.pos += 1
+                self.repairs += 1
+                continue
+            if char != '"':
+                raise LLMJSONError(f'位置 {self.pos} 处应为键名: {self.text[self.pos:self.pos + 20]!r}')
+            key = None
+            try:
+                key = self._parse_string()
+                if self._peek() == ':':
+                    self.pos += 1
+                else:
+                    self.repairs += 1
+                value = self.parse_value()
+            except _TruncatedValue as exc:
+                # 值本身是被截断的容器：保留已解析的部分
+                result[key] = exc.value
+                raise _TruncatedValue(result, (key,) + exc.path) from None
+            except _Truncated:
+                # 不完整的键或标量值直接丢弃
+                raise _TruncatedValue(result) from None
+            result[key] = value
+            try:
+                if self._separator('}'):
+                    return result
+            except _Truncated:
+                raise _TruncatedValue(result) from None
+
+    def _parse_array(self):
+        self.pos += 1
+        result = []
+        while True:
+            try:
+                char = self._peek()
+            except _Truncated:
+                raise _TruncatedValue(result) from None
+            if char == ']':
+                self.pos += 1
+                return result
+            if char == ',':
+                self.pos += 1
+                self.repairs += 1
+                continue
+            try:
+                value = self.parse_value()
+            except _TruncatedValue as exc:
+                result.append(exc.value)
+                raise _TruncatedValue(result, (len(result) - 1,) + exc.path) from None
+            except _Truncated:
+                raise _TruncatedValue(result) from None
+            result.append(value)
+            try:
+                if self._separator(']'):
+                    return result
+            except _Truncated:
+                raise _TruncatedValue(result) from None
+
+
+class _TruncatedValue(_Truncated):
+    """被截断的对象或数组，携带已解析的部分，以及其中仍未闭合的最内层容器的路径（键或下标）"""
+
+    def __init__(self, value, path=()):
+        super().__init__()
+        self.value = value
+        self.path = path
+
+
+def parse_llm_json(text):
+    """
+    从模型输出中解析第一个JSON对象。
+    返回: (解析结果, 截断位置)
+    截断位置为None表示输出完整；否则为截断时仍未闭合的最内层容器的路径，
+    如 ('days', 1) 表示截断发生在 days[1] 之内，() 表示只缺少最外层的 `}`。
+    没有找到JSON对象或内容无法修复时抛出LLMJSONError。
+    """
+    if not text:
+        raise LLMJSONError('模型输出为空')
+    start = text.find('{')
+    if start < 0:
+        raise LLMJSONError('未找到JSON结构')
+    parser = _Parser(text, start)
+    try:
+        return parser.parse_value(), None
+    except _TruncatedValue as exc:
+        return exc.value, exc.path
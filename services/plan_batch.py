@@ -0,0 +1,211 @@
+"""
+批量预生成下周计划（在低峰时段由cron等调度执行）。
+
+    python -m services.plan_batch run                 # 为活跃计划在 PLAN_BATCH_HORIZON_DAYS 天内结束的用户生成下周计划
+    python -m services.plan_batch run --workers 8     # 指定并发数
+    python -m services.plan_batch run --force         # 今天的运行已完成时重新运行一遍
+    python -m services.plan_batch activate            # 激活开始日期已到的待生效计划
+    python -m services.plan_batch status              # 查看最近的运行记录
+
+新计划保存为待生效计划（weekly_plans.is_pending），开始日期为当前计划结束的次日，
+到开始日期后由 activate（每次run结束时也会执行）或用户访问时激活。
+用户按user_id分页处理，每页处理完记录断点（plan_batch_runs.last_user_id），
+中断后同一天再次运行从断点继续；已有待生效计划的用户不会重复生成。
+同一时间只允许一个批量任务运行（MySQL命名锁）。
+"""
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from config import Config
+from database.db_connection import get_db_connection
+from database.models import PlanBatchRun, UserProfile, WeeklyPlan
+from services.plan_engine import generate_plan
+
+logger = logging.getLogger(__name__)
+
+BATCH_LOCK_NAME = 'leangain_plan_batch'
+# 报告中最多列出的失败数
+MAX_REPORTED_FAILURES = 20
+
+
+def generate_next_plan(user_id, current_end_date):
+    """
+    为一个用户生成下周的待生效计划。
+    返回: 计划来源（'local' / 'template' / 'llm'），没有资料或已有待生效计划时返回None
+    """
+    profile = UserProfile.get_by_user_id(user_id)
+    if not profile:
+        return None
+    plan_data, source, template_id = generate_plan(profile, user_id)
+    # 候选用户的计划今天或之后结束，新计划紧接着开始
+    start_date = current_end_date + timedelta(days=1)
+    end_date = start_date + timedelta(days=6)
+    plan_id = WeeklyPlan.create_pending(user_id, json.dumps(plan_data, ensure_ascii=False), start_date,
+                                        end_date, plan_data.get('days', []), template_id)
+    return source if plan_id else None
+
+
+class BatchResult:
+    """一次运行的统计（多个工作线程共同更新）"""
+
+    def __init__(self, run):
+        self._lock = threading.Lock()
+        self.counts = {key: run[key] for key in ('processed', 'succeeded', 'failed', 'skipped')}
+        self.sources = {}
+        self.failures = []
+        self.previous_elapsed = run['elapsed_seconds'] or 0.0
+        self.started = time.monotonic()
+
+    def record(self, user_id, source=None, error=None):
+        with self._lock:
+            self.counts['processed'] += 1
+            if error is not None:
+                self.counts['failed'] += 1
+                self.failures.append((user_id, error))
+            elif source is None:
+                self.counts['skipped'] += 1
+            else:
+                self.counts['succeeded'] += 1
+                self.sources[source] = self.sources.get(source, 0) + 1
+
+    def elapsed(self):
+        return self.previous_elapsed + time.monotonic() - self.started
+
+    def report(self, activated):
+        elapsed = self.elapsed()
+        processed = self.counts['processed']
+        return {
+            **self.counts,
+            'sources': self.sources,
+            'activated': activated,
+            'elapsed_seconds': round(elapsed, 1),
+            'plans_per_minute': round(self.counts['succeeded'] / elapsed * 60, 1) if elapsed else 0.0,
+            'failure_rate': round(self.counts['failed'] / processed, 3) if processed else 0.0,
+            'failures': [{'user_id': user_id, 'error': error}
+                         for user_id, error in self.failures[:MAX_REPORTED_FAILURES]],
+        }
+
+
+def _process(result, user_id, end_date):
+    try:
+        source = generate_next_plan(user_id, end_date)
+    except Exception as e:
+        logger.exception("用户 %s 的下周计划生成失败: %s", user_id, e)
+        result.record(user_id, error=f'{type(e).__name__}: {e}')
+        return
+    result.record(user_id, source)
+
+
+def run_batch(horizon_days=None, workers=None, page_size=None, force=False):
+    """
+    执行一次批量预生成，返回统计报告（dict）。
+    horizon_days: 活跃计划在今天到多少天后之间结束的用户需要生成下周计划（计划已结束的用户不处理）
+    workers: 同时生成的计划数（即并发的LLM调用数）
+    page_size: 每页用户数，每页处理完记录一次断点
+    """
+    horizon_days = Config.PLAN_BATCH_HORIZON_DAYS if horizon_days is None else horizon_days
+    workers = workers or Config.PLAN_BATCH_WORKERS
+    page_size = page_size or Config.PLAN_BATCH_PAGE_SIZE
+    today = date.today()
+
+    run = PlanBatchRun.start_or_resume(today, horizon_days)
+    if run['status'] == 'finished':
+        if not force:
+            print(f"今天（{today}，窗口 {horizon_days} 天）的批量任务已完成，使用 --force 重新运行")
+            return json.loads(run['report'] or '{}')
+        PlanBatchRun.reopen(run['id'])
+        run = PlanBatchRun.start_or_resume(today, horizon_days)
+    elif run['last_user_id']:
+        print(f"从断点继续：user_id > {run['last_user_id']}（已处理 {run['processed']}）")
+
+    result = BatchResult(run)
+    last_user_id = run['last_user_id']
+    end_before = today + timedelta(days=horizon_days)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='plan-batch') as executor:
+        while True:
+            candidates = WeeklyPlan.find_expiring(today, end_before, last_user_id, page_size)
+            if not candidates:
+                break
+            # 线程池只有workers个线程，同一页的其余任务在池中排队
+            futures = [executor.submit(_process, result, row['user_id'], row['end_date'])
+                       for row in candidates]
+            for future in futures:
+                future.result()
+            last_user_id = candidates[-1]['user_id']
+            PlanBatchRun.checkpoint(run['id'], last_user_id, result.counts, result.elapsed())
+            print(f"已处理 {result.counts['processed']} 个用户（成功 {result.counts['succeeded']}，"
+                  f"失败 {result.counts['failed']}），断点 user_id={last_user_id}")
+
+    activated = WeeklyPlan.activate_due()
+    report = result.report(activated)
+    PlanBatchRun.finish(run['id'], json.dumps(report, ensure_ascii=False))
+    return report
+
+
+def _with_lock(fn):
+    """持有批量任务的MySQL命名锁执行fn，已有任务在运行时直接退出"""
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT GET_LOCK(%s, 0) AS locked", (BATCH_LOCK_NAME,))
+            if not cursor.fetchone()['locked']:
+                raise RuntimeError('已有批量任务正在运行')
+            try:
+                return fn()
+            finally:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (BATCH_LOCK_NAME,))
+    finally:
+        conn.close()
+
+
+def print_report(report):
+    print(f"处理用户: {report.get('processed', 0)}，成功: {report.get('succeeded', 0)}，"
+          f"失败: {report.get('failed', 0)}，跳过（无资料或已有待生效计划）: {report.get('skipped', 0)}")
+    print(f"计划来源: {report.get('sources', {})}，激活待生效计划: {report.get('activated', 0)}")
+    print(f"耗时: {report.get('elapsed_seconds', 0)} 秒，吞吐: {report.get('plans_per_minute', 0)} 个计划/分钟，"
+          f"失败率: {report.get('failure_rate', 0):.1%}")
+    for failure in report.get('failures', []):
+        print(f"  失败 user_id={failure['user_id']}: {failure['error']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='批量预生成下周计划')
+    sub = parser.add_subparsers(dest='command', required=True)
+    run_parser = sub.add_parser('run', help='为计划即将结束的用户生成下周计划')
+    run_parser.add_argument('--horizon-days', type=int, default=None,
+                            help='活跃计划在多少天内结束的用户（默认 PLAN_BATCH_HORIZON_DAYS）')
+    run_parser.add_argument('--workers', type=int, default=None, help='并发数（默认 PLAN_BATCH_WORKERS）')
+    run_parser.add_argument('--page-size', type=int, default=None, help='每页用户数（默认 PLAN_BATCH_PAGE_SIZE）')
+    run_parser.add_argument('--force', action='store_true', help='今天的运行已完成时重新运行')
+    sub.add_parser('activate', help='激活开始日期已到的待生效计划')
+    sub.add_parser('status', help='查看最近的运行记录')
+    args = parser.parse_args(argv)
+    # 工作线程的错误通过logging输出（含traceback），统计和进度仍直接打印
+    logging.basicConfig(level=Config.LOG_LEVEL, format='%(asctime)s %(levelname)s [%(name)s] %(threadName)s %(message)s')
+
+    if args.command == 'run':
+        try:
+            report = _with_lock(lambda: run_batch(args.horizon_days, args.workers, args.page_size, args.force))
+        except RuntimeError as e:
+            print(e)
+            return 1
+        print_report(report)
+        return 1 if report.get('failed') else 0
+    if args.command == 'activate':
+        print(f"激活了 {WeeklyPlan.activate_due()} 个待生效计划")
+        return 0
+    for run in PlanBatchRun.get_recent():
+        print(f"{run['run_date']}  窗口 {run['horizon_days']} 天  {run['status']:<8}  "
+              f"处理 {run['processed']}  成功 {run['succeeded']}  失败 {run['failed']}  跳过 {run['skipped']}  "
+              f"耗时 {run['elapsed_seconds']:.0f} 秒  断点 user_id={run['last_user_id']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,312 @@
+"""
+规则计划引擎和计划来源路由。
+generate_local_plan() 根据资料（训练水平、器械、每周天数、每次时长、重点部位、希望避免）
+从本地动作库中组合出一周计划，结构与DeepSeek生成的计划一致，耗时在毫秒级，结果确定。
+generate_plan() 决定使用规则引擎还是DeepSeek：
+- PLAN_ENGINE_MODE=local: 总是使用规则引擎
+- PLAN_ENGINE_MODE=llm:   总是调用DeepSeek（失败时仍由规则引擎兜底）
+- PLAN_ENGINE_MODE=auto:  简单资料（新手、仅自重/弹力带、没有需要避开的动作）直接使用规则引擎，其余调用DeepSeek
+需要DeepSeek时先查找资料等价的计划模板（services/plan_templates.py），有可复用的模板则不调用LLM。
+"""
+import threading
+
+from config import Config
+from services.exercise_library import available_equipment_set, find_exercises, normalize_level
+
+# 简单资料允许的器械：这些情况下规则引擎的计划与LLM差别不大
+SIMPLE_PROFILE_EQUIPMENT = {'无器械', '瑜伽垫', '弹力带'}
+
+# 每周训练日在7天中的位置（1-7）及对应的训练类型
+SCHEDULES = {
+    1: ([1], ['full']),
+    2: ([1, 4], ['full', 'full']),
+    3: ([1, 3, 5], ['full', 'full', 'full']),
+    4: ([1, 2, 4, 5], ['upper', 'lower', 'upper', 'lower']),
+    5: ([1, 2, 3, 5, 6], ['push', 'pull', 'legs', 'upper', 'lower']),
+    6: ([1, 2, 3, 4, 5, 6], ['push', 'pull', 'legs', 'push', 'pull', 'legs']),
+}
+# 有一定经验时，每周3天使用推/拉/腿分化
+SPLIT_3_DAYS = ['push', 'pull', 'legs']
+
+# 训练类型：(显示的训练部位, [(部位, 动作模式)...]) —— 按优先级排列，按时长截取
+DAY_TYPES = {
+    'full': ('全身', [('腿部', None), ('胸部', None), ('背部', None), ('肩部', None),
+                    ('核心', None), ('手臂', 'pull'), ('腿部', None), ('手臂', 'push')]),
+    'push': ('胸部、肩部、三头肌', [('胸部', None), ('肩部', 'push'), ('胸部', None), ('手臂', 'push'),
+                           ('肩部', 'push'), ('核心', None), ('手臂', 'push')]),
+    'pull': ('背部、二头肌', [('背部', None), ('背部', None), ('手臂', 'pull'), ('肩部', 'pull'),
+                        ('背部', None), ('核心', None), ('手臂', 'pull')]),
+    'legs': ('腿部、核心', [('腿部', None), ('腿部', None), ('腿部', None), ('核心', None),
+                       ('腿部', None), ('核心', None), ('腿部', None)]),
+    'upper': ('上肢', [('胸部', None), ('背部', None), ('肩部', None), ('手臂', 'pull'),
+                     ('手臂', 'push'), ('胸部', None), ('背部', None)]),
+    'lower': ('下肢、核心', [('腿部', None), ('腿部', None), ('核心', None), ('腿部', None),
+                        ('核心', None), ('腿部', None)]),
+}
+
+# 各水平的组数和次数：(复合动作组数, 复合动作次数, 孤立动作组数, 孤立动作次数)
+PRESCRIPTIONS = {
+    'beginner': (3, '8-12', 3, '12-15'),
+    'intermediate': (4, '6-10', 3, '10-12'),
+    'advanced': (4, '5-8', 3, '8-12'),
+}
+LOAD_ADVICE = {
+    'beginner': '轻到中等重量，每组保留2-3次余力',
+    'intermediate': '中等偏大重量（RPE 7-8）',
+    'advanced': '大重量（RPE 8-9），逐周递增',
+}
+
+DAY_TIPS = {
+    'full': '全身训练以复合动作为主，动作标准优先于重量；训练后1小时内补充蛋白质和碳水。',
+    'push': '推类动作注意肩胛稳定，避免耸肩；每周尝试小幅增加重量或次数。',
+    'pull': '拉类动作先收紧肩胛再发力，感受背部发力而不是只用手臂。',
+    'legs': '下肢训练消耗大，训练前后都要吃够碳水；深蹲类动作注意膝盖与脚尖方向一致。',
+    'upper': '上肢训练推拉交替，控制离心速度（约2秒）。',
+    'lower': '下肢训练注意髋部发力，核心全程收紧。',
+}
+REST_TIPS = '休息日：保证睡眠和热量盈余（比日常多摄入300-500千卡），可以散步或拉伸。'
+RECOVERY_TIPS = '活动恢复：低强度有氧和拉伸，促进恢复，不要追求强度。'
+
+_stats_lock = threading.Lock()
+_stats = {'local_routed': 0, 'local_fallback': 0, 'local_forced': 0, 'local_completed': 0, 'llm': 0,
+          'template': 0, 'days_regenerated': 0}
+
+
+def _preferences(profile):
+    preferences = profile.get('preferences') or {}
+    return preferences if isinstance(preferences, dict) else {}
+
+
+def _avoid_terms(profile):
+    """把"希望避免"的文本拆成关键词（按常见分隔符）"""
+    avoid = (_preferences(profile).get('avoid') or '').strip()
+    if not avoid or avoid == '无':
+        return []
+    for sep in '，,、；;。 \n':
+        avoid = avoid.replace(sep, '|')
+    return [term for term in avoid.split('|') if term]
+
+
+def _is_avoided(exercise, terms):
+    for term in terms:
+        if exercise['name'] in term or term in exercise['name']:
+            return True
+        if exercise['area'].rstrip('部') in term:
+            return True
+        if any(tag in term for tag in exercise['tags']):
+            return True
+    return False
+
+
+def _exercises_per_session(minutes):
+    try:
+        minutes = int(minutes)
+    except (TypeError, ValueError):
+        minutes = 60
+    # 30分钟3个动作，每多15分钟加一个
+    return max(3, min(8, minutes // 15 + 1))
+
+
+def _prescribe(exercise, level):
+    compound_sets, compound_reps, iso_sets, iso_reps = PRESCRIPTIONS[level]
+    kind = exercise['kind']
+    if kind == 'cardio':
+        return {'sets': 1, 'reps': '10-15分钟', 'weight': '低强度（能正常说话）', 'rest': '—'}
+    if kind == 'hold':
+        return {'sets': 3, 'reps': '30-45秒', 'weight': '自重', 'rest': '45秒'}
+    if kind == 'core':
+        return {'sets': 3, 'reps': '12-15', 'weight': '自重', 'rest': '45秒'}
+    if not exercise['equipment']:
+        weight = '自重'
+    elif exercise['equipment'] == {'弹力带'}:
+        weight = '中等阻力弹力带'
+    else:
+        weight = LOAD_ADVICE[level]
+    if kind == 'compound':
+        return {'sets': compound_sets, 'reps': compound_reps, 'weight': weight, 'rest': '90-120秒'}
+    return {'sets': iso_sets, 'reps': iso_reps, 'weight': weight, 'rest': '60秒'}
+
+
+def _build_day(day_type, variant, count, level, equipment, focus, avoid):
+    """组合一天的动作；variant 用于让同类型的不同训练日选择不同动作"""
+    label, slots = DAY_TYPES[day_type]
+    # 重点部位的动作排在前面，并额外增加一个该部位的动作
+    focused = [slot for slot in slots if slot[0] in focus]
+    if focused:
+        slots = focused + [focused[0]] + [slot for slot in slots if slot[0] not in focus]
+    chosen = []
+    used = set()
+    for area, pattern in slots:
+        if len(chosen) >= count:
+            break
+        candidates = [e for e in find_exercises(area, level, equipment, pattern)
+                      if e['name'] not in used and not _is_avoided(e, avoid)]
+        if not candidates:
+            continue
+        # 同类型的不同训练日按variant错开，同一天已选过的动作不再重复
+        exercise = candidates[variant % len(candidates)]
+        used.add(exercise['name'])
+        chosen.append(exercise)
+    if '有氧' in focus:
+        cardio = [e for e in find_exercises('有氧', level, equipment) if not _is_avoided(e, avoid)]
+        if cardio:
+            chosen.append(cardio[variant % len(cardio)])
+    exercises = [dict(name=e['name'], **_prescribe(e, level)) for e in chosen]
+    return label, exercises
+
+
+def generate_local_plan(profile, shift=0):
+    """
+    根据资料生成一周计划（dict，结构与DeepSeek计划相同：{"days": [7天]}）。
+    结果只取决于资料内容和shift，同样的资料总是得到同样的计划；
+    shift 让每个训练日整体换用候选列表中靠后的动作（重新生成单日时使用）。
+    """
+    preferences = _preferences(profile)
+    level = normalize_level(profile.get('training_experience'))
+    equipment = available_equipment_set(profile.get('available_equipment'))
+    focus = [f for f in (preferences.get('focus') or []) if f != '全身']
+    avoid = _avoid_terms(profile)
+    count = _exercises_per_session(preferences.get('session_minutes', 60))
+    try:
+        days_per_week = int(preferences.get('days_per_week', 3))
+    except (TypeError, ValueError):
+        days_per_week = 3
+    days_per_week = max(1, min(7, days_per_week))
+
+    positions, types = SCHEDULES[min(days_per_week, 6)]
+    if days_per_week == 3 and level != 'beginner':
+        types = SPLIT_3_DAYS
+    schedule = dict(zip(positions, types))
+
+    days = []
+    type_counts = {}
+    for day in range(1, 8):
+        day_type = schedule.get(day)
+        if day_type is not None:
+            variant = type_counts.get(day_type, 0)
+            type_counts[day_type] = variant + 1
+            label, exercises = _build_day(day_type, variant + shift, count, level, equipment, focus, avoid)
+            days.append({'day': day, 'focus': label, 'exercises': exercises, 'tips': DAY_TIPS[day_type]})
+        elif days_per_week == 7:
+            # 每周7天：第7天安排活动恢复而不是第7次力量训练
+            cardio = [e for e in find_exercises('有氧', 'beginner', equipment) if not _is_avoided(e, avoid)]
+            exercises = [dict(name=e['name'], **_prescribe(e, level)) for e in cardio[:1]]
+            days.append({'day': day, 'focus': '活动恢复', 'exercises': exercises, 'tips': RECOVERY_TIPS})
+        else:
+            days.append({'day': day, 'focus': '休息', 'exercises': [], 'tips': REST_TIPS})
+    return {'days': days}
+
+
+def is_simple_profile(profile):
+    """新手、只有自重/弹力带类器械、没有需要避开的动作：规则引擎即可生成合适的计划"""
+    if normalize_level(profile.get('training_experience')) != 'beginner':
+        return False
+    equipment = available_equipment_set(profile.get('available_equipment'))
+    if not equipment <= SIMPLE_PROFILE_EQUIPMENT:
+        return False
+    return not _avoid_terms(profile)
+
+
+def choose_plan_source(profile):
+    """返回 'local' 或 'llm'"""
+    mode = Config.PLAN_ENGINE_MODE
+    if mode in ('local', 'llm'):
+        return mode
+    return 'local' if is_simple_profile(profile) else 'llm'
+
+
+def _count(key):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def generate_plan(profile, user_id=None):
+    """
+    按路由策略生成计划。
+    user_id: 复用模板时跳过该用户当前计划所用的模板
+    返回: (周计划dict, 来源 'local' / 'template' / 'llm', 模板ID或None)
+    """
+    if choose_plan_source(profile) == 'local':
+        _count('local_forced' if Config.PLAN_ENGINE_MODE == 'local' else 'local_routed')
+        return generate_local_plan(profile), 'local', None
+    from services.deepseek_service import generate_workout_plan
+    if not Config.PLAN_TEMPLATE_ENABLED:
+        _count('llm')
+        return generate_workout_plan(profile), 'llm', None
+
+    from services import plan_templates
+    plan, template_id = plan_templates.find_template(profile, user_id)
+    if plan is not None:
+        _count('template')
+        return plan_templates.personalize(plan, profile), 'template', template_id
+    _count('llm')
+    if not Config.PLAN_TEMPLATE_ANONYMOUS:
+        # 用完整资料为该用户生成的计划不共享给其他用户
+        return generate_workout_plan(profile), 'llm', None
+    plan = generate_workout_plan(plan_templates.template_profile(profile), fallback=False)
+    if plan is None:
+        # 兜底计划不保存为模板
+        return fallback_plan(profile), 'local', None
+    # 被截断、由规则引擎补齐的计划不保存为模板
+    template_id = plan_templates.store_template(profile, plan)
+    return plan_templates.personalize(complete_plan(plan, profile), profile), 'llm', template_id
+
+
+def fallback_plan(profile):
+    """DeepSeek调用失败或输出无法解析时的兜底计划（dict）"""
+    _count('local_fallback')
+    return generate_local_plan(profile)
+
+
+def complete_plan(plan, profile):
+    """DeepSeek计划不足7天（输出被截断）时，用规则引擎的同一天补齐"""
+    present = {day['day'] for day in plan['days']}
+    if len(present) >= 7:
+        return plan
+    _count('local_completed')
+    local_days = [day for day in generate_local_plan(profile)['days'] if day['day'] not in present]
+    return {'days': sorted(plan['days'] + local_days, key=lambda day: day['day'])}
+
+
+def _exercise_names(day):
+    return {exercise['name'] for exercise in day.get('exercises', [])}
+
+
+def _local_day(profile, day_number, plan):
+    """规则引擎生成的第day_number天，尽量选择与本周各天（包括当天当前内容）都不同的动作组合"""
+    existing = [_exercise_names(day) for day in plan.get('days', [])]
+    fallback = None
+    for shift in range(1, 6):
+        candidate = generate_local_plan(profile, shift)['days'][day_number - 1]
+        names = _exercise_names(candidate)
+        if names not in existing:
+            return candidate
+        fallback = fallback or candidate
+    return fallback
+
+
+def regenerate_days(profile, plan, day_numbers, note=''):
+    """
+    只重新生成周计划中的指定几天，其余天保持不变。
+    需要DeepSeek的资料只把这几天的上下文发给DeepSeek，没有生成成功的天由规则引擎换一组动作。
+    返回: ({day: 新的当天计划}, 来源 'local' / 'llm')
+    """
+    new_days = {}
+    source = 'local'
+    if choose_plan_source(profile) == 'llm':
+        from services.deepseek_service import generate_workout_days
+        new_days = generate_workout_days(profile, plan, day_numbers, note)
+        if new_days:
+            source = 'llm'
+    for number in day_numbers:
+        if number not in new_days:
+            new_days[number] = _local_day(profile, number, plan)
+    _count('days_regenerated')
+    return new_days, source
+
+
+def get_plan_engine_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['mode'] = Config.PLAN_ENGINE_MODE
+    return stats
@@ -0,0 +1,169 @@
+"""
+后台生成计划任务队列。
+POST /plan/generate 只创建任务记录并提交到本进程的线程池，
+由工作线程调用DeepSeek生成计划并写入数据库，页面轮询任务状态。
+"""
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from config import Config
+from database.models import PlanJob, WeeklyPlan
+from services.plan_engine import generate_plan
+from services.prefetch_service import prefetch_descriptions
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """排队中的任务数已达上限"""
+
+
+class PlanJobQueue:
+    """
+    有界的本地任务队列。
+    - max_workers: 同时执行的任务数（即并发的LLM调用数）
+    - max_pending: 排队 + 执行中的任务上限，超出时拒绝提交
+    线程池在首次提交时创建，fork后的子进程会重新创建自己的线程池。
+    """
+
+    def __init__(self, max_workers=4, max_pending=32):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._init_state()
+
+    def _init_state(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pending = 0
+        self._completed = 0
+        self._failed = 0
+
+    def _get_executor(self):
+        if self._pid != os.getpid():
+            # 线程不会随fork复制，父进程的线程池在子进程中不可用
+            self._init_state()
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix='plan-job')
+        return self._executor
+
+    def submit(self, fn, *args):
+        """提交任务，队列已满时抛出QueueFullError"""
+        executor = self._get_executor()
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise QueueFullError(f'排队任务数已达上限（{self.max_pending}）')
+            self._pending += 1
+        try:
+            return executor.submit(self._run, fn, args)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+
+    def _run(self, fn, args):
+        ok = False
+        try:
+            result = fn(*args)
+            ok = True
+            return result
+        finally:
+            with self._lock:
+                self._pending -= 1
+                if ok:
+                    self._completed += 1
+                else:
+                    self._failed += 1
+
+    def shutdown(self, wait=True):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'max_pending': self.max_pending,
+                'pending': self._pending,
+                'completed': self._completed,
+                'failed': self._failed,
+            }
+
+
+plan_job_queue = PlanJobQueue(max_workers=Config.PLAN_JOB_WORKERS,
+                              max_pending=Config.PLAN_JOB_MAX_PENDING)
+
+
+def run_plan_job(job_id, user_id, profile):
+    """工作线程：生成计划并写入数据库，更新任务状态"""
+    try:
+        # 放在try中：标记失败时任务也会进入结束状态，不会一直停留在排队中
+        PlanJob.mark_running(job_id)
+        plan_data, _, template_id = generate_plan(profile, user_id)
+        if not plan_data:
+            raise ValueError('生成计划失败')
+        plan_json = json.dumps(plan_data, ensure_ascii=False)
+        start_date = date.today()
+        end_date = start_date + timedelta(days=6)
+        plan_id = WeeklyPlan.create_with_workouts(user_id, plan_json, start_date, end_date,
+                                                  plan_data.get('days', []), template_id)
+    except Exception as e:
+        logger.exception("计划任务 %s 失败: %s", job_id, e)
+        PlanJob.mark_failed(job_id, str(e))
+        return None
+    PlanJob.mark_succeeded(job_id, plan_id)
+    # 计划已保存，预热其中运动的介绍缓存（可选，异步执行）
+    try:
+        prefetch_descriptions(plan_data, profile)
+    except Exception as e:
+        logger.warning("提交运动介绍预热失败: %s", e)
+    return plan_id
+
+
+def submit_plan_job(user_id, profile):
+    """
+    为用户创建生成计划任务并放入队列。
+    如果用户已有未结束的任务，直接返回该任务ID，避免重复提交。
+    返回: 任务ID
+    """
+    existing = PlanJob.get_pending_by_user(user_id)
+    if existing and not _is_stale(existing):
+        return existing['id']
+    job_id = PlanJob.create(user_id)
+    try:
+        plan_job_queue.submit(run_plan_job, job_id, user_id, profile)
+    except QueueFullError:
+        PlanJob.mark_failed(job_id, '任务队列已满')
+        raise
+    return job_id
+
+
+def get_job_status(job_id, user_id):
+    """返回任务状态字典；任务不存在或不属于该用户时返回None"""
+    job = PlanJob.get(job_id)
+    if not job or job['user_id'] != user_id:
+        return None
+    if job['status'] in ('queued', 'running') and _is_stale(job):
+        # 处理任务的进程可能已退出，避免页面无限轮询
+        PlanJob.mark_failed(job_id, '任务超时')
+        job['status'] = 'failed'
+        job['error'] = '任务超时'
+    return {
+        'job_id': job['id'],
+        'status': job['status'],
+        'plan_id': job.get('weekly_plan_id'),
+        'error': job.get('error'),
+    }
+
+
+def _is_stale(job):
+    # is_stale由查询按数据库时间计算（见 PlanJob.SELECT_SQL），不与应用服务器的时钟比较
+    return bool(job.get('is_stale'))
@@ -0,0 +1,97 @@
+"""
+周计划的结构校验（pydantic）。
+DeepSeek输出和计划模板在保存前都经过这里：字段类型统一（次数、重量等转为字符串），
+缺少名称的动作被丢弃，训练日按day去重排序。
+模型的校验器在导入时构建一次，之后每次校验直接调用。
+"""
+from typing import List, Optional, Union
+
+from pydantic import BaseModel, ValidationError, field_validator
+
+__all__ = ['ValidationError', 'cut_inside_day', 'validate_plan']
+
+
+def _to_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+class ExerciseSchema(BaseModel):
+    name: str
+    sets: Union[int, str] = 3
+    reps: str = ''
+    weight: str = ''
+    rest: str = ''
+
+    @field_validator('name')
+    @classmethod
+    def _name_not_empty(cls, value):
+        value = value.strip()
+        if not value:
+            raise ValueError('动作名称为空')
+        return value
+
+    @field_validator('sets', mode='before')
+    @classmethod
+    def _sets(cls, value):
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        if isinstance(value, str) and value.strip().isdigit():
+            return int(value)
+        return value if isinstance(value, int) else _to_text(value)
+
+    @field_validator('reps', 'weight', 'rest', mode='before')
+    @classmethod
+    def _text(cls, value):
+        return _to_text(value)
+
+
+class DaySchema(BaseModel):
+    day: Optional[int] = None
+    focus: str = ''
+    exercises: List[ExerciseSchema] = []
+    tips: str = ''
+
+    @field_validator('focus', 'tips', mode='before')
+    @classmethod
+    def _text(cls, value):
+        return _to_text(value)
+
+    @field_validator('exercises', mode='before')
+    @classmethod
+    def _drop_unnamed(cls, value):
+        # 动作列表中缺少名称的项（通常是截断造成的）直接丢弃，不影响整天
+        if not isinstance(value, list):
+            return []
+        return [item for item in value if isinstance(item, dict) and _to_text(item.get('name'))]
+
+
+class PlanSchema(BaseModel):
+    days: List[DaySchema]
+
+
+def cut_inside_day(cut_path):
+    """parse_llm_json 返回的截断位置是否在某个训练日之内（该训练日可能不完整）"""
+    return cut_path is not None and len(cut_path) >= 2 and cut_path[0] == 'days'
+
+
+def validate_plan(data, cut_path=None):
+    """
+    校验并规范化计划。
+    cut_path: parse_llm_json 返回的截断位置；截断发生在训练日之内时丢弃这个（最后一个）训练日，
+              只缺少外层括号时所有训练日都是完整的，全部保留
+    返回: {"days": [...]}，按day排序，day在1-7之间且不重复（可能少于7天）
+    结构不符合时抛出 ValidationError
+    """
+    plan = PlanSchema.model_validate(data)
+    days = plan.days[:-1] if cut_inside_day(cut_path) else plan.days
+    by_number = {}
+    for index, day in enumerate(days, start=1):
+        number = day.day if day.day is not None else index
+        if 1 <= number <= 7 and number not in by_number:
+            day.day = number
+            by_number[number] = day.model_dump()
+    return {'days': [by_number[number] for number in sorted(by_number)]}
@@ -0,0 +1,160 @@
+"""
+DeepSeek计划模板：资料等价的用户复用已生成并校验过的计划，而不是每次都调用LLM。
+- 指纹只包含决定计划内容的字段（训练水平、器械、每周天数、每次时长、重点部位、希望避免），
+  归一化（排序、去空白）后取sha1；年龄、身高、体重等个人数据不进入指纹，
+  生成共享模板时也不发送给LLM（PLAN_TEMPLATE_ANONYMOUS），模板本身不含个人信息，复用时再追加体重目标提示；
+  为单个用户生成计划（模板关闭或PLAN_TEMPLATE_ANONYMOUS=false）时仍使用完整资料
+- 有效期：模板在 PLAN_TEMPLATE_TTL_DAYS 天后过期，过期后重新生成
+- 多样性：每个指纹保存 PLAN_TEMPLATE_VARIANTS 个不同的模板，不足时继续调用LLM；
+  复用时优先使用次数最少的模板，并跳过用户当前计划所用的模板；
+  每个模板最多使用 PLAN_TEMPLATE_MAX_USES 次
+模板保存在MySQL中，所有工作进程共享。
+"""
+import hashlib
+import json
+import threading
+
+from config import Config
+from database.models import PlanTemplate, WeeklyPlan
+from services.exercise_library import normalize_level
+
+# 个人数据：不进入指纹，生成共享模板时不发送给LLM
+PERSONAL_FIELDS = ('age', 'height_cm', 'current_weight_kg', 'target_weight_kg', 'body_fat_percent')
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'stored': 0, 'rejected': 0, 'claim_conflicts': 0}
+
+
+def _count(key):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def _normalize_text(text):
+    text = (text or '').strip()
+    if text == '无':
+        return ''
+    return ''.join(text.split()).replace('，', ',').replace('、', ',').lower()
+
+
+def _to_int(value, default):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def profile_fingerprint(profile):
+    """
+    返回 (指纹, 归一化后的资料JSON)。
+    字段取值与 build_prompt 中的默认值一致，缺失字段和显式填写默认值得到相同的指纹。
+    """
+    preferences = profile.get('preferences') or {}
+    if not isinstance(preferences, dict):
+        preferences = {}
+    equipment = profile.get('available_equipment') or []
+    if isinstance(equipment, str):
+        equipment = [equipment]
+    normalized = {
+        'training_experience': normalize_level(profile.get('training_experience')),
+        'available_equipment': sorted(set(equipment)),
+        'days_per_week': _to_int(preferences.get('days_per_week'), 3),
+        'session_minutes': _to_int(preferences.get('session_minutes'), 60),
+        'focus': sorted(set(preferences.get('focus') or ['全身'])),
+        'avoid': _normalize_text(preferences.get('avoid')),
+    }
+    canonical = json.dumps(normalized, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest(), canonical
+
+
+def template_profile(profile):
+    """去掉个人数据后的资料，只用于生成可以共享的模板（为单个用户生成计划时使用完整资料）"""
+    return {key: value for key, value in profile.items() if key not in PERSONAL_FIELDS}
+
+
+def is_complete_plan(plan):
+    """模板必须是完整的7天计划（plan已经过 plan_schema.validate_plan 校验，day不重复）"""
+    return len(plan['days']) == 7
+
+
+def _weight_hint(profile):
+    current = profile.get('current_weight_kg')
+    target = profile.get('target_weight_kg')
+    try:
+        current, target = float(current), float(target)
+    except (TypeError, ValueError):
+        return None
+    if target <= current:
+        return None
+    # 增重期建议每周增加0.25-0.5kg
+    weeks_min = int((target - current) / 0.5 + 0.5)
+    weeks_max = int((target - current) / 0.25 + 0.5)
+    return (f'体重目标：{current:g}kg → {target:g}kg，按每周增加0.25-0.5kg计约需{weeks_min}-{weeks_max}周，'
+            f'每天保持300-500千卡热量盈余。')
+
+
+def personalize(plan, profile):
+    """在第一个训练日的提示中加入该用户的体重目标提示（返回新的dict，不修改传入的计划）"""
+    hint = _weight_hint(profile)
+    if hint is None:
+        return plan
+    days = [dict(day) for day in plan['days']]
+    for day in days:
+        if day.get('exercises'):
+            tips = day.get('tips') or ''
+            day['tips'] = f'{tips} {hint}' if tips else hint
+            break
+    return {'days': days}
+
+
+def _current_template_id(user_id):
+    if user_id is None:
+        return None
+    plan = WeeklyPlan.get_active_plan(user_id)
+    return plan.get('template_id') if plan else None
+
+
+def find_template(profile, user_id=None):
+    """
+    返回可复用的 (计划dict, template_id)；没有合适的模板时返回 (None, None)。
+    该指纹的模板数量不足 PLAN_TEMPLATE_VARIANTS 时也返回 (None, None)，由调用方生成新模板。
+    """
+    fingerprint, _ = profile_fingerprint(profile)
+    templates = PlanTemplate.get_available(fingerprint, Config.PLAN_TEMPLATE_MAX_USES)
+    if len(templates) < Config.PLAN_TEMPLATE_VARIANTS:
+        _count('misses')
+        return None, None
+    current = _current_template_id(user_id)
+    for template in templates:
+        if template['id'] == current:
+            continue
+        if PlanTemplate.claim(template['id'], Config.PLAN_TEMPLATE_MAX_USES):
+            _count('hits')
+            return json.loads(template['plan_json']), template['id']
+        # 并发请求刚好用满或模板刚过期，尝试下一个
+        _count('claim_conflicts')
+    _count('misses')
+    return None, None
+
+
+def store_template(profile, plan):
+    """保存新生成并校验过的计划，返回模板ID；计划不完整（不足7天）时不保存，返回None"""
+    if not is_complete_plan(plan):
+        _count('rejected')
+        return None
+    fingerprint, canonical = profile_fingerprint(profile)
+    plan_json = json.dumps(plan, ensure_ascii=False)
+    template_id = PlanTemplate.create(fingerprint, canonical, plan_json, Config.PLAN_TEMPLATE_TTL_DAYS)
+    _count('stored')
+    return template_id
+
+
+def get_plan_template_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['enabled'] = Config.PLAN_TEMPLATE_ENABLED
+    stats['variants'] = Config.PLAN_TEMPLATE_VARIANTS
+    stats['max_uses'] = Config.PLAN_TEMPLATE_MAX_USES
+    stats['ttl_days'] = Config.PLAN_TEMPLATE_TTL_DAYS
+    stats['anonymous'] = Config.PLAN_TEMPLATE_ANONYMOUS
+    return stats
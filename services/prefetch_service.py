@@ -0,0 +1,94 @@
+"""
+计划生成后预热运动介绍缓存。
+计划写入数据库后，提取其中不重复的运动名称，在有界线程池中并发生成介绍，
+已缓存的名称直接跳过，用户第一次打开介绍弹窗时即可命中缓存。
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+from services.cache_service import get_cached_description
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_executor = None
+_executor_pid = None
+_stats = {'scheduled': 0, 'skipped_cached': 0, 'skipped_limit': 0, 'completed': 0, 'failed': 0}
+
+
+def extract_exercise_names(plan_data):
+    """按出现顺序返回计划中不重复的运动名称"""
+    names = []
+    seen = set()
+    for day in plan_data.get('days', []):
+        for exercise in day.get('exercises', []) or []:
+            name = (exercise.get('name') or '').strip()
+            if name and name not in seen:
+                seen.add(name)
+                names.append(name)
+    return names
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        with _lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(max_workers=Config.PREFETCH_CONCURRENCY,
+                                               thread_name_prefix='prefetch')
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def prefetch_descriptions(plan_data, profile, max_names=None):
+    """
+    为计划中的运动预生成介绍（异步执行，立即返回）。
+    max_names: 每个计划最多预热的运动数，默认取配置 PREFETCH_MAX_PER_PLAN
+    返回: 实际提交预热的运动数
+    """
+    if not Config.PREFETCH_ENABLED:
+        return 0
+    if max_names is None:
+        max_names = Config.PREFETCH_MAX_PER_PLAN
+    scheduled = 0
+    skipped_cached = 0
+    skipped_limit = 0
+    executor = _get_executor()
+    for name in extract_exercise_names(plan_data):
+        if get_cached_description(name, profile, record_stats=False) is not None:
+            skipped_cached += 1
+            continue
+        if scheduled >= max_names:
+            skipped_limit += 1
+            continue
+        executor.submit(_prefetch_one, name, profile)
+        scheduled += 1
+    with _lock:
+        _stats['scheduled'] += scheduled
+        _stats['skipped_cached'] += skipped_cached
+        _stats['skipped_limit'] += skipped_limit
+    return scheduled
+
+
+def _prefetch_one(exercise_name, profile):
+    from services.deepseek_service import generate_exercise_description
+    try:
+        generate_exercise_description(exercise_name, profile)
+        key = 'completed'
+    except Exception as e:
+        logger.warning("预热运动介绍失败（%s）: %s", exercise_name, e)
+        key = 'failed'
+    with _lock:
+        _stats[key] += 1
+
+
+def get_prefetch_stats():
+    with _lock:
+        stats = dict(_stats)
+    stats['enabled'] = Config.PREFETCH_ENABLED
+    stats['concurrency'] = Config.PREFETCH_CONCURRENCY
+    stats['max_per_plan'] = Config.PREFETCH_MAX_PER_PLAN
+    return stats
@@ -0,0 +1,201 @@
+"""
+调用外部服务时的弹性组件（asyncio版本，在同一个事件循环中使用，无需加锁）：
+- TokenBucket: 令牌桶限流，平滑请求速率并允许一定突发
+- CircuitBreaker: 连续失败达到阈值后熔断，熔断期间直接失败，冷却后放行一次试探调用
+- call_with_retry: 带抖动的指数退避重试，所有尝试（含等待）受同一个截止时间约束
+"""
+import asyncio
+import random
+import time
+
+
+class DeadlineExceeded(Exception):
+    """调用在截止时间内没有完成"""
+
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，调用被直接拒绝"""
+
+
+class TokenBucket:
+    """
+    令牌桶限流。
+    - rate: 每秒补充的令牌数，<=0 表示不限流
+    - capacity: 桶容量，即允许的最大突发请求数
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self.waits = 0
+        self.rejected = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, deadline=None):
+        """取得一个令牌；到截止时间仍无法取得时抛出DeadlineExceeded"""
+        if self.rate <= 0:
+            return
+        waited = False
+        while True:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            delay = (1 - self._tokens) / self.rate
+            if deadline is not None and time.monotonic() + delay > deadline:
+                self.rejected += 1
+                raise DeadlineExceeded('等待限流令牌超过截止时间')
+            if not waited:
+                self.waits += 1
+                waited = True
+            await asyncio.sleep(delay)
+
+    def stats(self):
+        self._refill()
+        return {
+            'rate': self.rate,
+            'capacity': self.capacity,
+            'tokens': round(self._tokens, 2) if self.rate > 0 else None,
+            'waits': self.waits,
+            'rejected': self.rejected,
+        }
+
+
+class CircuitBreaker:
+    """
+    熔断器。
+    - failure_threshold: 连续失败多少次后打开
+    - reset_timeout: 打开后经过多少秒进入半开状态，放行一次试探调用
+    试探成功则关闭，失败则重新打开。
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.opened_count = 0
+        self.rejected = 0
+
+    @property
+    def state(self):
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = False
+        return self._state
+
+    def before_call(self):
+        """调用前检查；熔断中（或半开状态已有试探调用）时抛出CircuitOpenError"""
+        state = self.state
+        if state == self.CLOSED:
+            return
+        if state == self.HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return
+        self.rejected += 1
+        raise CircuitOpenError('上游服务熔断中，直接使用降级结果')
+
+    def record_success(self):
+        self._state = self.CLOSED
+        self._failures = 0
+        self._trial_in_flight = False
+
+    def release_trial(self):
+        """试探调用没有得出结论（被取消或未真正发出）时释放名额，允许下一次试探"""
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self._failures += 1
+        if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            if self._state != self.OPEN:
+                self.opened_count += 1
+            self._state = self.OPEN
+            self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def stats(self):
+        state = self.state
+        return {
+            'state': state,
+            'consecutive_failures': self._failures,
+            'failure_threshold': self.failure_threshold,
+            'reset_timeout': self.reset_timeout,
+            'opened_count': self.opened_count,
+            'rejected': self.rejected,
+            'retry_in': (round(max(0.0, self._opened_at + self.reset_timeout - time.monotonic()), 1)
+                         if state == self.OPEN else None),
+        }
+
+
+def backoff_delay(attempt, base_delay, max_delay):
+    """第attempt次重试前的等待秒数（指数退避 + 全抖动）"""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+async def call_with_retry(fn, deadline, max_retries=2, base_delay=0.5, max_delay=4.0,
+                          is_retryable=lambda exc: True, retry_after=lambda exc: None,
+                          breaker=None, on_retry=None):
+    """
+    调用 fn()（协程函数），失败时按退避策略重试，直到成功、重试次数用尽或超过截止时间。
+    - deadline: time.monotonic() 截止时间，每次尝试都用剩余时间作为超时
+    - is_retryable(exc): 哪些异常值得重试
+    - retry_after(exc): 服务端要求的等待秒数（如429的Retry-After），没有时返回None
+    - breaker: 可选的熔断器，每次尝试前检查，并记录每次尝试的结果
+    - on_retry(attempt, exc, delay): 每次决定重试时的回调（用于统计）
+    """
+    attempt = 0
+    while True:
+        if breaker is not None:
+            breaker.before_call()
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded('调用超过截止时间')
+        try:
+            result = await asyncio.wait_for(fn(), remaining)
+        except asyncio.TimeoutError:
+            if breaker is not None:
+                breaker.record_failure()
+            raise DeadlineExceeded('调用超过截止时间') from None
+        except asyncio.CancelledError:
+            if breaker is not None:
+                breaker.release_trial()
+            raise
+        except Exception as exc:
+            retryable = is_retryable(exc)
+            if breaker is not None:
+                # 只有上游故障（超时、连接错误、429、5xx）计入熔断；
+                # 请求本身的错误（如400）说明上游仍在正常响应
+                if retryable:
+                    breaker.record_failure()
+                elif isinstance(exc, DeadlineExceeded):
+                    breaker.release_trial()
+                else:
+                    breaker.record_success()
+            if not retryable or attempt >= max_retries:
+                raise
+            delay = retry_after(exc)
+            if delay is None:
+                delay = backoff_delay(attempt, base_delay, max_delay)
+            if time.monotonic() + delay >= deadline:
+                # 剩余时间不够再试一次，直接失败，让调用方尽快降级
+                raise
+            if on_retry is not None:
+                on_retry(attempt, exc, delay)
+            attempt += 1
+            await asyncio.sleep(delay)
+            continue
+        if breaker is not None:
+            breaker.record_success()
+        return result
@@ -0,0 +1,157 @@
+"""
+合并并发的相同请求（singleflight）。
+同一进程内，同一个key同时只有一个“领头”调用真正执行，其余调用等待并共享结果；
+跨gunicorn工作进程则通过lock_dir下的文件锁（fcntl.flock）串行化，
+后到的进程拿到锁后先调用recheck（通常是重新查缓存），命中即直接返回。
+do() 和 stream() 共用同一组key，跟随者得到的是领头调用的最终结果（stream为拼接后的全文），
+因此同一个key的两种调用方式的结果（以及recheck的返回值）必须是同一种类型。
+"""
+import hashlib
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows：只做进程内合并
+    fcntl = None
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.aborted = False
+        self.lock_file = None
+
+
+class SingleFlight:
+    """
+    - lock_dir: 跨进程文件锁所在目录，为None时只做进程内合并
+    - lock_timeout: 等待其他进程释放文件锁的最长秒数，超时后不再等待直接执行
+    """
+
+    def __init__(self, lock_dir=None, lock_timeout=120.0):
+        self.lock_dir = lock_dir
+        self.lock_timeout = lock_timeout
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {'leaders': 0, 'followers': 0, 'lock_waits': 0}
+
+    def do(self, key, fn, recheck=None):
+        """
+        执行fn()并返回结果；并发的相同key调用共享同一次执行的结果。
+        recheck: 领头调用拿到文件锁后先调用，返回非None时直接作为结果（不再执行fn）
+        """
+        call, leader = self._join(key)
+        if not leader:
+            call.event.wait()
+            if call.aborted:
+                return self.do(key, fn, recheck)
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            self._lock_file(call, key)
+            result = recheck() if recheck else None
+            if result is None:
+                result = fn()
+            call.result = result
+            return result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            self._finish(key, call)
+
+    def stream(self, key, make_stream, recheck=None):
+        """
+        do()的流式版本（生成器）：领头调用逐段产出make_stream()的内容，
+        跟随者等待领头调用结束后一次性得到拼接好的全文。
+        """
+        call, leader = self._join(key)
+        if not leader:
+            call.event.wait()
+            if call.aborted:
+                yield from self.stream(key, make_stream, recheck)
+                return
+            if call.error is not None:
+                raise call.error
+            yield call.result
+            return
+        finished = False
+        try:
+            self._lock_file(call, key)
+            result = recheck() if recheck else None
+            if result is None:
+                parts = []
+                for piece in make_stream():
+                    parts.append(piece)
+                    yield piece
+                result = ''.join(parts)
+            else:
+                yield result
+            call.result = result
+            finished = True
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            # 客户端中途断开时生成器被关闭，跟随者需要自行重新执行
+            if not finished and call.error is None:
+                call.aborted = True
+            self._finish(key, call)
+
+    def _join(self, key):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self._stats['followers'] += 1
+                return call, False
+            call = self._calls[key] = _Call()
+            self._stats['leaders'] += 1
+            return call, True
+
+    def _finish(self, key, call):
+        if call.lock_file is not None:
+            try:
+                fcntl.flock(call.lock_file, fcntl.LOCK_UN)
+            finally:
+                call.lock_file.close()
+                call.lock_file = None
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.event.set()
+
+    def _lock_file(self, call, key):
+        if fcntl is None or not self.lock_dir:
+            return
+        os.makedirs(self.lock_dir, exist_ok=True)
+        path = os.path.join(self.lock_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.lock')
+        f = open(path, 'a')
+        deadline = time.monotonic() + self.lock_timeout
+        waited = False
+        while True:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if not waited:
+                    waited = True
+                    with self._lock:
+                        self._stats['lock_waits'] += 1
+                if time.monotonic() > deadline:
+                    f.close()
+                    return
+                time.sleep(0.05)
+        # 更新修改时间，便于清理长期未使用的锁文件
+        os.utime(path)
+        call.lock_file = f
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._calls)
+        return stats
@@ -0,0 +1,139 @@
+"""
+体重趋势数据（仪表板图表和 /api/weight/series 使用）。
+- 按 (user_id, measured_at) 键集分页读取原始记录，每次查询的结果集大小固定
+- 在全部原始点上一次遍历计算7天滚动平均（双指针滑动窗口）和增重速度（最小二乘斜率）
+- 用LTTB（Largest-Triangle-Three-Buckets）降采样到目标点数，保留曲线形状和极值，
+  多年每天称重的用户返回的也只是几百个点
+全部为纯Python实现，每一步都是线性时间。
+"""
+from datetime import datetime, time as dt_time, timedelta
+
+from database.models import WeightLog
+
+DEFAULT_POINTS = 120
+MAX_POINTS = 1000
+ROLLING_WINDOW_DAYS = 7
+# 近期增重速度的统计区间
+RECENT_DAYS = 28
+# 键集分页每页读取的记录数
+PAGE_SIZE = 2000
+
+_DAY_SECONDS = 86400.0
+
+
+def load_points(user_id, start=None, end=None, page_size=PAGE_SIZE):
+    """
+    读取 [start, end] 范围内的体重记录，返回按时间排序的 [(datetime, 体重kg)]。
+    start / end 为date，end包含当天。
+    """
+    start_at = datetime.combine(start, dt_time.min) if start else None
+    end_at = datetime.combine(end + timedelta(days=1), dt_time.min) if end else None
+    points = []
+    after = None
+    while True:
+        rows = WeightLog.get_page(user_id, after=after, start_at=start_at, end_at=end_at, limit=page_size)
+        points.extend((row['measured_at'], float(row['weight_kg'])) for row in rows
+                      if row['weight_kg'] is not None)
+        if len(rows) < page_size:
+            return points
+        after = (rows[-1]['measured_at'], rows[-1]['id'])
+
+
+def rolling_average(times, values, window_days=ROLLING_WINDOW_DAYS):
+    """每个点与其之前window_days天内（含）的所有点的平均值（按时间而不是按点数）"""
+    window = window_days * _DAY_SECONDS
+    averages = []
+    total = 0.0
+    left = 0
+    for right, value in enumerate(values):
+        total += value
+        while times[right] - times[left] >= window:
+            total -= values[left]
+            left += 1
+        averages.append(total / (right - left + 1))
+    return averages
+
+
+def weekly_gain_rate(times, values, since=None):
+    """最小二乘拟合的体重变化速度（kg/周）；since为时间戳时只统计之后的点；少于2个点时返回None"""
+    n = sum_t = sum_y = sum_tt = sum_ty = 0.0
+    origin = None
+    for t, y in zip(times, values):
+        if since is not None and t < since:
+            continue
+        if origin is None:
+            origin = t
+        # 以天为单位并平移到第一个点，避免平方和数值过大
+        x = (t - origin) / _DAY_SECONDS
+        n += 1
+        sum_t += x
+        sum_y += y
+        sum_tt += x * x
+        sum_ty += x * y
+    denominator = n * sum_tt - sum_t * sum_t
+    if n < 2 or denominator <= 0:
+        return None
+    return round((n * sum_ty - sum_t * sum_y) / denominator * 7, 3)
+
+
+def lttb(times, values, threshold):
+    """
+    Largest-Triangle-Three-Buckets降采样，返回选中点的下标。
+    首尾两点总是保留，其余点分到 threshold-2 个桶中，每个桶选与相邻桶构成三角形面积最大的点。
+    """
+    n = len(values)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+    selected = [0]
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        bucket_start = int(i * bucket_size) + 1
+        bucket_end = min(int((i + 1) * bucket_size) + 1, n - 1)
+        # 下一个桶的平均点（最后一个桶的下一个"桶"是末尾的点）
+        next_start = bucket_end
+        next_end = max(min(int((i + 2) * bucket_size) + 1, n), next_start + 1)
+        count = next_end - next_start
+        avg_t = sum(times[next_start:next_end]) / count
+        avg_y = sum(values[next_start:next_end]) / count
+        ta, ya = times[a], values[a]
+        best_area = -1.0
+        best = bucket_start
+        for j in range(bucket_start, bucket_end):
+            area = abs((ta - avg_t) * (values[j] - ya) - (ta - times[j]) * (avg_y - ya))
+            if area > best_area:
+                best_area = area
+                best = j
+        selected.append(best)
+        a = best
+    selected.append(n - 1)
+    return selected
+
+
+def build_series(points, target_points=DEFAULT_POINTS):
+    """根据原始点计算滚动平均、增重速度并降采样，返回API响应的数据部分"""
+    if not points:
+        return {'total': 0, 'points': [], 'weekly_gain_kg': None, 'recent_weekly_gain_kg': None,
+                'latest': None, 'min': None, 'max': None, 'rolling_window_days': ROLLING_WINDOW_DAYS}
+    times = [measured_at.timestamp() for measured_at, _ in points]
+    values = [weight for _, weight in points]
+    averages = rolling_average(times, values)
+    selected = lttb(times, values, max(3, min(target_points, MAX_POINTS)))
+    return {
+        'total': len(points),
+        'points': [{'t': points[i][0].strftime('%Y-%m-%d %H:%M'), 'weight': values[i],
+                    'avg': round(averages[i], 2)} for i in selected],
+        'weekly_gain_kg': weekly_gain_rate(times, values),
+        'recent_weekly_gain_kg': weekly_gain_rate(times, values, since=times[-1] - RECENT_DAYS * _DAY_SECONDS),
+        'latest': values[-1],
+        'min': min(values),
+        'max': max(values),
+        'rolling_window_days': ROLLING_WINDOW_DAYS,
+    }
+
+
+def get_weight_series(user_id, start=None, end=None, target_points=DEFAULT_POINTS):
+    series = build_series(load_points(user_id, start, end), target_points)
+    series['start'] = start.isoformat() if start else None
+    series['end'] = end.isoformat() if end else None
+    return series
@@ -0,0 +1,126 @@
+import os
+import sys
+
+import pytest
+
+# config.py 要求设置 DeepSeek API密钥；测试中不会真正调用API
+os.environ.setdefault('DEEPSEEK_API_KEY', 'test')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.lastrowid = None
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, args=None):
+        sql = ' '.join(sql.split())
+        self.db.executed.append((sql, args))
+        if self.db.fail_on and self.db.fail_on in sql:
+            raise self.db.error
+        if sql.startswith('INSERT'):
+            self.db.lastrowid += 1
+            self.lastrowid = self.db.lastrowid
+        self._rows, rowcount = self.db.lookup(sql)
+        return rowcount
+
+    def executemany(self, sql, rows):
+        sql = ' '.join(sql.split())
+        self.db.executed.append((sql, list(rows)))
+        if self.db.fail_on and self.db.fail_on in sql:
+            raise self.db.error
+        return len(rows)
+
+    def fetchone(self):
+        return dict(self._rows[0]) if self._rows else None
+
+    def fetchall(self):
+        return [dict(row) for row in self._rows]
+
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self):
+        return FakeCursor(self.db)
+
+    def commit(self):
+        self.db.commits += 1
+
+    def rollback(self):
+        self.db.rollbacks += 1
+
+    def close(self):
+        self.db.closed += 1
+
+
+class FakeDatabase:
+    """
+    按SQL片段返回预设结果的假数据库，记录执行过的语句（空白已折叠）。
+    respond('FROM users', [{'id': 1}]) 之后包含该片段的查询返回这些行，后设置的规则优先。
+    """
+
+    def __init__(self):
+        self.executed = []
+        self.rules = []
+        self.fail_on = None
+        self.error = None
+        self.commits = 0
+        self.rollbacks = 0
+        self.opened = 0
+        self.closed = 0
+        self.lastrowid = 0
+
+    def respond(self, fragment, rows=(), rowcount=None):
+        self.rules.append((fragment, list(rows), len(rows) if rowcount is None else rowcount))
+
+    def fail(self, fragment, error):
+        self.fail_on, self.error = fragment, error
+
+    def lookup(self, sql):
+        for fragment, rows, rowcount in reversed(self.rules):
+            if fragment in sql:
+                return rows, rowcount
+        return [], 0
+
+    def connect(self):
+        self.opened += 1
+        return FakeConnection(self)
+
+    def statements(self, fragment=''):
+        return [sql for sql, _ in self.executed if fragment in sql]
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    """用FakeDatabase替换模型和服务中的get_db_connection，并清空模型缓存"""
+    from database import models
+    from services import dashboard_service
+    db = FakeDatabase()
+    monkeypatch.setattr(models, 'get_db_connection', db.connect)
+    monkeypatch.setattr(dashboard_service, 'get_db_connection', db.connect)
+    models.clear_model_cache()
+    yield db
+    models.end_request_scope()
+    models.clear_model_cache()
+
+
+@pytest.fixture
+def description_cache(monkeypatch, tmp_path):
+    """使用临时目录中的SQLite介绍缓存和新的内存LRU层，不启动后台清理线程"""
+    from services import cache_service
+    monkeypatch.setattr(cache_service, 'CACHE_DB_PATH', str(tmp_path / 'descriptions.db'))
+    monkeypatch.setattr(cache_service, 'LOCK_DIR', str(tmp_path / 'locks'))
+    monkeypatch.setattr(cache_service.Config, 'DESCRIPTION_CACHE_SWEEP_INTERVAL', 0)
+    monkeypatch.setattr(cache_service, 'memory_cache', cache_service.LRUCache())
+    monkeypatch.setattr(cache_service, '_bucket_stats', {})
+    monkeypatch.setattr(cache_service, '_touched', {})
+    return cache_service
@@ -0,0 +1,17 @@
+from app import create_app
+
+
+def test_each_app_gets_all_routes():
+    first, second = create_app(), create_app()
+    rules = {rule.rule for rule in first.url_map.iter_rules()}
+    assert '/dashboard' in rules and '/api/weight/series' in rules
+    assert rules == {rule.rule for rule in second.url_map.iter_rules()}
+    assert '/initdb' not in rules
+
+
+def test_public_pages_render():
+    client = create_app().test_client()
+    for path in ('/', '/about', '/login', '/register'):
+        assert client.get(path).status_code == 200
+    response = client.get('/dashboard')
+    assert response.status_code == 302 and '/login' in response.headers['Location']
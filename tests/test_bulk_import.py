@@ -0,0 +1,112 @@
+import io
+from datetime import datetime, timezone
+
+import pytest
+
+from services import bulk_import
+from services.bulk_import import BulkImportError, ImportReport, iter_records
+
+
+class ReadOnlyStream:
+    """只有read()的流（如Python 3.9的SpooledTemporaryFile），每次最多返回size字节"""
+
+    def __init__(self, data, size=7):
+        self._data = io.BytesIO(data)
+        self._size = size
+
+    def read(self, size=-1):
+        return self._data.read(min(size, self._size))
+
+
+def _records(text, fmt):
+    return list(iter_records(ReadOnlyStream(text.encode('utf-8')), fmt))
+
+
+def _import(monkeypatch, records, **kwargs):
+    chunks = []
+    monkeypatch.setattr(bulk_import.WeightLog, 'import_chunk',
+                        lambda user_id, rows: chunks.append(rows) or len(rows))
+    report = ImportReport()
+    bulk_import.import_weight_logs(1, records, report, **kwargs)
+    return report, chunks
+
+
+def test_csv_strips_bom_normalizes_header_and_keeps_quoted_newlines():
+    text = '\ufeffMeasured_At , Weight_KG,notes\r\n2024-01-01 08:00,60,"第一行\n第二行"\r\n2024-01-02 08:00,61,\r\n'
+    records = _records(text, 'csv')
+    assert [line for line, _ in records] == [3, 4]
+    assert records[0][1] == {'measured_at': '2024-01-01 08:00', 'weight_kg': '60', 'notes': '第一行\n第二行'}
+    assert records[1][1]['weight_kg'] == '61'
+
+
+def test_csv_invalid_utf8_is_a_bulk_import_error():
+    with pytest.raises(BulkImportError):
+        list(iter_records(ReadOnlyStream(b'measured_at,weight_kg\n\xff\xfe,60\n'), 'csv'))
+
+
+def test_json_array_and_ndjson_give_the_same_records():
+    array = '\ufeff[{"weight": 60, "measured_at": "2024-01-01"}, {"weight": 61.5, "measured_at": "2024-01-02"}]'
+    ndjson = '{"weight": 60, "measured_at": "2024-01-01"}\n{"weight": 61.5, "measured_at": "2024-01-02"}\n'
+    assert _records(array, 'json') == _records(ndjson, 'json')
+    assert [index for index, _ in _records(array, 'json')] == [1, 2]
+    assert _records('[]', 'json') == []
+
+
+@pytest.mark.parametrize('text', ['[{"weight": 60}', '[{"weight": 60} {"weight": 61}]', '{"weight": '])
+def test_malformed_json_is_a_bulk_import_error(text):
+    with pytest.raises(BulkImportError):
+        _records(text, 'json')
+
+
+def test_invalid_rows_are_reported_with_their_line(monkeypatch):
+    records = [
+        (2, {'weight_kg': '60', 'measured_at': '2024-01-01 08:00'}),
+        (3, {'weight_kg': '500', 'measured_at': '2024-01-01 09:00'}),
+        (4, {'weight_kg': '60'}),
+        (5, {'weight_kg': '60', 'measured_at': '2999-01-01'}),
+        (6, 'not an object'),
+    ]
+    report, chunks = _import(monkeypatch, records)
+    assert report.received == 5 and report.imported == 1 and report.invalid == 4
+    assert [error['line'] for error in report.errors] == [3, 4, 5, 6]
+    assert len(chunks) == 1
+
+
+def test_utc_suffix_is_converted_to_local_time():
+    now = datetime(2030, 1, 1)
+    _, measured_at, _, _ = bulk_import.parse_weight_record(
+        {'weight': 60, 'measured_at': '2024-01-01T08:00:00Z'}, now)
+    expected = datetime(2024, 1, 1, 8, tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+    assert measured_at == expected
+
+
+def test_records_are_written_in_chunks_and_truncated_at_max_rows(monkeypatch):
+    records = [(line, {'weight': 60 + line / 10, 'measured_at': f'2024-01-{line:02d}'}) for line in range(1, 11)]
+    report, chunks = _import(monkeypatch, records, chunk_size=3, max_rows=8)
+    assert [len(chunk) for chunk in chunks] == [3, 3, 2]
+    assert report.received == 8 and report.imported == 8 and report.truncated
+
+
+def test_parse_error_flushes_earlier_records_then_raises(monkeypatch):
+    text = '{"weight": 60, "measured_at": "2024-01-01"}\n{"weight": '
+    report = ImportReport()
+    chunks = []
+    monkeypatch.setattr(bulk_import.WeightLog, 'import_chunk',
+                        lambda user_id, rows: chunks.append(rows) or len(rows))
+    with pytest.raises(BulkImportError):
+        bulk_import.import_weight_logs(1, iter_records(ReadOnlyStream(text.encode()), 'json'), report)
+    assert len(chunks) == 1 and report.imported == 1
+
+
+def test_failed_write_is_not_retried(monkeypatch):
+    calls = []
+
+    def fail(user_id, rows):
+        calls.append(rows)
+        raise RuntimeError('数据库错误')
+
+    monkeypatch.setattr(bulk_import.WeightLog, 'import_chunk', fail)
+    records = [(line, {'weight': 60, 'measured_at': f'2024-01-{line:02d}'}) for line in range(1, 6)]
+    with pytest.raises(RuntimeError, match='数据库错误'):
+        bulk_import.import_weight_logs(1, records, chunk_size=2)
+    assert len(calls) == 1
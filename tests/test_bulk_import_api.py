@@ -0,0 +1,23 @@
+import io
+
+from app import create_app
+from services import bulk_import
+
+
+def test_multipart_csv_upload_is_imported(monkeypatch):
+    written = []
+    monkeypatch.setattr(bulk_import.WeightLog, 'import_chunk',
+                        lambda user_id, rows: written.extend(rows) or len(rows))
+    client = create_app().test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+    body = '\ufeffmeasured_at,weight_kg,notes\n2024-01-01 08:00,60.5,早上\n2024-01-02 08:00,abc,\n'
+    response = client.post('/api/weight/import',
+                           data={'file': (io.BytesIO(body.encode('utf-8')), 'weights.csv', 'text/csv')},
+                           content_type='multipart/form-data',
+                           headers={'Accept': 'application/json'})
+    assert response.status_code == 200
+    report = response.get_json()
+    assert report['received'] == 2 and report['imported'] == 1 and report['invalid'] == 1
+    assert report['errors'][0]['line'] == 3
+    assert written[0][2] == 60.5 and written[0][3] == '早上'
@@ -0,0 +1,142 @@
+import json
+import threading
+
+from services import cache_service
+from services.cache_service import LRUCache, get_cache_key, get_profile_bucket
+
+PROFILE = {
+    'training_experience': 'beginner',
+    'available_equipment': ['哑铃', '杠铃'],
+    'current_weight_kg': 61.5,
+    'age': 24,
+}
+
+
+def test_equivalent_profiles_share_a_bucket():
+    similar = dict(PROFILE, available_equipment=[' 杠铃', '哑铃', '哑铃'], current_weight_kg=64.9, age=29,
+                   user_id=42, height_cm=190)
+    assert get_profile_bucket(PROFILE) == {
+        'training_experience': 'beginner',
+        'available_equipment': ['哑铃', '杠铃'],
+        'weight_band': '60-64',
+        'age_band': '20-29',
+    }
+    assert get_cache_key('深蹲', similar) == get_cache_key(' 深蹲 ', PROFILE)
+
+
+def test_different_buckets_get_different_keys():
+    assert get_cache_key('深蹲', PROFILE) != get_cache_key('深蹲', dict(PROFILE, current_weight_kg=65))
+    assert get_cache_key('深蹲', PROFILE) != get_cache_key('硬拉', PROFILE)
+    assert get_profile_bucket(None)['weight_band'] == 'unknown'
+    assert get_profile_bucket({'age': 'abc'})['age_band'] == 'unknown'
+
+
+def test_cache_is_shared_by_users_in_the_same_bucket(description_cache):
+    description_cache.set_cached_description('深蹲', PROFILE, '深蹲要点')
+    other_user = dict(PROFILE, current_weight_kg=62, age=21)
+    assert description_cache.get_cached_description('深蹲', other_user) == '深蹲要点'
+    assert description_cache.get_cached_description('深蹲', dict(PROFILE, age=35)) is None
+    stats = description_cache.get_cache_stats()
+    assert stats['hits'] == 1 and stats['misses'] == 1 and len(stats['buckets']) == 2
+
+
+def test_entries_are_stored_compressed_and_read_back_from_sqlite(description_cache):
+    content = '保持核心收紧。' * 200
+    description_cache.set_cached_description('深蹲', PROFILE, content)
+    description_cache.memory_cache.clear()
+    assert description_cache.get_cached_description('深蹲', PROFILE) == content
+    size, = description_cache._get_conn().execute("SELECT size FROM descriptions").fetchone()
+    assert size < len(content.encode('utf-8'))
+
+
+def test_expired_entries_are_deleted_on_read(description_cache):
+    description_cache.set_cached_description('深蹲', PROFILE, '旧内容', ttl_days=-1)
+    description_cache.memory_cache.clear()
+    assert description_cache.get_cached_description('深蹲', PROFILE) is None
+    assert description_cache._get_totals(description_cache._get_conn()) == (0, 0)
+
+
+def test_legacy_file_cache_is_migrated(description_cache, tmp_path):
+    legacy = tmp_path / 'legacy'
+    legacy.mkdir()
+    entry = {'exercise_name': '深蹲', 'content': '旧版介绍', 'user_profile': PROFILE,
+             'created_at': '2024-01-01T00:00:00', 'expires_at': '2999-01-01T00:00:00'}
+    (legacy / 'user_1_深蹲.json').write_text(json.dumps(entry, ensure_ascii=False), encoding='utf-8')
+    (legacy / 'broken.json').write_text('{', encoding='utf-8')
+    assert description_cache.migrate_file_cache(str(legacy)) == (1, 1)
+    assert description_cache.get_cached_description('深蹲', PROFILE) == '旧版介绍'
+    assert not list(legacy.glob('*.json'))
+
+
+def test_lru_evicts_least_recently_used_by_count_and_bytes():
+    cache = LRUCache(max_entries=2, max_bytes=10)
+    cache.set('a', 'aaa')
+    cache.set('b', 'bbb')
+    assert cache.get('a') == 'aaa'
+    cache.set('c', 'ccc')
+    assert cache.get('b') is None and cache.get('a') == 'aaa'
+    cache.set('d', 'dddddddd')
+    assert cache.get('a') is None and cache.get('c') is None and cache.get('d') == 'dddddddd'
+    cache.set('huge', 'x' * 11)
+    assert cache.get('huge') is None
+    stats = cache.stats()
+    assert stats['entries'] == 1 and stats['bytes'] == 8 and stats['evictions'] == 3
+
+
+def test_lru_entries_do_not_outlive_the_persistent_entry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_service.time, 'time', lambda: now[0])
+    cache = cache_service.LRUCache(ttl_seconds=60)
+    cache.set('a', 'aaa', expires_at=1010)
+    cache.set('b', 'bbb')
+    now[0] = 1011
+    assert cache.get('a') is None and cache.get('b') == 'bbb'
+    now[0] = 1061
+    assert cache.get('b') is None and cache.stats()['expirations'] == 2
+
+
+def test_sqlite_hits_fill_the_memory_tier(description_cache):
+    description_cache.set_cached_description('深蹲', PROFILE, '深蹲要点')
+    description_cache.memory_cache.clear()
+    description_cache.get_cached_description('深蹲', PROFILE)
+    description_cache._get_conn().execute("DELETE FROM descriptions")
+    assert description_cache.get_cached_description('深蹲', PROFILE) == '深蹲要点'
+
+
+def test_sweep_evicts_least_recently_read_entries_down_to_ninety_percent(description_cache, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_service.time, 'time', lambda: now[0])
+    for i in range(20):
+        now[0] += 1
+        description_cache.set_cached_description(f'动作{i}', PROFILE, f'介绍{i}')
+    # 读取最早写入的条目：读命中记录在内存中，清理时写回last_access
+    now[0] += 1
+    description_cache.get_cached_description('动作0', PROFILE)
+    result = description_cache.sweep_cache(max_entries=10, max_bytes=10 ** 9)
+    assert result['evicted'] == 11 and result['entries'] == 9
+    names = {row[0] for row in description_cache._get_conn().execute("SELECT exercise_name FROM descriptions")}
+    assert names == {'动作0'} | {f'动作{i}' for i in range(12, 20)}
+    entries, total_bytes = description_cache._get_totals(description_cache._get_conn())
+    counted = description_cache._get_conn().execute(
+        "SELECT COUNT(*), SUM(size) FROM descriptions").fetchone()
+    assert (entries, total_bytes) == counted
+
+
+def test_sweep_removes_expired_entries(description_cache):
+    description_cache.set_cached_description('深蹲', PROFILE, '旧内容', ttl_days=-1)
+    description_cache.set_cached_description('硬拉', PROFILE, '新内容')
+    result = description_cache.sweep_cache()
+    assert result['expired'] == 1 and result['evicted'] == 0 and result['entries'] == 1
+
+
+def test_schema_is_initialized_once_per_process(description_cache, monkeypatch):
+    calls = []
+    original = cache_service._init_schema
+    monkeypatch.setattr(cache_service, '_init_schema', lambda conn: calls.append(conn) or original(conn))
+    threads = [threading.Thread(target=description_cache.get_cached_description, args=('深蹲', PROFILE))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
@@ -0,0 +1,73 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from services.dashboard_service import load_dashboard
+
+TODAY = date(2024, 1, 10)
+
+
+def _plan_rows(plan_id, end_date):
+    rows = []
+    for day in (1, 2, 3):
+        rows.append({
+            'plan_id': plan_id, 'user_id': 1, 'plan_json': '{}', 'generated_at': datetime(2024, 1, 8),
+            'start_date': date(2024, 1, 8), 'end_date': end_date, 'is_active': 1,
+            'workout_id': plan_id * 10 + day, 'day_number': day, 'date': date(2024, 1, 7 + day),
+            'workout_json': json.dumps({'focus': f'第{day}天', 'exercises': []}, ensure_ascii=False),
+            'completed': day == 1, 'completion_time': None, 'user_notes': None,
+        })
+    return rows
+
+
+SUMMARY_ROWS = [
+    {'kind': 'week', 'exercise_name': None, 'week_start': date(2024, 1, 1), 'workouts_completed': 3,
+     'volume_kg': Decimal('900'), 'weight_kg': Decimal('60.0'), 'first_weight_kg': None, 'quantity': None,
+     'recorded_at': None},
+    {'kind': 'total', 'exercise_name': None, 'week_start': None, 'workouts_completed': 5,
+     'volume_kg': Decimal('1500'), 'weight_kg': Decimal('61.0'), 'first_weight_kg': Decimal('58.5'),
+     'quantity': 4, 'recorded_at': None},
+    {'kind': 'week', 'exercise_name': None, 'week_start': date(2024, 1, 8), 'workouts_completed': 2,
+     'volume_kg': Decimal('600'), 'weight_kg': Decimal('61.0'), 'first_weight_kg': None, 'quantity': None,
+     'recorded_at': None},
+    {'kind': 'record', 'exercise_name': '深蹲', 'week_start': None, 'workouts_completed': None,
+     'volume_kg': None, 'weight_kg': Decimal('100'), 'first_weight_kg': None, 'quantity': 5,
+     'recorded_at': datetime(2024, 1, 9)},
+]
+
+
+def test_dashboard_loads_over_one_connection_with_two_queries(fake_db):
+    fake_db.respond('LEFT JOIN daily_workouts', _plan_rows(7, date(2999, 1, 1)))
+    fake_db.respond('UNION ALL', SUMMARY_ROWS)
+    data = load_dashboard(1, today=TODAY)
+    assert fake_db.opened == 1 and len(fake_db.executed) == 2
+    assert data['plan']['id'] == 7 and [w['id'] for w in data['daily_workouts']] == [71, 72, 73]
+    assert data['today_workout']['id'] == 73 and data['today_workout']['focus'] == '第3天'
+    assert data['has_weight_logs']
+    progress = data['progress']
+    assert progress['workouts_completed'] == 5 and progress['week_workouts_completed'] == 2
+    assert progress['week_volume_kg'] == 600.0 and progress['total_gain_kg'] == 2.5
+    assert progress['weekly_gain_kg'] == 1.0 and progress['records'][0]['max_weight_reps'] == 5
+
+
+def test_expired_plan_goes_through_the_activation_path(fake_db):
+    fake_db.respond('LEFT JOIN daily_workouts', _plan_rows(7, date(2024, 1, 7)))
+    fake_db.respond('is_pending = TRUE AND start_date <= CURDATE()', [{'id': 8, 'user_id': 1}])
+    data_rows = _plan_rows(8, date(2999, 1, 1))
+
+    def after_activation(sql):
+        if 'LEFT JOIN daily_workouts' in sql and fake_db.statements('SET is_active = TRUE'):
+            return data_rows, len(data_rows)
+        return original(sql)
+
+    original = fake_db.lookup
+    fake_db.lookup = after_activation
+    data = load_dashboard(1, today=TODAY)
+    assert data['plan']['id'] == 8
+    assert not data['has_weight_logs'] and data['progress']['workouts_completed'] == 0
+    assert len(fake_db.statements('LEFT JOIN daily_workouts')) == 2
+
+
+def test_dashboard_without_a_plan(fake_db):
+    data = load_dashboard(1, today=TODAY)
+    assert data['plan'] is None and data['daily_workouts'] == [] and data['today_workout'] is None
@@ -0,0 +1,76 @@
+import pymysql
+import pytest
+
+from database import db_connection
+from database.db_connection import ConnectionPool, PoolTimeoutError
+from database.models import PlanJob, User
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.lastrowid = 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, args=None):
+        if FakeConnection.error is not None:
+            raise FakeConnection.error
+
+    def fetchone(self):
+        return None
+
+
+class FakeConnection:
+    # 下一次execute抛出的异常
+    error = None
+
+    def __init__(self):
+        self.open = True
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        self.open = False
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = ConnectionPool(max_size=2, timeout=0.05, connect=FakeConnection)
+    monkeypatch.setattr(db_connection, '_pool', pool)
+    return pool
+
+
+def test_failed_queries_return_connections_to_the_pool(pool, monkeypatch):
+    monkeypatch.setattr(FakeConnection, 'error', pymysql.err.IntegrityError(1062, 'Duplicate entry'))
+    for _ in range(pool.max_size + 1):
+        with pytest.raises(pymysql.err.IntegrityError):
+            User.create('alice', 'hash')
+    monkeypatch.setattr(FakeConnection, 'error', pymysql.err.OperationalError(2013, 'Lost connection'))
+    for _ in range(pool.max_size + 1):
+        with pytest.raises(pymysql.err.OperationalError):
+            PlanJob.get(1)
+    assert pool.stats()['in_use'] == 0
+
+
+def test_pool_times_out_when_every_connection_is_borrowed(pool):
+    held = [pool.acquire() for _ in range(pool.max_size)]
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+    held[0].close()
+    pool.acquire().close()
+    assert pool.stats()['in_use'] == pool.max_size - 1
@@ -0,0 +1,73 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from services import deepseek_service
+
+
+def test_buffered_follower_of_streaming_leader(monkeypatch, tmp_path):
+    """预取（do）与弹窗的流式请求同时生成同一个动作的介绍时，两边得到的类型各自正确"""
+    monkeypatch.setattr(deepseek_service, 'get_cached_description', lambda *args, **kwargs: None)
+    monkeypatch.setattr(deepseek_service, 'set_cached_description', lambda *args, **kwargs: None)
+    monkeypatch.setattr(deepseek_service, 'description_flight', deepseek_service.SingleFlight())
+    started = threading.Event()
+
+    def fake_stream(exercise_name, user_profile):
+        started.set()
+        for piece in ('abc', 'def'):
+            time.sleep(0.1)
+            yield piece
+
+    monkeypatch.setattr(deepseek_service, '_stream_from_api', fake_stream)
+    results = []
+
+    def prefetch():
+        started.wait()
+        results.append(deepseek_service.generate_exercise_description('深蹲', {}))
+
+    thread = threading.Thread(target=prefetch)
+    thread.start()
+    chunks, cached = deepseek_service.stream_exercise_description('深蹲', {})
+    assert list(chunks) == ['abc', 'def'] and cached is False
+    thread.join()
+    assert results == [('abcdef', False)]
+
+
+def test_stream_failure_mid_way_is_not_cached_and_reaches_followers(monkeypatch):
+    stored = []
+    monkeypatch.setattr(deepseek_service, 'get_cached_description', lambda *args, **kwargs: None)
+    monkeypatch.setattr(deepseek_service, 'set_cached_description', lambda *args: stored.append(args))
+    monkeypatch.setattr(deepseek_service, 'description_flight', deepseek_service.SingleFlight())
+    started = threading.Event()
+
+    def broken_upstream(**kwargs):
+        async def chunks():
+            yield '第一段'
+            started.set()
+            await asyncio.sleep(0.2)
+            raise deepseek_service.DeadlineExceeded('上游中断')
+        return chunks()
+
+    monkeypatch.setattr(deepseek_service, 'stream_chat_completion', broken_upstream)
+    errors = []
+
+    def prefetch():
+        started.wait()
+        try:
+            deepseek_service.generate_exercise_description('深蹲', {})
+        except deepseek_service.DeadlineExceeded as e:
+            errors.append(str(e))
+
+    thread = threading.Thread(target=prefetch)
+    thread.start()
+    chunks, _ = deepseek_service.stream_exercise_description('深蹲', {})
+    received = []
+    with pytest.raises(deepseek_service.DeadlineExceeded):
+        for text in chunks:
+            received.append(text)
+    thread.join()
+    assert received == ['第一段']
+    assert errors == ['上游中断']
+    assert stored == []
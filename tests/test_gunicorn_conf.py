@@ -0,0 +1,79 @@
+import importlib.util
+import os
+import subprocess
+import sys
+
+from database import db_connection
+from database.db_connection import ConnectionPool
+from services import llm_client
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _load_conf():
+    spec = importlib.util.spec_from_file_location('gunicorn_conf', os.path.join(ROOT, 'gunicorn.conf.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class RawConnection:
+    def __init__(self):
+        self.open = True
+        self.closed = False
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def test_importing_the_app_opens_no_connections():
+    # 预加载时在master中导入应用，不能连接数据库或创建DeepSeek客户端
+    code = ("import app; from database import db_connection; from services import llm_client; "
+            "assert db_connection._pool is None and llm_client._client is None and llm_client._loop is None")
+    env = dict(os.environ, DEEPSEEK_API_KEY='test')
+    subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, check=True)
+
+
+def test_child_drops_inherited_connections_without_closing_them(monkeypatch):
+    pool = ConnectionPool(max_size=2, connect=RawConnection)
+    conn = pool.acquire()
+    raw = conn._raw
+    conn.close()
+    assert pool.stats()['idle'] == 1
+    monkeypatch.setattr(db_connection.os, 'getpid', lambda: pool._pid + 1)
+    pool.reset()
+    # 不向服务器发送QUIT：父进程仍在使用同一个会话
+    assert not raw.closed and pool.stats()['size'] == 0
+    assert pool.acquire()._raw is not raw
+
+
+def test_post_fork_resets_the_pool_and_llm_client(monkeypatch):
+    calls = []
+    monkeypatch.setattr(db_connection, 'reset_pool', lambda: calls.append('pool'))
+    monkeypatch.setattr(llm_client, 'reset', lambda: calls.append('llm'))
+    _load_conf().post_fork(None, None)
+    assert calls == ['pool', 'llm']
+
+
+def test_when_ready_warns_about_a_small_pool(monkeypatch):
+    conf = _load_conf()
+    warnings = []
+
+    class Log:
+        def warning(self, *args):
+            warnings.append(args)
+
+    class Server:
+        log = Log()
+
+    monkeypatch.setattr(conf, 'worker_class', 'gthread')
+    monkeypatch.setattr(conf, 'threads', 8)
+    monkeypatch.setattr(db_connection.Config, 'DB_POOL_SIZE', 4)
+    conf.when_ready(Server())
+    assert len(warnings) == 1
+    monkeypatch.setattr(db_connection.Config, 'DB_POOL_SIZE', 100)
+    conf.when_ready(Server())
+    assert len(warnings) == 1
@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from services.llm_json import LLMJSONError, parse_llm_json
+from services.plan_schema import validate_plan
+
+
+def _day(number):
+    return {'day': number, 'focus': '全身',
+            'exercises': [{'name': '深蹲', 'sets': 3, 'reps': '8-12', 'weight': '适中', 'rest': '90秒'}],
+            'tips': '注意热身'}
+
+
+def _plan_text(days):
+    return json.dumps({'days': [_day(n) for n in range(1, days + 1)]}, ensure_ascii=False)
+
+
+def test_complete_output():
+    value, cut_path = parse_llm_json('好的，计划如下：\n```json\n' + _plan_text(2) + '\n```')
+    assert cut_path is None
+    assert [day['day'] for day in value['days']] == [1, 2]
+
+
+def test_missing_trailing_brace_only_keeps_last_day():
+    value, cut_path = parse_llm_json(_plan_text(2)[:-1])
+    assert cut_path == ()
+    assert [day['day'] for day in validate_plan(value, cut_path)['days']] == [1, 2]
+
+
+def test_missing_array_and_object_close_keeps_last_day():
+    value, cut_path = parse_llm_json(_plan_text(2)[:-2])
+    assert cut_path == ('days',)
+    assert [day['day'] for day in validate_plan(value, cut_path)['days']] == [1, 2]
+
+
+def test_cut_mid_day_drops_that_day():
+    text = _plan_text(2)
+    cut = text.rindex('"tips"') + 3
+    value, cut_path = parse_llm_json(text[:cut])
+    assert cut_path == ('days', 1)
+    assert [day['day'] for day in validate_plan(value, cut_path)['days']] == [1]
+
+
+def test_cut_mid_exercise_drops_that_day():
+    text = _plan_text(2)
+    cut = text.rindex('"reps"') + 10
+    value, cut_path = parse_llm_json(text[:cut])
+    assert cut_path[:3] == ('days', 1, 'exercises')
+    assert [day['day'] for day in validate_plan(value, cut_path)['days']] == [1]
+
+
+def test_repairs_missing_and_extra_commas():
+    value, cut_path = parse_llm_json('{"days": [{"day": 1, "exercises": [],} {"day": 2 "tips": "] \\"x"}]}')
+    assert cut_path is None
+    assert value['days'][1] == {'day': 2, 'tips': '] "x'}
+
+
+def test_no_json_object():
+    with pytest.raises(LLMJSONError):
+        parse_llm_json('抱歉，我无法生成计划')
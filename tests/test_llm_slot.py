@@ -0,0 +1,21 @@
+import asyncio
+
+import pytest
+
+from services import llm_client
+from services.resilience import CircuitBreaker, DeadlineExceeded
+
+
+def test_queueing_for_a_slot_does_not_open_the_breaker(monkeypatch):
+    """本地排队等待并发名额超时不计入熔断"""
+    monkeypatch.setattr(llm_client, 'breaker', CircuitBreaker(failure_threshold=1, reset_timeout=60))
+    monkeypatch.setattr(llm_client.Config, 'LLM_MAX_CONCURRENCY', 1)
+    monkeypatch.setattr(llm_client, '_semaphore', None)
+
+    async def scenario():
+        async with llm_client._Slot():
+            with pytest.raises(DeadlineExceeded):
+                await llm_client.chat_completion(deadline=0.1, model='x', messages=[])
+
+    asyncio.run(scenario())
+    assert llm_client.breaker.state == CircuitBreaker.CLOSED
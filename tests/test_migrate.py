@@ -0,0 +1,63 @@
+import sys
+import types
+
+import pytest
+
+from database import migrate
+
+
+def test_bundled_migrations_have_consecutive_versions():
+    versions = [version for version, _, _ in migrate.discover_migrations()]
+    assert versions == list(range(1, len(versions) + 1))
+
+
+@pytest.fixture
+def fake_migrations(monkeypatch, fake_db):
+    """三个假的迁移模块，记录执行顺序"""
+    monkeypatch.setattr(migrate, 'get_db_connection', fake_db.connect)
+    upgraded = []
+    migrations = []
+    for version, name in ((1, 'first'), (2, 'second'), (3, 'third')):
+        module_name = f'tests.fake_migration_{version:04d}_{name}'
+        module = types.ModuleType(module_name)
+        module.upgrade = lambda cursor, version=version: upgraded.append(version)
+        monkeypatch.setitem(sys.modules, module_name, module)
+        migrations.append((version, name, module_name))
+    monkeypatch.setattr(migrate, 'discover_migrations', lambda: migrations)
+    fake_db.respond('GET_LOCK', [{'locked': 1}])
+    return upgraded
+
+
+def test_only_pending_migrations_run_in_order_under_the_lock(fake_db, fake_migrations):
+    fake_db.respond('SELECT version FROM schema_version', [{'version': 1}])
+    assert migrate.migrate() == [2, 3]
+    assert fake_migrations == [2, 3]
+    statements = fake_db.statements()
+    assert statements[0].startswith('SELECT GET_LOCK') and statements[-1].startswith('SELECT RELEASE_LOCK')
+    assert [args for sql, args in fake_db.executed if sql.startswith('INSERT INTO schema_version')] == [
+        (2, 'second'), (3, 'third')]
+    assert fake_db.commits == 2
+
+
+def test_target_stops_at_the_requested_version(fake_db, fake_migrations):
+    assert migrate.migrate(target=2) == [1, 2]
+    assert fake_migrations == [1, 2]
+
+
+def test_lock_timeout_applies_nothing(fake_db, fake_migrations):
+    fake_db.respond('GET_LOCK', [{'locked': 0}])
+    with pytest.raises(RuntimeError):
+        migrate.migrate()
+    assert fake_migrations == [] and fake_db.closed == 1
+    assert not fake_db.statements('RELEASE_LOCK')
+
+
+def test_failed_migration_releases_the_lock(fake_db, fake_migrations, monkeypatch):
+    def broken(cursor):
+        raise RuntimeError('迁移失败')
+
+    monkeypatch.setattr(sys.modules['tests.fake_migration_0002_second'], 'upgrade', broken)
+    with pytest.raises(RuntimeError, match='迁移失败'):
+        migrate.migrate()
+    assert fake_migrations == [1]
+    assert fake_db.statements('RELEASE_LOCK') and fake_db.closed == 1
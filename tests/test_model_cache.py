@@ -0,0 +1,66 @@
+from datetime import date
+
+from database import models
+from database.models import DailyWorkout, UserProfile, WeeklyPlan
+
+PROFILE_ROW = {'user_id': 1, 'available_equipment': '["哑铃"]', 'preferences': '{}'}
+PLAN_ROW = {'id': 7, 'user_id': 1, 'end_date': date(2999, 1, 1)}
+
+
+def _loads(fake_db, fragment):
+    return len(fake_db.statements(fragment))
+
+
+def test_identity_map_loads_each_row_once_per_request(fake_db):
+    fake_db.respond('FROM user_profiles', [PROFILE_ROW])
+    models.begin_request_scope()
+    first = UserProfile.get_by_user_id(1)
+    first['available_equipment'].append('杠铃')
+    assert UserProfile.get_by_user_id(1)['available_equipment'] == ['哑铃']
+    assert _loads(fake_db, 'SELECT * FROM user_profiles') == 1
+    models.end_request_scope()
+    UserProfile.get_by_user_id(1)
+    assert _loads(fake_db, 'SELECT * FROM user_profiles') == 2
+
+
+def test_ttl_cache_is_shared_across_requests(fake_db, monkeypatch):
+    monkeypatch.setattr(models.Config, 'MODEL_CACHE_TTL', 60)
+    fake_db.respond('FROM weekly_plans', [PLAN_ROW])
+    WeeklyPlan.get_active_plan(1)
+    WeeklyPlan.get_active_plan(1)
+    assert _loads(fake_db, 'FROM weekly_plans') == 1
+
+
+def test_create_or_update_invalidates_the_profile(fake_db):
+    fake_db.respond('FROM user_profiles', [PROFILE_ROW])
+    models.begin_request_scope()
+    UserProfile.get_by_user_id(1)
+    UserProfile.create_or_update(1, age=30)
+    UserProfile.get_by_user_id(1)
+    assert _loads(fake_db, 'SELECT * FROM user_profiles') == 2
+
+
+def test_replace_days_invalidates_the_plan_and_its_days(fake_db):
+    fake_db.respond('FROM weekly_plans', [PLAN_ROW])
+    fake_db.respond('FROM daily_workouts', [{'id': 1, 'weekly_plan_id': 7, 'day_number': 1}])
+    models.begin_request_scope()
+    WeeklyPlan.get_active_plan(1)
+    DailyWorkout.get_by_week_plan(7)
+    WeeklyPlan.replace_days(7, 1, '{}', [{'day': 1}])
+    WeeklyPlan.get_active_plan(1)
+    DailyWorkout.get_by_week_plan(7)
+    assert _loads(fake_db, 'SELECT * FROM weekly_plans') == 2
+    assert _loads(fake_db, 'FROM daily_workouts WHERE weekly_plan_id') == 2
+
+
+def test_mark_completed_invalidates_the_days_and_progress(fake_db):
+    fake_db.respond('FROM daily_workouts', [{'id': 1, 'weekly_plan_id': 7, 'day_number': 1}])
+    fake_db.respond('UPDATE daily_workouts d JOIN', rowcount=0)
+    models.begin_request_scope()
+    DailyWorkout.get_by_week_plan(7)
+    scope = models._identity_map.get()
+    scope[('progress', 1)] = {'cached': True}
+    assert DailyWorkout.mark_completed(1, 1) is False
+    assert ('workouts', 7) not in scope and ('progress', 1) not in scope
+    DailyWorkout.get_by_week_plan(7)
+    assert _loads(fake_db, 'FROM daily_workouts WHERE weekly_plan_id') == 2
@@ -0,0 +1,99 @@
+from datetime import date, timedelta
+
+import pytest
+
+from database.models import WeeklyPlan
+from services import plan_batch
+
+PLAN = {'days': [{'day': 1, 'exercises': []}]}
+
+
+class FakeRuns:
+    """内存中的 plan_batch_runs"""
+
+    def __init__(self, run=None):
+        self.run = run or {'id': 1, 'status': 'running', 'last_user_id': 0, 'processed': 0, 'succeeded': 0,
+                           'failed': 0, 'skipped': 0, 'elapsed_seconds': 0.0, 'report': None}
+        self.checkpoints = []
+        self.finished = None
+
+    def start_or_resume(self, run_date, horizon_days):
+        return dict(self.run)
+
+    def checkpoint(self, run_id, last_user_id, counts, elapsed_seconds):
+        self.checkpoints.append((last_user_id, dict(counts)))
+
+    def finish(self, run_id, report):
+        self.finished = report
+
+    def reopen(self, run_id):
+        self.run['status'] = 'running'
+
+
+@pytest.fixture
+def batch(monkeypatch):
+    runs = FakeRuns()
+    for name in ('start_or_resume', 'checkpoint', 'finish', 'reopen'):
+        monkeypatch.setattr(plan_batch.PlanBatchRun, name, getattr(runs, name))
+    end_date = date.today() + timedelta(days=1)
+    users = [{'user_id': user_id, 'end_date': end_date} for user_id in (3, 5, 8, 13, 21)]
+    pages = []
+
+    def find_expiring(end_from, end_before, after_user_id, limit):
+        pages.append(after_user_id)
+        return [row for row in users if row['user_id'] > after_user_id][:limit]
+
+    created = []
+
+    def create_pending(user_id, plan_json, start_date, end_date, days, template_id):
+        if user_id == 8:
+            raise RuntimeError('数据库错误')
+        created.append((user_id, start_date, end_date))
+        return user_id
+
+    monkeypatch.setattr(plan_batch.WeeklyPlan, 'find_expiring', find_expiring)
+    monkeypatch.setattr(plan_batch.WeeklyPlan, 'create_pending', create_pending)
+    monkeypatch.setattr(plan_batch.WeeklyPlan, 'activate_due', lambda: 0)
+    monkeypatch.setattr(plan_batch.UserProfile, 'get_by_user_id',
+                        lambda user_id: None if user_id == 13 else {'user_id': user_id})
+    monkeypatch.setattr(plan_batch, 'generate_plan', lambda profile, user_id: (PLAN, 'local', None))
+    return runs, pages, created, end_date
+
+
+def test_users_are_paged_by_key_and_checkpointed(batch):
+    runs, pages, created, end_date = batch
+    report = plan_batch.run_batch(workers=2, page_size=2)
+    assert pages == [0, 5, 13, 21]
+    assert [last for last, _ in runs.checkpoints] == [5, 13, 21]
+    assert (report['processed'], report['succeeded'], report['failed'], report['skipped']) == (5, 3, 1, 1)
+    assert report['failures'][0]['user_id'] == 8 and report['sources'] == {'local': 3}
+    # 新计划从当前计划结束的次日开始
+    assert created[0] == (3, end_date + timedelta(days=1), end_date + timedelta(days=7))
+    assert runs.finished is not None
+
+
+def test_interrupted_run_resumes_after_the_checkpoint(batch):
+    runs, pages, created, _ = batch
+    runs.run.update(last_user_id=5, processed=2, succeeded=2)
+    report = plan_batch.run_batch(workers=1, page_size=10)
+    assert pages == [5, 21]
+    assert report['processed'] == 5 and report['succeeded'] == 3
+    assert [user_id for user_id, _, _ in created] == [21]
+
+
+def test_finished_run_is_not_repeated_without_force(batch):
+    runs, pages, _, _ = batch
+    runs.run.update(status='finished', report='{"processed": 5}')
+    assert plan_batch.run_batch() == {'processed': 5}
+    assert pages == []
+    plan_batch.run_batch(force=True)
+    assert pages
+
+
+def test_find_expiring_bounds_the_end_date_on_both_sides(fake_db):
+    today = date(2024, 1, 10)
+    WeeklyPlan.find_expiring(today, today + timedelta(days=2), after_user_id=7, limit=50)
+    sql, args = fake_db.executed[0]
+    assert 'p.user_id > %s' in sql and 'HAVING MAX(p.end_date) BETWEEN %s AND %s' in sql
+    assert 'ORDER BY p.user_id LIMIT %s' in sql
+    assert args == (7, today, today + timedelta(days=2), 50)
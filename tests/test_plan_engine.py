@@ -0,0 +1,88 @@
+import pytest
+
+from services import deepseek_service, plan_engine, plan_templates
+from services.exercise_library import EXERCISES, LEVELS, available_equipment_set
+from services.plan_engine import choose_plan_source, generate_local_plan, is_simple_profile
+from services.plan_schema import validate_plan
+
+BY_NAME = {exercise['name']: exercise for exercise in EXERCISES}
+
+
+def _profile(level='intermediate', equipment=('哑铃',), days=4, minutes=60, focus=None, avoid=''):
+    return {
+        'training_experience': level,
+        'available_equipment': list(equipment),
+        'preferences': {'days_per_week': days, 'session_minutes': minutes, 'focus': focus or ['全身'],
+                        'avoid': avoid},
+    }
+
+
+def _exercises(plan):
+    return [BY_NAME[exercise['name']] for day in plan['days'] for exercise in day['exercises']]
+
+
+@pytest.mark.parametrize('days', range(1, 8))
+def test_plan_has_seven_days_and_the_requested_training_days(days):
+    plan = generate_local_plan(_profile(days=days))
+    assert [day['day'] for day in plan['days']] == list(range(1, 8))
+    training = [day for day in plan['days'] if day['exercises'] and day['focus'] != '活动恢复']
+    assert len(training) == min(days, 6)
+    assert validate_plan(plan)['days'] == plan['days']
+
+
+def test_same_profile_gives_the_same_plan_and_shift_changes_it():
+    profile = _profile()
+    assert generate_local_plan(profile) == generate_local_plan(dict(profile))
+    assert generate_local_plan(profile, shift=1) != generate_local_plan(profile)
+
+
+def test_exercises_fit_equipment_and_level():
+    plan = generate_local_plan(_profile(level='beginner', equipment=('弹力带',), days=3))
+    owned = available_equipment_set(['弹力带'])
+    for exercise in _exercises(plan):
+        assert exercise['equipment'] <= owned
+        assert LEVELS.index(exercise['level']) == 0
+
+
+def test_avoided_exercises_are_excluded():
+    plan = generate_local_plan(_profile(equipment=('哑铃', '杠铃', '卧推架'), avoid='卧推，手腕'))
+    for exercise in _exercises(plan):
+        assert '卧推' not in exercise['name'] and '卧推' not in exercise['tags'] and '手腕' not in exercise['tags']
+
+
+def test_session_length_sets_the_number_of_exercises():
+    short = generate_local_plan(_profile(minutes=30))
+    long = generate_local_plan(_profile(minutes=90))
+    assert max(len(day['exercises']) for day in short['days']) == 3
+    assert max(len(day['exercises']) for day in long['days']) > 3
+
+
+def test_simple_profiles_are_routed_to_the_local_engine(monkeypatch):
+    monkeypatch.setattr(plan_engine.Config, 'PLAN_ENGINE_MODE', 'auto')
+    assert is_simple_profile(_profile(level='beginner', equipment=('弹力带',)))
+    assert choose_plan_source(_profile(level='beginner', equipment=('弹力带',))) == 'local'
+    assert choose_plan_source(_profile(level='beginner', equipment=('哑铃',))) == 'llm'
+    assert choose_plan_source(_profile(level='beginner', equipment=(), avoid='深蹲')) == 'llm'
+    monkeypatch.setattr(plan_engine.Config, 'PLAN_ENGINE_MODE', 'local')
+    assert choose_plan_source(_profile(level='advanced')) == 'local'
+
+
+def test_llm_failure_falls_back_to_the_local_plan(monkeypatch):
+    monkeypatch.setattr(plan_engine.Config, 'PLAN_ENGINE_MODE', 'llm')
+    monkeypatch.setattr(plan_engine.Config, 'PLAN_TEMPLATE_ENABLED', True)
+    monkeypatch.setattr(plan_engine.Config, 'PLAN_TEMPLATE_ANONYMOUS', True)
+    monkeypatch.setattr(plan_templates, 'find_template', lambda profile, user_id: (None, None))
+    monkeypatch.setattr(deepseek_service, 'generate_workout_plan', lambda profile, fallback=True: None)
+    profile = _profile()
+    plan, source, template_id = plan_engine.generate_plan(profile)
+    assert source == 'local' and template_id is None
+    assert plan == generate_local_plan(profile)
+
+
+def test_truncated_llm_plan_is_completed_with_local_days():
+    profile = _profile()
+    partial = {'days': [{'day': 1, 'focus': 'LLM', 'exercises': [], 'tips': ''}]}
+    completed = plan_engine.complete_plan(partial, profile)
+    assert [day['day'] for day in completed['days']] == list(range(1, 8))
+    assert completed['days'][0]['focus'] == 'LLM'
+    assert completed['days'][1:] == generate_local_plan(profile)['days'][1:]
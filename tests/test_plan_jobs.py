@@ -0,0 +1,23 @@
+import pymysql
+
+from database.models import PlanJob
+from services import plan_jobs
+
+
+def test_job_fails_when_it_cannot_be_marked_running(monkeypatch):
+    failed = []
+
+    def mark_running(job_id):
+        raise pymysql.err.OperationalError(2013, 'Lost connection')
+
+    monkeypatch.setattr(plan_jobs.PlanJob, 'mark_running', mark_running)
+    monkeypatch.setattr(plan_jobs.PlanJob, 'mark_failed', lambda job_id, error: failed.append((job_id, error)))
+    monkeypatch.setattr(plan_jobs, 'generate_plan', lambda *args: (_ for _ in ()).throw(AssertionError))
+    assert plan_jobs.run_plan_job(5, 1, {}) is None
+    assert failed and failed[0][0] == 5
+
+
+def test_staleness_is_measured_from_start_in_sql():
+    assert 'COALESCE(started_at, created_at) < NOW()' in PlanJob.SELECT_SQL
+    assert not plan_jobs._is_stale({'is_stale': 0})
+    assert plan_jobs._is_stale({'is_stale': 1})
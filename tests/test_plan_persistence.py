@@ -0,0 +1,33 @@
+from datetime import date
+
+import pymysql
+import pytest
+
+from database.models import WeeklyPlan
+
+DAYS = [{'day': day, 'exercises': [{'name': '深蹲'}]} for day in (1, 2, 3)]
+
+
+def test_plan_and_days_are_saved_in_one_transaction(fake_db):
+    plan_id = WeeklyPlan.create_with_workouts(1, '{}', date(2024, 1, 1), date(2024, 1, 7), DAYS)
+    assert fake_db.opened == 1 and fake_db.commits == 1 and fake_db.closed == 1
+    deactivate, insert_plan, insert_days = fake_db.executed
+    assert deactivate[0].startswith('UPDATE weekly_plans SET is_active = FALSE')
+    assert insert_plan[0].startswith('INSERT INTO weekly_plans')
+    # 所有每日锻炼用一次executemany写入，日期按day计算
+    assert insert_days[0].startswith('INSERT INTO daily_workouts')
+    assert [row[:3] for row in insert_days[1]] == [
+        (plan_id, 1, date(2024, 1, 1)), (plan_id, 2, date(2024, 1, 2)), (plan_id, 3, date(2024, 1, 3))]
+
+
+def test_failed_day_insert_rolls_back_the_plan(fake_db):
+    fake_db.fail('INSERT INTO daily_workouts', pymysql.err.OperationalError(2013, 'Lost connection'))
+    with pytest.raises(pymysql.err.OperationalError):
+        WeeklyPlan.create_with_workouts(1, '{}', date(2024, 1, 1), date(2024, 1, 7), DAYS)
+    assert fake_db.commits == 0 and fake_db.rollbacks == 1 and fake_db.closed == 1
+
+
+def test_pending_plan_is_not_duplicated(fake_db):
+    fake_db.respond('SELECT id, is_pending FROM weekly_plans', [{'id': 3, 'is_pending': 1}])
+    assert WeeklyPlan.create_pending(1, '{}', date(2024, 1, 8), date(2024, 1, 14), DAYS) is None
+    assert fake_db.statements('INSERT') == []
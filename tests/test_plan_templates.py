@@ -0,0 +1,42 @@
+from config import Config
+from services import deepseek_service, plan_engine, plan_templates
+
+PROFILE = {
+    'age': 24,
+    'height_cm': 180,
+    'current_weight_kg': 58,
+    'target_weight_kg': 65,
+    'training_experience': '中级',
+    'available_equipment': ['哑铃'],
+    'preferences': {'days_per_week': 4},
+}
+
+
+def _run_llm_path(monkeypatch, anonymous):
+    prompts = []
+    stored = []
+    monkeypatch.setattr(Config, 'PLAN_ENGINE_MODE', 'llm')
+    monkeypatch.setattr(Config, 'PLAN_TEMPLATE_ENABLED', True)
+    monkeypatch.setattr(Config, 'PLAN_TEMPLATE_ANONYMOUS', anonymous)
+    monkeypatch.setattr(plan_templates, 'find_template', lambda profile, user_id: (None, None))
+    monkeypatch.setattr(plan_templates, 'store_template', lambda profile, plan: stored.append(plan) or 7)
+
+    def fake_generate(profile, fallback=True):
+        prompts.append(profile)
+        return {'days': [{'day': day, 'exercises': []} for day in range(1, 8)]}
+
+    monkeypatch.setattr(deepseek_service, 'generate_workout_plan', fake_generate)
+    _, source, template_id = plan_engine.generate_plan(PROFILE, user_id=1)
+    return prompts, stored, source, template_id
+
+
+def test_shared_template_is_generated_without_personal_fields(monkeypatch):
+    prompts, stored, source, template_id = _run_llm_path(monkeypatch, anonymous=True)
+    assert source == 'llm' and template_id == 7 and len(stored) == 1
+    assert not set(plan_templates.PERSONAL_FIELDS) & set(prompts[0])
+
+
+def test_personal_generation_keeps_full_profile_and_is_not_shared(monkeypatch):
+    prompts, stored, source, template_id = _run_llm_path(monkeypatch, anonymous=False)
+    assert source == 'llm' and template_id is None and stored == []
+    assert prompts == [PROFILE]
@@ -0,0 +1,48 @@
+from services import deepseek_service, plan_jobs, prefetch_service
+
+PLAN = {'days': [
+    {'day': 1, 'exercises': [{'name': '深蹲'}, {'name': '卧推'}]},
+    {'day': 2, 'exercises': [{'name': ' 深蹲 '}, {'name': '硬拉'}, {'name': ''}]},
+    {'day': 3, 'exercises': [{'name': '划船'}]},
+]}
+
+
+class InlineExecutor:
+    def submit(self, fn, *args):
+        fn(*args)
+
+
+def test_extract_exercise_names_keeps_first_occurrence_order():
+    assert prefetch_service.extract_exercise_names(PLAN) == ['深蹲', '卧推', '硬拉', '划船']
+
+
+def test_prefetch_skips_cached_names_and_caps_per_plan(monkeypatch):
+    generated = []
+    monkeypatch.setattr(prefetch_service.Config, 'PREFETCH_ENABLED', True)
+    monkeypatch.setattr(prefetch_service, '_get_executor', InlineExecutor)
+    monkeypatch.setattr(prefetch_service, 'get_cached_description',
+                        lambda name, profile, record_stats=True: '已缓存' if name == '卧推' else None)
+    monkeypatch.setattr(deepseek_service, 'generate_exercise_description',
+                        lambda name, profile: generated.append(name) or ('介绍', False))
+    monkeypatch.setattr(prefetch_service, '_stats', dict.fromkeys(prefetch_service._stats, 0))
+    assert prefetch_service.prefetch_descriptions(PLAN, {}, max_names=2) == 2
+    assert generated == ['深蹲', '硬拉']
+    stats = prefetch_service.get_prefetch_stats()
+    assert (stats['scheduled'], stats['skipped_cached'], stats['skipped_limit'], stats['completed']) == (2, 1, 1, 2)
+
+
+def test_prefetch_is_disabled_by_config(monkeypatch):
+    monkeypatch.setattr(prefetch_service.Config, 'PREFETCH_ENABLED', False)
+    assert prefetch_service.prefetch_descriptions(PLAN, {}) == 0
+
+
+def test_plan_job_warms_descriptions_after_saving(monkeypatch):
+    calls = []
+    plan = {'days': [{'day': 1, 'exercises': [{'name': '深蹲'}]}]}
+    monkeypatch.setattr(plan_jobs.PlanJob, 'mark_running', lambda job_id: calls.append('running'))
+    monkeypatch.setattr(plan_jobs.PlanJob, 'mark_succeeded', lambda job_id, plan_id: calls.append('succeeded'))
+    monkeypatch.setattr(plan_jobs, 'generate_plan', lambda profile, user_id: (plan, 'llm', None))
+    monkeypatch.setattr(plan_jobs.WeeklyPlan, 'create_with_workouts', lambda *args: 9)
+    monkeypatch.setattr(plan_jobs, 'prefetch_descriptions', lambda data, profile: calls.append(data))
+    assert plan_jobs.run_plan_job(1, 1, {}) == 9
+    assert calls == ['running', 'succeeded', plan]
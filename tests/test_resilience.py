@@ -0,0 +1,158 @@
+import asyncio
+import time
+
+import pytest
+
+from services import resilience
+from services.resilience import (CircuitBreaker, CircuitOpenError, DeadlineExceeded, TokenBucket,
+                                 call_with_retry)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """可手动推进的 time.monotonic"""
+    now = [1000.0]
+    monkeypatch.setattr(resilience.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_token_bucket_allows_a_burst_then_waits():
+    bucket = TokenBucket(rate=50, capacity=3)
+
+    async def take(count):
+        for _ in range(count):
+            await bucket.acquire()
+
+    start = time.monotonic()
+    asyncio.run(take(3))
+    assert bucket.waits == 0
+    asyncio.run(take(2))
+    assert time.monotonic() - start >= 0.03 and bucket.waits == 2
+
+
+def test_token_bucket_rejects_when_the_wait_passes_the_deadline(clock):
+    bucket = TokenBucket(rate=1, capacity=1)
+    asyncio.run(bucket.acquire())
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(bucket.acquire(deadline=clock[0] + 0.5))
+    assert bucket.rejected == 1
+    clock[0] += 1
+    asyncio.run(bucket.acquire(deadline=clock[0] + 0.5))
+
+
+def test_token_bucket_without_rate_is_unlimited():
+    bucket = TokenBucket(rate=0, capacity=1)
+
+    async def take():
+        for _ in range(100):
+            await bucket.acquire()
+
+    asyncio.run(take())
+    assert bucket.stats()['tokens'] is None
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and breaker.opened_count == 1
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert breaker.rejected == 1 and breaker.stats()['retry_in'] == 30
+
+
+def test_half_open_breaker_lets_one_trial_through(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock[0] += 30
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    # 试探失败重新打开，冷却时间重新计算
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and breaker.opened_count == 2
+    clock[0] += 30
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_call()
+
+
+def test_released_trial_allows_another_trial(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock[0] += 30
+    breaker.before_call()
+    breaker.release_trial()
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+class Flaky:
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return 'ok'
+
+
+def _run(fn, **kwargs):
+    async def scenario():
+        return await call_with_retry(fn, time.monotonic() + 5, base_delay=0.001, max_delay=0.002, **kwargs)
+    return asyncio.run(scenario())
+
+
+def test_retryable_errors_are_retried_and_counted_by_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=5)
+    retries = []
+    fn = Flaky(ConnectionError(), ConnectionError())
+    assert _run(fn, breaker=breaker, on_retry=lambda attempt, exc, delay: retries.append(attempt)) == 'ok'
+    assert fn.calls == 3 and retries == [0, 1]
+    assert breaker.stats()['consecutive_failures'] == 0
+
+
+def test_retries_stop_after_max_retries():
+    fn = Flaky(ConnectionError(), ConnectionError(), ConnectionError())
+    with pytest.raises(ConnectionError):
+        _run(fn, max_retries=2)
+    assert fn.calls == 3
+
+
+def test_request_errors_are_not_retried_and_do_not_open_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=1)
+    fn = Flaky(ValueError('400'))
+    with pytest.raises(ValueError):
+        _run(fn, breaker=breaker, is_retryable=lambda exc: not isinstance(exc, ValueError))
+    assert fn.calls == 1 and breaker.state == CircuitBreaker.CLOSED
+
+
+def test_retry_after_longer_than_the_deadline_fails_fast():
+    fn = Flaky(ConnectionError())
+    start = time.monotonic()
+    with pytest.raises(ConnectionError):
+        _run(fn, retry_after=lambda exc: 60)
+    assert fn.calls == 1 and time.monotonic() - start < 1
+
+
+def test_attempt_timeout_raises_deadline_exceeded():
+    breaker = CircuitBreaker(failure_threshold=1)
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    async def scenario():
+        await call_with_retry(slow, time.monotonic() + 0.05, breaker=breaker)
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(scenario())
+    assert breaker.state == CircuitBreaker.OPEN
@@ -0,0 +1,81 @@
+import threading
+import time
+
+from services.singleflight import SingleFlight
+
+
+def _run_follower(flight, key, started, mode, results):
+    started.wait()
+    # 确保领头调用已经登记
+    time.sleep(0.05)
+    if mode == 'do':
+        results.append(flight.do(key, lambda: 'follower'))
+    else:
+        results.append(list(flight.stream(key, lambda: iter(['follower']))))
+
+
+def _slow_stream(started):
+    started.set()
+    for piece in ('abc', 'def'):
+        time.sleep(0.1)
+        yield piece
+
+
+def test_do_follower_of_stream_leader_gets_full_text():
+    flight = SingleFlight()
+    started = threading.Event()
+    results = []
+    follower = threading.Thread(target=_run_follower, args=(flight, 'k', started, 'do', results))
+    follower.start()
+    assert list(flight.stream('k', lambda: _slow_stream(started))) == ['abc', 'def']
+    follower.join()
+    assert results == ['abcdef']
+
+
+def test_stream_follower_of_do_leader_gets_full_text():
+    flight = SingleFlight()
+    started = threading.Event()
+    results = []
+
+    def leader():
+        started.set()
+        time.sleep(0.2)
+        return 'desc'
+
+    follower = threading.Thread(target=_run_follower, args=(flight, 'k', started, 'stream', results))
+    follower.start()
+    assert flight.do('k', leader) == 'desc'
+    follower.join()
+    assert results == [['desc']]
+
+
+def test_follower_sees_leader_error():
+    flight = SingleFlight()
+    started = threading.Event()
+    errors = []
+
+    def broken():
+        started.set()
+        yield 'abc'
+        time.sleep(0.1)
+        raise RuntimeError('stream broke')
+
+    def follower():
+        started.wait()
+        time.sleep(0.02)
+        try:
+            flight.do('k', lambda: 'follower')
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    thread = threading.Thread(target=follower)
+    thread.start()
+    chunks = []
+    try:
+        for piece in flight.stream('k', broken):
+            chunks.append(piece)
+    except RuntimeError:
+        pass
+    thread.join()
+    assert chunks == ['abc']
+    assert errors == ['stream broke']
@@ -0,0 +1,89 @@
+import math
+from datetime import date, datetime, timedelta
+
+from database.models import WeightLog
+from services import weight_series
+
+START = datetime(2024, 1, 1, 7, 0)
+
+
+def make_rows(count, per_day=1):
+    """同一时刻可以有多条记录（per_day>1时），用于检查 (measured_at, id) 的键集分页"""
+    return [{'id': i + 1, 'weight_kg': 70 + i * 0.01, 'notes': None,
+             'measured_at': START + timedelta(days=i // per_day)} for i in range(count)]
+
+
+def test_get_page_continues_after_the_last_key(fake_db):
+    after = (START, 42)
+    WeightLog.get_page(1, after=after, start_at=START, end_at=START + timedelta(days=7), limit=10)
+    sql, args = fake_db.executed[0]
+    assert '(measured_at > %s OR (measured_at = %s AND id > %s))' in sql
+    assert 'ORDER BY measured_at, id LIMIT %s' in sql
+    assert args == [1, START, START, 42, START, START + timedelta(days=7), 10]
+
+
+def test_load_points_pages_through_rows_with_equal_timestamps(monkeypatch):
+    rows = make_rows(7, per_day=3)
+    calls = []
+
+    def get_page(user_id, after=None, start_at=None, end_at=None, limit=500):
+        calls.append(after)
+        remaining = [row for row in rows if after is None or (row['measured_at'], row['id']) > after]
+        return remaining[:limit]
+
+    monkeypatch.setattr(weight_series.WeightLog, 'get_page', get_page)
+    points = weight_series.load_points(1, page_size=2)
+    assert len(points) == 7
+    assert calls == [None, (START, 2), (START + timedelta(days=1), 4), (START + timedelta(days=1), 6)]
+
+
+def test_load_points_stops_on_a_full_last_page(monkeypatch):
+    rows = make_rows(4)
+    calls = []
+
+    def get_page(user_id, after=None, start_at=None, end_at=None, limit=500):
+        calls.append((after, start_at, end_at))
+        return [row for row in rows if after is None or row['id'] > after[1]][:limit]
+
+    monkeypatch.setattr(weight_series.WeightLog, 'get_page', get_page)
+    assert len(weight_series.load_points(1, date(2024, 1, 1), date(2024, 1, 31), page_size=2)) == 4
+    # 最后一页刚好满页时再查一次空页
+    assert len(calls) == 3
+    # end包含当天，所以上界是次日零点
+    assert calls[0][1:] == (datetime(2024, 1, 1), datetime(2024, 2, 1))
+
+
+def test_lttb_keeps_endpoints_and_one_point_per_bucket():
+    times = [float(i) for i in range(100)]
+    values = [math.sin(i / 5) for i in range(100)]
+    selected = weight_series.lttb(times, values, 10)
+    assert len(selected) == 10
+    assert selected[0] == 0 and selected[-1] == 99
+    assert selected == sorted(set(selected))
+
+
+def test_lttb_keeps_a_spike():
+    times = [float(i) for i in range(50)]
+    values = [70.0] * 50
+    values[23] = 80.0
+    assert 23 in weight_series.lttb(times, values, 5)
+
+
+def test_lttb_returns_everything_below_the_threshold():
+    assert weight_series.lttb([0.0, 1.0, 2.0], [1.0, 2.0, 3.0], 10) == [0, 1, 2]
+    assert weight_series.lttb([0.0, 1.0, 2.0, 3.0], [1.0, 2.0, 3.0, 4.0], 2) == [0, 1, 2, 3]
+
+
+def test_rolling_average_uses_a_time_window():
+    day = 86400.0
+    times = [0.0, day, 2 * day, 10 * day]
+    assert weight_series.rolling_average(times, [70.0, 72.0, 74.0, 80.0], window_days=7) == [70.0, 71.0, 72.0, 80.0]
+
+
+def test_build_series_downsamples_and_reports_the_trend():
+    points = [(START + timedelta(days=i), 70 + i / 7 * 0.5) for i in range(400)]
+    series = weight_series.build_series(points, target_points=50)
+    assert series['total'] == 400 and len(series['points']) == 50
+    assert series['weekly_gain_kg'] == 0.5 and series['recent_weekly_gain_kg'] == 0.5
+    assert series['points'][-1]['weight'] == series['latest']
+    assert weight_series.build_series([])['points'] == []